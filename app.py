@@ -10,7 +10,13 @@ def main():
     """Main entry point for deployment."""
     try:
         # Import the main application
-        from chat_ui import demo
+        from chat_ui import create_demo
+        from nodes.metrics import registry
+        from nodes.warmup import WARMUP_FAILED, WARMUP_LOADING, start_warmup
+        demo = create_demo()
+
+        # Load the model in the background so the first model-based request does not wait for it
+        warmup = start_warmup()
 
         # Get port from environment variable (for cloud deployment)
         port = int(os.environ.get("PORT", 7860))
@@ -19,7 +25,7 @@ def main():
         print(f"📱 Server will be available on port {port}")
 
         # Launch the application for deployment
-        demo.launch(
+        app, _, _ = demo.launch(
             server_name="0.0.0.0",
             server_port=port,
             share=True,
@@ -27,9 +33,30 @@ def main():
             show_api=False,  # Disable API docs to avoid schema issues
             quiet=True,      # Reduce verbose output
             favicon_path=None,
-            root_path=os.environ.get("GRADIO_ROOT_PATH", "")
+            root_path=os.environ.get("GRADIO_ROOT_PATH", ""),
+            prevent_thread_lock=True
         )
 
+        # Expose pipeline metrics for Prometheus next to the UI
+        from fastapi.responses import PlainTextResponse
+
+        def metrics_endpoint():
+            return PlainTextResponse(registry.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+        app.add_api_route("/metrics", metrics_endpoint, methods=["GET"])
+        print("📈 Metrics available at /metrics")
+
+        # Readiness for load balancers: 503 while the model is loading or after it failed to load
+        from fastapi.responses import JSONResponse
+
+        def health_endpoint():
+            status = warmup.status()
+            return JSONResponse(status, status_code=503 if status["state"] in (WARMUP_LOADING, WARMUP_FAILED) else 200)
+
+        app.add_api_route("/health", health_endpoint, methods=["GET"])
+        print("🩺 Readiness available at /health")
+        demo.block_thread()
+
     except Exception as e:
         print(f"❌ Error starting application: {e}")
         sys.exit(1)
@@ -0,0 +1,134 @@
+"""
+Host-specific llama.cpp runtime autotuner.
+
+Benchmarks TinyLlama on this machine for a range of thread counts and batch
+sizes, decoding a fixed set of content generator prompts exactly as a plan
+does (batched, grammar-constrained, greedy). The fastest configuration is
+saved to the runtime profile (models/runtime_profile.json, or $LLM_PROFILE),
+which the llama.cpp backends load automatically for every later run.
+
+    python autotune.py
+    python autotune.py --threads 4 8 16 --batch-sizes 128 512 --repeat 2
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from nodes.content_generator import CONTENT_GRAMMAR, CONTENT_MAX_TOKENS, CONTENT_STOP, get_content_generator_prompt
+from nodes.metrics import collect_run_metrics
+from nodes.model_utils import DEFAULT_BATCH_SIZE, LlamaCppBackend, evict_llm, get_model_pool
+from nodes.runtime_profile import default_profile_path, save_profile
+
+DEFAULT_BATCH_SIZES = [64, 128, 256, 512]
+
+# Library default context size; profiles never go below it
+MIN_CONTEXT = 512
+
+# Fixed prompt set: one batch of content generator prompts over varied themes
+AUTOTUNE_PROMPTS = [
+    ("Fitness for Busy Professionals", "Ten-minute morning workouts"),
+    ("Healthy Cooking", "Meal prep for the week ahead"),
+    ("Travel Photography", "Shooting landscapes at golden hour"),
+    ("Personal Finance", "Building an emergency fund"),
+    ("Sustainable Living", "Reducing plastic in the kitchen"),
+    ("Remote Work", "Setting boundaries at home"),
+    ("Gardening", "Starting seeds indoors"),
+    ("Mindfulness", "Breathing exercises for stress"),
+]
+
+
+def candidate_thread_counts(cpu_count: int) -> List[int]:
+    """Powers of two up to the CPU count, plus half and all of the CPUs."""
+    counts = {cpu_count, max(1, cpu_count // 2)}
+    count = 1
+    while count < cpu_count:
+        counts.add(count)
+        count *= 2
+    return sorted(counts)
+
+
+def autotune_prompts() -> List[str]:
+    prompt = get_content_generator_prompt()
+    return [prompt.format(brand_theme=theme, topic=topic) for theme, topic in AUTOTUNE_PROMPTS[:DEFAULT_BATCH_SIZE]]
+
+
+def benchmark_config(model_path: str, prompts: List[str], settings: Dict, repeat: int) -> Dict:
+    """Time batched generation of the prompt set with one set of llama.cpp settings."""
+    llm = get_model_pool().get(model_path, temperature=0.0, **settings)
+    params = {"grammar": CONTENT_GRAMMAR, "max_tokens": CONTENT_MAX_TOKENS, "stop": CONTENT_STOP, "temperature": 0.0}
+    try:
+        # First run pages the weights in and fills caches; it is not timed
+        llm.generate_batch(prompts, **params)
+
+        timings = []
+        tokens = 0
+        for _ in range(repeat):
+            with collect_run_metrics() as run:
+                start = time.perf_counter()
+                llm.generate_batch(prompts, **params)
+                timings.append(time.perf_counter() - start)
+            tokens += sum(stats["completion_tokens"] for stats in run.snapshot().values())
+    finally:
+        evict_llm(model_path)
+
+    return dict(settings, median_s=statistics.median(timings),
+                tokens_per_second=tokens / sum(timings) if sum(timings) else 0.0)
+
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Tune llama.cpp runtime settings for this machine")
+    parser.add_argument("--model", type=str, help="GGUF model to tune (default: TinyLlama, downloaded if missing)")
+    parser.add_argument("--threads", type=int, nargs="+",
+                        help=f"Thread counts to try (default: {' '.join(map(str, candidate_thread_counts(cpu_count)))})")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=DEFAULT_BATCH_SIZES,
+                        help="llama.cpp n_batch values to try (default: 64 128 256 512)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per configuration (default: 3)")
+    parser.add_argument("--mlock", action="store_true", help="Lock the model in RAM in the saved profile")
+    parser.add_argument("--profile", type=str, help=f"Where to save the profile (default: {default_profile_path()})")
+    args = parser.parse_args()
+
+    model_path = args.model or LlamaCppBackend().locate_model()
+    if model_path is None:
+        sys.exit(1)
+
+    prompts = autotune_prompts()
+    llm = get_model_pool().get(model_path, temperature=0.0)
+    longest_prompt = max(len(llm.llm.client.tokenize(prompt.encode("utf-8"))) for prompt in prompts)
+    evict_llm(model_path)
+    n_ctx = max(MIN_CONTEXT, -(-(longest_prompt + CONTENT_MAX_TOKENS) // 256) * 256)
+
+    print("\n===== llama.cpp Runtime Autotune =====\n")
+    print(f"Model: {model_path}")
+    print(f"Host: {cpu_count} CPUs; {len(prompts)} prompts per run, {args.repeat} timed runs per configuration\n")
+
+    results = []
+    for n_threads in args.threads or candidate_thread_counts(cpu_count):
+        for n_batch in args.batch_sizes:
+            settings = {"n_threads": n_threads, "n_batch": n_batch, "n_ctx": n_ctx,
+                        "use_mmap": True, "use_mlock": args.mlock}
+            result = benchmark_config(model_path, prompts, settings, args.repeat)
+            results.append(result)
+            print(f"  n_threads {n_threads:>3}  n_batch {n_batch:>4}  median {result['median_s'] * 1000:9.1f} ms  "
+                  f"{result['tokens_per_second']:7.1f} tok/s")
+
+    # Fastest wins; on a tie the fewer threads, leaving cores for everything else
+    best = min(results, key=lambda result: (round(result["median_s"], 3), result["n_threads"]))
+    settings = {key: best[key] for key in ("n_threads", "n_batch", "n_ctx", "use_mmap", "use_mlock")}
+    path = save_profile(model_path, settings, {
+        "tuned_at": datetime.now(timezone.utc).isoformat(),
+        "runs": results,
+    }, args.profile)
+
+    print(f"\n✅ Best: n_threads {best['n_threads']}, n_batch {best['n_batch']} "
+          f"({best['median_s'] * 1000:.1f} ms, {best['tokens_per_second']:.1f} tok/s)")
+    print(f"Profile saved to {os.path.abspath(path)}")
+
+
+if __name__ == "__main__":
+    main()
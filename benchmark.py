@@ -0,0 +1,238 @@
+"""
+Benchmark suite for the content calendar pipeline.
+
+Times every graph node and the full graph for a range of plan durations in
+both rule-based and model mode. Model mode uses the deterministic stub
+backend with a simulated per-token latency, so runs are repeatable and need
+no model file. It also times a cold rule-based CLI run in a fresh process and
+checks it against a start-up budget.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --baseline bench.json --threshold 0.2
+    python benchmark.py --startup-budget 0.5
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from nodes.content_generator import content_generator_node
+from nodes.day_planner import day_planner_node
+from nodes.formatter import formatter_node
+from nodes.save import save_node
+from nodes.llm_cache import set_cache_enabled
+from nodes.model_utils import configure_backend
+
+DEFAULT_DURATIONS = [7, 30, 365, 10_000]
+
+# Seconds a cold `main.py --rule-based` run may take, interpreter start included
+DEFAULT_STARTUP_BUDGET = 0.5
+
+# Packages a rule-based CLI run must never import
+RULE_BASED_FORBIDDEN_IMPORTS = ["llama_cpp", "langchain_community", "huggingface_hub", "langgraph", "pandas"]
+
+
+def make_state(duration: int, use_model: bool, output_path: str) -> Dict:
+    return {
+        "brand_theme": "Fitness for Busy Professionals",
+        "duration": duration,
+        "output_path": output_path,
+        "use_model": use_model,
+        "randomness": "medium",
+        "batch_size": None,
+        "seed": 0,
+        "topics": None,
+        "content": None,
+        "formatted_content": None
+    }
+
+
+def time_call(func: Callable[[], object], repeat: int) -> List[float]:
+    """Run func repeat times and return the wall time of each run in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def benchmark_case(graph, duration: int, use_model: bool, repeat: int, output_dir: str) -> List[Dict]:
+    """Time each node and the full graph for one duration and mode."""
+    mode = "model" if use_model else "rule-based"
+    output_path = os.path.join(output_dir, f"bench_{mode}_{duration}.csv")
+
+    # Prepare the input each node expects by running the pipeline once
+    planned = day_planner_node(make_state(duration, use_model, output_path))
+    generated = content_generator_node(dict(planned))
+    formatted = formatter_node(dict(generated))
+
+    cases = {
+        "day_planner": lambda: day_planner_node(make_state(duration, use_model, output_path)),
+        "content_generator": lambda: content_generator_node(dict(planned)),
+        "formatter": lambda: formatter_node(dict(generated)),
+        "save": lambda: save_node(dict(formatted)),
+        "graph": lambda: graph.invoke(make_state(duration, use_model, output_path)),
+    }
+
+    results = []
+    for name, func in cases.items():
+        timings = time_call(func, repeat)
+        results.append({
+            "node": name,
+            "mode": mode,
+            "duration": duration,
+            "median_s": statistics.median(timings),
+            "min_s": min(timings),
+            "runs_s": timings,
+        })
+        print(f"  {name:<18} {mode:<10} {duration:>6} days  median {statistics.median(timings) * 1000:10.2f} ms")
+    return results
+
+
+def measure_startup(repeat: int, duration: int = 30) -> Dict:
+    """Time cold rule-based CLI runs, each in a fresh interpreter.
+
+    One extra run under -X importtime lists the top-level packages it
+    imported, to catch heavy dependencies creeping back into the path.
+    """
+    main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    with tempfile.TemporaryDirectory() as output_dir:
+        command = [sys.executable, main_path, "--rule-based", "--theme", "Fitness for Busy Professionals",
+                   "--duration", str(duration), "--seed", "0", "--output", os.path.join(output_dir, "startup.csv")]
+        run = lambda: subprocess.run(command, cwd=output_dir, check=True, capture_output=True)
+        timings = time_call(run, repeat)
+        profile = subprocess.run([sys.executable, "-X", "importtime"] + command[1:], cwd=output_dir,
+                                 check=True, capture_output=True, text=True).stderr
+
+    imported = {line.split("|")[-1].strip().split(".")[0] for line in profile.splitlines()
+                if line.startswith("import time:")}
+    forbidden = sorted(imported.intersection(RULE_BASED_FORBIDDEN_IMPORTS))
+    print(f"  {'startup':<18} {'rule-based':<10} {duration:>6} days  median {statistics.median(timings) * 1000:10.2f} ms")
+    return {
+        "node": "startup",
+        "mode": "rule-based",
+        "duration": duration,
+        "median_s": statistics.median(timings),
+        "min_s": min(timings),
+        "runs_s": timings,
+        "forbidden_imports": forbidden,
+    }
+
+
+def run_benchmarks(durations: List[int], modes: List[str], repeat: int,
+                   token_latency: float, prompt_latency: float) -> Dict:
+    """Run the whole suite and return the results document."""
+    from main import build_graph
+
+    # Model mode runs against the stub backend, uncached so every call pays its latency
+    configure_backend("stub", token_latency=token_latency, prompt_latency=prompt_latency)
+    set_cache_enabled(False)
+
+    graph = build_graph()
+    results = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        for mode in modes:
+            for duration in durations:
+                results.extend(benchmark_case(graph, duration, mode == "model", repeat, output_dir))
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "durations": durations,
+            "modes": modes,
+            "repeat": repeat,
+            "token_latency": token_latency,
+            "prompt_latency": prompt_latency,
+        },
+        "results": results,
+    }
+
+
+def compare_results(current: Dict, baseline: Dict, threshold: float, min_delta: float = 0.001) -> List[str]:
+    """List the cases whose median got slower than the baseline by more than threshold.
+
+    Slowdowns under min_delta seconds are ignored so sub-millisecond cases
+    do not fail on timer noise.
+    """
+    baseline_medians = {
+        (result["node"], result["mode"], result["duration"]): result["median_s"]
+        for result in baseline["results"]
+    }
+    regressions = []
+    for result in current["results"]:
+        previous = baseline_medians.get((result["node"], result["mode"], result["duration"]))
+        if (previous and result["median_s"] > previous * (1 + threshold)
+                and result["median_s"] - previous >= min_delta):
+            regressions.append(
+                f"{result['node']} ({result['mode']}, {result['duration']} days): "
+                f"{previous * 1000:.2f} ms -> {result['median_s'] * 1000:.2f} ms "
+                f"(+{(result['median_s'] / previous - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the content calendar pipeline")
+    parser.add_argument("--durations", type=int, nargs="+", default=DEFAULT_DURATIONS,
+                        help="Plan durations to benchmark (default: 7 30 365 10000)")
+    parser.add_argument("--modes", nargs="+", choices=["rule-based", "model"], default=["rule-based", "model"],
+                        help="Generation modes to benchmark (default: both)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the median is reported (default: 3)")
+    parser.add_argument("--token-latency", type=float, default=0.0001,
+                        help="Stub LLM seconds per generated token (default: 0.0001)")
+    parser.add_argument("--prompt-latency", type=float, default=0.00001,
+                        help="Stub LLM seconds per prompt token (default: 0.00001)")
+    parser.add_argument("--output", type=str, default="benchmark_results.json",
+                        help="Where to save the results JSON (default: benchmark_results.json)")
+    parser.add_argument("--baseline", type=str, help="Results JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed slowdown against the baseline before failing (default: 0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="Ignore slowdowns smaller than this many milliseconds, to skip timer noise (default: 1.0)")
+    parser.add_argument("--startup-budget", type=float, default=DEFAULT_STARTUP_BUDGET,
+                        help=f"Seconds a cold rule-based CLI run may take before failing (default: {DEFAULT_STARTUP_BUDGET})")
+    args = parser.parse_args()
+
+    print("\n===== Content Pipeline Benchmark =====\n")
+    current = run_benchmarks(args.durations, args.modes, args.repeat, args.token_latency, args.prompt_latency)
+    startup = measure_startup(args.repeat)
+    current["results"].append(startup)
+    current["config"]["startup_budget"] = args.startup_budget
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2)
+    print(f"\nResults saved to {os.path.abspath(args.output)}")
+
+    if startup["forbidden_imports"]:
+        print(f"\n❌ The rule-based CLI imported {', '.join(startup['forbidden_imports'])}")
+        sys.exit(1)
+    if startup["median_s"] > args.startup_budget:
+        print(f"\n❌ Rule-based start-up took {startup['median_s']:.3f}s, over the {args.startup_budget}s budget")
+        sys.exit(1)
+    print(f"\n✅ Rule-based start-up {startup['median_s']:.3f}s within the {args.startup_budget}s budget")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(current, baseline, args.threshold, args.min_delta_ms / 1000)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
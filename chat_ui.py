@@ -1,13 +1,25 @@
+import asyncio
+import os
+import re
+
 import gradio as gr
-import pandas as pd
-from typing import Dict, List, Optional, TypedDict
+from typing import Annotated, Dict, List, Optional, TypedDict
 from langgraph.graph import END, START, StateGraph
 
 # Import our custom nodes
-from nodes.day_planner import day_planner_node
-from nodes.content_generator import content_generator_node
-from nodes.formatter import formatter_node
-from nodes.save import save_node
+from nodes.day_planner import aday_planner_node, day_planner_node
+from nodes.editing import extend_plan, load_plan, regenerate_days, select_days
+from nodes.content_generator import (acontent_branch_node, acontent_generator_node, content_branch_node,
+                                     content_generator_node, fan_out_topics, merge_content, route_after_content)
+from nodes.checkpoints import (CHECKPOINT_DURABILITY, DEFAULT_CHECKPOINT_DAYS, new_run_id, open_async_checkpointer,
+                               run_config)
+from nodes.formatter import COLUMNS, ContentTable, aformatter_node, formatter_node, plan_columns
+from nodes.save import asave_node, save_node
+from nodes.metrics import instrument_node, measure_node
+from nodes.scheduler import PRIORITY_HIGH, PRIORITY_NORMAL, get_scheduler
+from nodes.model_utils import run_in_llm_executor
+from nodes.sinks import make_sink, unique_output_path
+from nodes.warmup import WARMUP_FAILED, WARMUP_LOADING, WARMUP_WARM, get_warmup, start_warmup
 
 # Custom CSS for dark theme and modern styling
 CUSTOM_CSS = """
@@ -473,75 +485,287 @@ class State(TypedDict):
     brand_theme: str
     duration: int
     topics: Optional[List[str]]
-    content: Optional[List[Dict]]
-    formatted_content: Optional[pd.DataFrame]
-    output_path: str
+    # Merged by day, so parallel fan-out branches can each add their own days
+    content: Annotated[Optional[List[Dict]], merge_content]
+    formatted_content: Optional[ContentTable]
+    output_path: Optional[str]
+    output_format: Optional[str]
+    output_bytes: Optional[bytes]
     use_model: bool
     randomness: str
-
-def build_graph() -> StateGraph:
-    """Build the LangGraph workflow."""
+    batch_size: Optional[int]
+    seed: Optional[int]
+    session_id: Optional[str]
+    priority: Optional[int]
+    checkpoint_every: Optional[int]
+    fan_out: Optional[int]
+    platforms: Optional[List[str]]
+
+def build_graph(asynchronous: bool = False, checkpointer=None) -> StateGraph:
+    """Build the LangGraph workflow.
+
+    Args:
+        asynchronous: Use the async node variants, for running the graph with
+            ainvoke/astream from an event loop. Model calls then run on a
+            dedicated executor instead of blocking the loop.
+        checkpointer: LangGraph checkpointer that saves the state after every
+            step, so an interrupted run can be resumed by its thread ID
+    """
     # Initialize the graph
     workflow = StateGraph(State)
     
     # Add nodes
-    workflow.add_node("day_planner", day_planner_node)
-    workflow.add_node("content_generator", content_generator_node)
-    workflow.add_node("formatter", formatter_node)
-    workflow.add_node("save", save_node)
+    if asynchronous:
+        nodes = {"day_planner": aday_planner_node, "content_generator": acontent_generator_node,
+                 "formatter": aformatter_node, "save": asave_node}
+    else:
+        nodes = {"day_planner": day_planner_node, "content_generator": content_generator_node,
+                 "formatter": formatter_node, "save": save_node}
+    for name, node in nodes.items():
+        workflow.add_node(name, instrument_node(name)(node))
+    # Fan-out branches are retried one by one when the model fails on a topic
+    workflow.add_node("content_branch", instrument_node("content_branch")(
+        acontent_branch_node if asynchronous else content_branch_node))
 
     # Define the edges
     workflow.add_edge(START, "day_planner")
-    workflow.add_edge("day_planner", "content_generator")
-    workflow.add_edge("content_generator", "formatter")
+    # Content comes from the content generator, or from parallel branches when state["fan_out"] is set
+    workflow.add_conditional_edges("day_planner", fan_out_topics, ["content_generator", "content_branch"])
+    # Long plans loop through the content generator a chunk of days at a time
+    workflow.add_conditional_edges("content_generator", route_after_content, ["content_generator", "formatter"])
+    workflow.add_edge("content_branch", "formatter")
     workflow.add_edge("formatter", "save")
     workflow.add_edge("save", END)
     
     # Compile the graph
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
+
+# Plans up to this many days get ahead of longer ones in the model queue
+SHORT_PLAN_DAYS = 30
+
+# How often a plan waiting on the model refreshes its queue position (seconds)
+QUEUE_POLL_INTERVAL = 1.0
 
-def generate_content_plan(theme: str, duration: int, generation_method: str, randomness: str, history, user_message: str):
-    """Generate content plan and return formatted response."""
+async def iterate_with_ticks(stream, interval: float):
+    """Yield items from an async iterator, plus None whenever interval seconds pass without one."""
+    iterator = stream.__aiter__()
+    pending = asyncio.ensure_future(iterator.__anext__())
     try:
-        # Validate inputs
-        if not theme.strip():
-            history.append({"role": "user", "content": user_message})
-            history.append({"role": "assistant", "content": "Please provide a valid brand theme."})
-            return history
+        while True:
+            done, _ = await asyncio.wait({pending}, timeout=interval)
+            if not done:
+                yield None
+                continue
+            try:
+                item = pending.result()
+            except StopAsyncIteration:
+                return
+            yield item
+            pending = asyncio.ensure_future(iterator.__anext__())
+    finally:
+        pending.cancel()
+
+# Chat commands that edit the session's latest plan instead of generating a new one
+REGENERATE_DAYS_COMMAND = re.compile(r"^\s*regenerate\s+days?\s+(\d+(?:\s*(?:,|and)\s*\d+)*)\s*[.!]?\s*$", re.IGNORECASE)
+REGENERATE_MATCHING_COMMAND = re.compile(
+    r"^\s*regenerate\s+(?:all\s+)?(?:days?|posts?)\s+(?:matching|about|mentioning)\s+(.+?)\s*$", re.IGNORECASE)
+EXTEND_COMMAND = re.compile(
+    r"^\s*extend\s+(?:(?:the|my)\s+)?(?:plan\s+|calendar\s+|it\s+)?by\s+(\d+)\s+(?:more\s+)?days?\s*[.!]?\s*$",
+    re.IGNORECASE)
+
+# Latest plan file of each chat session, which edit commands work on
+session_plans: Dict[Optional[str], str] = {}
+
+# Unfinished run of each chat session, which "resume" continues
+session_runs: Dict[Optional[str], str] = {}
+
+# "resume" continues the session's unfinished run; "resume <run id>" any run, e.g. from before a restart
+RESUME_COMMAND = re.compile(r"^\s*resume(?:\s+(?:run\s+)?`?([A-Za-z0-9_.-]+)`?)?\s*[.!]?\s*$", re.IGNORECASE)
+
+def parse_edit_command(message: str) -> Optional[Dict]:
+    """Recognise an edit command, returning {"days": [...]}, {"matching": text} or {"extend": days}, else None."""
+    match = REGENERATE_DAYS_COMMAND.match(message)
+    if match:
+        return {"days": [int(day) for day in re.findall(r"\d+", match.group(1))]}
+    match = REGENERATE_MATCHING_COMMAND.match(message)
+    if match:
+        return {"matching": match.group(1).strip("\"'")}
+    match = EXTEND_COMMAND.match(message)
+    if match:
+        return {"extend": int(match.group(1))}
+    return None
+
+def format_queue_status(queue: Dict) -> str:
+    """Render a scheduler status for the sidebar status display."""
+    if queue["position"]:
+        return f"""
+        <div class="status-indicator status-warning">
+            <span>⏳</span> Waiting for the model: #{queue['position']} in queue, about {queue['wait_seconds']:.0f}s
+        </div>
+        """
+    return """
+    <div class="status-indicator status-success">
+        <span>🤖</span> The model is working on your plan...
+    </div>
+    """
 
-        if duration < 1 or duration > 365:
-            history.append({"role": "user", "content": user_message})
-            history.append({"role": "assistant", "content": "Duration must be between 1 and 365 days."})
-            return history
-        
-        # Determine generation method
-        use_model = generation_method == "Model-based (TinyLlama)"
-        
-        # Build the graph
-        graph = build_graph()
-        
-        # Initialize the state
-        initial_state = {
-            "brand_theme": theme,
-            "duration": duration,
-            "output_path": "temp_content_calendar.csv",
-            "use_model": use_model,
-            "randomness": randomness.lower(),
-            "topics": None,
-            "content": None,
-            "formatted_content": None
-        }
-        
-        # Add user message and status message
-        history.append({"role": "user", "content": user_message})
-        status_msg = f"🚀 Generating {duration}-day content plan for '{theme}' using {generation_method.lower()} with {randomness.lower()} randomness..."
-        history.append({"role": "assistant", "content": status_msg})
+def format_model_status(warmup: Dict) -> str:
+    """Render the model warm-up state for the sidebar status display; empty if no warm-up was started."""
+    if warmup["state"] == WARMUP_LOADING:
+        return f"""
+        <div class="status-indicator status-warning">
+            <span>⏳</span> TinyLlama is warming up ({warmup['seconds']:.0f}s); rule-based generation is available now
+        </div>
+        """
+    if warmup["state"] == WARMUP_WARM:
+        return """
+        <div class="status-indicator status-success">
+            <span>🤖</span> TinyLlama is loaded and warm
+        </div>
+        """
+    if warmup["state"] == WARMUP_FAILED:
+        return f"""
+        <div class="status-indicator status-error">
+            <span>❌</span> TinyLlama could not be loaded ({warmup['error']}); model-based plans will use rule-based generation
+        </div>
+        """
+    return ""
+
+def row_columns(row: Dict) -> List[str]:
+    """Columns of a plan row: caption and hashtags, or one post per platform for a --platforms plan."""
+    if "caption" in row:
+        return plan_columns()
+    return plan_columns([column for column in row if column not in ("day", "topic")])
+
+def format_day_preview(row: Dict) -> str:
+    """Markdown preview of one day of a plan."""
+    preview = f"\n**📅 Day {row['day']}: {row['topic']}**\n\n"
+    if "caption" in row:
+        preview += f"💬 *{row['caption']}*\n\n🏷️ `{row['hashtags']}`\n\n"
+    else:
+        for platform in row_columns(row)[2:]:
+            preview += f"📣 **{platform}:** {row[platform]}\n\n"
+    return preview + "---\n"
+
+def live_table_update(rows: List[Dict]) -> gr.Dataframe:
+    """Show the rows generated so far in the live table, with the columns of their plan."""
+    columns = row_columns(rows[0]) if rows else COLUMNS
+    return gr.Dataframe(
+        value=[[row[column] for column in columns] for row in rows],
+        headers=columns,
+        visible=bool(rows)
+    )
+
+async def generate_content_plan(theme: str, duration: int, generation_method: str, randomness: str, history,
+                                user_message: str, session_id: Optional[str] = None, resume_id: Optional[str] = None):
+    """Generate content plan, yielding (history, file_path, rows, queue) as days are produced.
+
+    Runs the async graph, so many plans can be in flight on one event loop
+    while model calls run on the model executor. queue is the session's
+    scheduler status while it waits for or uses the model, otherwise None.
+    The run is checkpointed; with resume_id, an interrupted run continues
+    from its last checkpoint with the settings it was started with.
+    """
+    try:
+        if resume_id is None:
+            # Validate inputs
+            if not theme.strip():
+                history.append({"role": "user", "content": user_message})
+                history.append({"role": "assistant", "content": "Please provide a valid brand theme."})
+                yield history, None, [], None
+                return
+
+            if duration < 1 or duration > 365:
+                history.append({"role": "user", "content": user_message})
+                history.append({"role": "assistant", "content": "Duration must be between 1 and 365 days."})
+                yield history, None, [], None
+                return
         
-        # Run the graph
-        final_state = graph.invoke(initial_state)
+        async with open_async_checkpointer() as checkpointer:
+            # Build the graph
+            graph = build_graph(asynchronous=True, checkpointer=checkpointer)
+            history.append({"role": "user", "content": user_message})
+            
+            if resume_id is not None:
+                # Continue an interrupted run with the settings it was started with
+                snapshot = await graph.aget_state({"configurable": {"thread_id": resume_id}})
+                if not snapshot.values or not snapshot.next:
+                    history.append({"role": "assistant", "content": f"There is no unfinished run `{resume_id}` to resume."})
+                    yield history, None, [], None
+                    return
+                initial_state = snapshot.values
+                run_input = None
+                run_id = resume_id
+                theme = initial_state["brand_theme"]
+                duration = initial_state["duration"]
+                use_model = initial_state["use_model"]
+                generation_method = "Model-based (TinyLlama)" if use_model else "Rule-based"
+                randomness = initial_state["randomness"].capitalize()
+                rows = list(initial_state.get("content") or [])
+                status_msg = f"🔁 Resuming the {duration}-day content plan for '{theme}' from day {len(rows) + 1}..."
+            else:
+                # Determine generation method
+                use_model = generation_method == "Model-based (TinyLlama)"
+                slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", theme.strip().lower())
+                run_id = new_run_id(theme)
+                
+                # Initialize the state
+                initial_state = {
+                    "brand_theme": theme,
+                    "duration": duration,
+                    # Each plan gets its own file so concurrent sessions never share one
+                    "output_path": unique_output_path(f"{slug}_content_plan.csv"),
+                    "output_format": "csv",
+                    "use_model": use_model,
+                    "randomness": randomness.lower(),
+                    "batch_size": None,
+                    "seed": None,
+                    "session_id": session_id,
+                    "priority": PRIORITY_HIGH if duration <= SHORT_PLAN_DAYS else PRIORITY_NORMAL,
+                    "checkpoint_every": DEFAULT_CHECKPOINT_DAYS,
+                    "topics": None,
+                    "content": None,
+                    "formatted_content": None
+                }
+                run_input = initial_state
+                rows = []
+                status_msg = f"🚀 Generating {duration}-day content plan for '{theme}' using {generation_method.lower()} with {randomness.lower()} randomness..."
+            
+            # Add status message; the run ID lets the user pick the run up again if it is interrupted
+            session_runs[session_id] = run_id
+            status_msg += f"\n\n🔖 Run ID `{run_id}`: if generation is interrupted, say **resume {run_id}**."
+            history.append({"role": "assistant", "content": status_msg})
+            yield history, None, rows, None
+            
+            # Run the graph, updating the status message as each day arrives and
+            # the queue position while waiting for the model
+            final_state = initial_state
+            scheduler = get_scheduler()
+            queue_session = initial_state.get("session_id")
+            config = run_config(run_id, duration, initial_state.get("checkpoint_every"))
+            stream = graph.astream(run_input, config, stream_mode=["custom", "values"], durability=CHECKPOINT_DURABILITY)
+            async for item in iterate_with_ticks(stream, QUEUE_POLL_INTERVAL):
+                queue = scheduler.status(queue_session) if use_model and queue_session else None
+                if item is None:
+                    yield history, None, rows, queue
+                    continue
+                
+                mode, chunk = item
+                if mode == "custom" and "row" in chunk:
+                    rows.append(chunk["row"])
+                    if len(rows) > 1 and rows[-1]["day"] < rows[-2]["day"]:
+                        rows.sort(key=lambda row: row["day"])  # fan-out branches finish out of order
+                    history[-1] = {"role": "assistant", "content": f"{status_msg}\n\n⏳ **{len(rows)}/{chunk['total']} days ready**"}
+                    yield history, None, rows, queue
+                elif mode == "values":
+                    final_state = chunk
+            
+            # The run is complete; its checkpoints are no longer needed
+            await checkpointer.adelete_thread(run_id)
+            session_runs.pop(session_id, None)
         
         # Format the response
-        df = final_state['formatted_content']
+        table = final_state['formatted_content']
 
         # Create a clean, markdown-formatted summary
         summary = f"""
@@ -559,24 +783,15 @@ def generate_content_plan(theme: str, duration: int, generation_method: str, ran
 """
 
         # Add first 3 entries as examples with clean formatting
-        for i in range(min(3, len(df))):
-            row = df.iloc[i]
-            summary += f"""
-**📅 Day {row['day']}: {row['topic']}**
-
-💬 *{row['caption']}*
+        for i in range(min(3, len(table))):
+            summary += format_day_preview(table.row(i))
 
-🏷️ `{row['hashtags']}`
-
----
-"""
+        if len(table) > 3:
+            summary += f"\n✨ **... and {len(table) - 3} more days of amazing content!**\n\n"
 
-        if len(df) > 3:
-            summary += f"\n✨ **... and {len(df) - 3} more days of amazing content!**\n\n"
-
-        # Save to file for download
-        output_filename = f"{theme.replace(' ', '_').lower()}_content_plan.csv"
-        df.to_csv(output_filename, index=False)
+        # save_node already wrote the plan; serve that file for download
+        output_path = final_state["output_path"]
+        output_filename = os.path.basename(output_path)
 
         # Add download section
         summary += f"""
@@ -587,30 +802,154 @@ Your content plan has been saved as **`{output_filename}`**
 🎉 **Ready to boost your social media presence!**
 """
 
+        history[-1] = {"role": "assistant", "content": status_msg}
         history.append({"role": "assistant", "content": summary})
+        session_plans[session_id] = output_path
 
         # Return both history and the file path for download
-        return history, output_filename
+        yield history, output_path, rows, None
 
     except Exception as e:
-        error_msg = f"❌ **Error:** {str(e)}\n\nPlease try again with different parameters."
+        error_msg = f"❌ **Error:** {str(e)}\n\n"
+        run_id = session_runs.get(session_id)
+        if run_id:
+            error_msg += f"Say **resume {run_id}** to continue from the last saved day."
+        else:
+            error_msg += "Please try again with different parameters."
         history.append({"role": "assistant", "content": error_msg})
-        return history
+        yield history, None, [], None
+
+async def edit_content_plan(command: Dict, theme: str, generation_method: str, randomness: str, history,
+                            user_message: str, session_id: Optional[str] = None):
+    """Edit the session's latest plan, yielding (history, file_path, rows, queue) like generate_content_plan.
+
+    Only the regenerated or added days are generated; the rest of the plan
+    is copied from its file. The edited plan is saved as a new file so the
+    earlier download stays as it was. rows holds the changed days.
+    """
+    history.append({"role": "user", "content": user_message})
+    plan_path = session_plans.get(session_id)
+    if plan_path is None or not os.path.exists(plan_path):
+        history.append({"role": "assistant", "content": "There is no plan to edit yet. Say **generate** to create one first."})
+        yield history, None, [], None
+        return
+    if not theme.strip():
+        history.append({"role": "assistant", "content": "Please enter the plan's brand theme in the sidebar first."})
+        yield history, None, [], None
+        return
+
+    try:
+        table = load_plan(plan_path)
+        use_model = generation_method == "Model-based (TinyLlama)"
+        if "extend" in command:
+            changed = command["extend"]
+            if changed < 1 or len(table) + changed > 365:
+                raise ValueError("A plan can be extended to at most 365 days.")
+            status_msg = f"➕ Adding {changed} days to your {len(table)}-day plan..."
+        else:
+            indices = select_days(table, command.get("days", ()), command.get("matching") and re.escape(command["matching"]))
+            changed = len(indices)
+            if not indices:
+                raise ValueError(f"No days of your plan mention '{command['matching']}'.")
+            status_msg = f"🔄 Regenerating {changed} of {len(table)} days..."
+
+        state = {
+            "brand_theme": theme,
+            "use_model": use_model,
+            "randomness": randomness.lower(),
+            "batch_size": None,
+            "seed": None,
+            "session_id": session_id,
+            "priority": PRIORITY_HIGH if changed <= SHORT_PLAN_DAYS else PRIORITY_NORMAL,
+        }
+        output_path = unique_output_path(os.path.basename(plan_path))
+
+        def edit() -> ContentTable:
+            if "extend" in command:
+                with measure_node("extend"):
+                    edited = extend_plan(table, changed, state)
+            else:
+                with measure_node("regenerate"):
+                    edited = regenerate_days(table, indices, state)
+            with measure_node("save"):
+                make_sink(output_path).write(edited)
+            return edited
+
+        async def run_edit():
+            yield await run_in_llm_executor(edit) if use_model else edit()
+
+        history.append({"role": "assistant", "content": status_msg})
+        yield history, None, [], None
+
+        # Show the queue position while the edit waits for the model
+        edited = None
+        scheduler = get_scheduler()
+        async for item in iterate_with_ticks(run_edit(), QUEUE_POLL_INTERVAL):
+            if item is None:
+                yield history, None, [], scheduler.status(session_id) if use_model and session_id else None
+            else:
+                edited = item
+
+        if "extend" in command:
+            rows = [edited.row(i) for i in range(len(table), len(edited))]
+            summary = f"## ✅ Plan Extended to {len(edited)} Days\n\n"
+        else:
+            rows = [edited.row(i) for i in indices]
+            summary = f"## ✅ Regenerated {changed} {'Day' if changed == 1 else 'Days'}\n\n"
+        for row in rows[:3]:
+            summary += format_day_preview(row)
+        if len(rows) > 3:
+            summary += f"\n✨ **... and {len(rows) - 3} more changed days.**\n\n"
+        summary += f"\nThe updated plan has been saved as **`{os.path.basename(output_path)}`**\n"
 
-def chat_interface(message, history, theme, duration, generation_method, randomness):
-    """Main chat interface function."""
+        history.append({"role": "assistant", "content": summary})
+        session_plans[session_id] = output_path
+        yield history, output_path, rows, None
+
+    except Exception as e:
+        history.append({"role": "assistant", "content": f"❌ **Error:** {str(e)}"})
+        yield history, None, [], None
+
+async def chat_interface(message, history, theme, duration, generation_method, randomness, session_id=None):
+    """Main chat interface function, yielding (history, message, file_path, rows, queue) updates."""
     if not message.strip():
-        return history, "", None
+        yield history, "", None, [], None
+        return
+
+    # Resume an interrupted run from its last checkpoint
+    match = RESUME_COMMAND.match(message)
+    if match:
+        resume_id = match.group(1) or session_runs.get(session_id)
+        if resume_id is None:
+            history.append({"role": "user", "content": message})
+            history.append({"role": "assistant", "content": "There is no interrupted run to resume. Say **resume** followed by the run ID shown when the run started."})
+            yield history, "", None, [], None
+            return
+        async for updated_history, download_file, rows, queue in generate_content_plan(
+                theme, duration, generation_method, randomness, history, message, session_id, resume_id):
+            yield updated_history, "", download_file, rows, queue
+        return
+
+    # Edit commands ("regenerate day 5", "extend by 14 days") work on the session's latest plan
+    command = parse_edit_command(message)
+    if command:
+        async for updated_history, download_file, rows, queue in edit_content_plan(
+                command, theme, generation_method, randomness, history, message, session_id):
+            yield updated_history, "", download_file, rows, queue
+        return
 
     # Check if user is asking to generate content
     if any(keyword in message.lower() for keyword in ["generate", "create", "make", "plan", "content"]):
         if not theme.strip():
             history.append({"role": "user", "content": message})
             history.append({"role": "assistant", "content": "Please enter a brand theme first using the sidebar options."})
-            return history, "", None
+            yield history, "", None, [], None
+            return
 
-        updated_history, download_file = generate_content_plan(theme, duration, generation_method, randomness, history, message)
-        return updated_history, "", download_file
+        async for updated_history, download_file, rows, queue in generate_content_plan(
+                theme, duration, generation_method, randomness, history, message, session_id):
+            yield updated_history, "", download_file, rows, queue
+        return
 
     # Handle general questions about the tool
     elif any(keyword in message.lower() for keyword in ["help", "how", "what", "?"]):
@@ -627,6 +966,14 @@ def chat_interface(message, history, theme, duration, generation_method, randomn
 4. **Set creativity level** (Low/Medium/High)
 5. **Type "generate"** or "create content plan" to start
 
+### ✏️ Editing Your Latest Plan:
+- **"regenerate day 5"** or **"regenerate days 3, 8 and 12"**: new captions and hashtags for those days
+- **"regenerate days matching morning"**: every day whose topic or caption mentions it
+- **"extend by 14 days"**: add days with fresh topics, keeping the ones you have
+
+### 🔁 Resuming:
+Progress is saved as days are generated. If a plan is interrupted (an error or a server restart), say **"resume"**, or **"resume"** followed by the run ID shown when it started, to continue from the last saved day.
+
 ---
 
 ### 🎯 Example Themes:
@@ -649,193 +996,237 @@ Just say **"generate"** when you're ready!
 """
         history.append({"role": "user", "content": message})
         history.append({"role": "assistant", "content": help_response})
-        return history, "", None
+        yield history, "", None, [], None
 
     else:
         # General conversation
         response = f"I'm here to help you create social media content plans! Set your brand theme in the sidebar and say 'generate' to create your content plan. Type 'help' for more information."
         history.append({"role": "user", "content": message})
         history.append({"role": "assistant", "content": response})
-        return history, "", None
-
-# Create the modern Gradio interface with dark theme
-with gr.Blocks(
-    title="🎯 Social Media Content Creator - AI Powered",
-    theme=gr.themes.Base(),
-    css=CUSTOM_CSS,
-    head="""
+        yield history, "", None, [], None
+
+def create_demo() -> gr.Blocks:
+    """Build the Gradio chat interface.
+
+    Not built at import: llama-cpp-workers spawns its model workers, and each
+    one imports the main script again, which need not build a UI every time.
+    """
+    # Create the modern Gradio interface with dark theme
+    with gr.Blocks(
+        title="🎯 Social Media Content Creator - AI Powered",
+        theme=gr.themes.Base(),
+        css=CUSTOM_CSS,
+        head="""
     <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&display=swap" rel="stylesheet">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     """
-) as demo:
+    ) as demo:
 
-    # Header section
-    with gr.Row(elem_classes="header-section fade-in"):
-        gr.HTML("""
+        # Header section
+        with gr.Row(elem_classes="header-section fade-in"):
+            gr.HTML("""
         <div style="text-align: center;">
             <h1>🎯 Social Media Content Creator</h1>
             <p>Generate engaging social media content plans for your brand using AI or rule-based generation</p>
         </div>
         """)
 
-    # Main content area
-    with gr.Row(elem_classes="main-container"):
-        # Settings sidebar
-        with gr.Column(scale=2, elem_classes="settings-card fade-in", min_width=400):
-            gr.HTML("""
+        # Main content area
+        with gr.Row(elem_classes="main-container"):
+            # Settings sidebar
+            with gr.Column(scale=2, elem_classes="settings-card fade-in", min_width=400):
+                gr.HTML("""
             <h3>⚙️ Settings</h3>
             """)
 
-            theme_input = gr.Textbox(
-                label="🎨 Brand Theme",
-                placeholder="e.g., Healthy Cooking, Travel Photography, Fitness Tips",
-                value="Fitness for Busy Professionals",
-                elem_classes="modern-input",
-                info="Define your brand's focus area for targeted content"
-            )
+                theme_input = gr.Textbox(
+                    label="🎨 Brand Theme",
+                    placeholder="e.g., Healthy Cooking, Travel Photography, Fitness Tips",
+                    value="Fitness for Busy Professionals",
+                    elem_classes="modern-input",
+                    info="Define your brand's focus area for targeted content"
+                )
 
-            duration_input = gr.Slider(
-                label="📅 Duration (days)",
-                minimum=1,
-                maximum=365,
-                value=30,
-                step=1,
-                elem_classes="modern-slider",
-                info="How many days of content to generate"
-            )
+                duration_input = gr.Slider(
+                    label="📅 Duration (days)",
+                    minimum=1,
+                    maximum=365,
+                    value=30,
+                    step=1,
+                    elem_classes="modern-slider",
+                    info="How many days of content to generate"
+                )
 
-            generation_method = gr.Radio(
-                label="🤖 Generation Method",
-                choices=["Rule-based (Fast)", "Model-based (TinyLlama)"],
-                value="Rule-based (Fast)",
-                elem_classes="modern-radio",
-                info="Choose between fast rule-based or AI-powered generation"
-            )
+                generation_method = gr.Radio(
+                    label="🤖 Generation Method",
+                    choices=["Rule-based (Fast)", "Model-based (TinyLlama)"],
+                    value="Rule-based (Fast)",
+                    elem_classes="modern-radio",
+                    info="Choose between fast rule-based or AI-powered generation"
+                )
 
-            randomness_level = gr.Radio(
-                label="🎲 Creativity Level",
-                choices=["Low", "Medium", "High"],
-                value="Medium",
-                elem_classes="modern-radio",
-                info="Control the variety and creativity of generated content"
-            )
+                randomness_level = gr.Radio(
+                    label="🎲 Creativity Level",
+                    choices=["Low", "Medium", "High"],
+                    value="Medium",
+                    elem_classes="modern-radio",
+                    info="Control the variety and creativity of generated content"
+                )
 
-            # Status indicator
-            status_display = gr.HTML("""
+                # Status indicator
+                status_display = gr.HTML("""
             <div class="status-indicator status-success">
                 <span>✅</span> Ready to generate content
             </div>
             """)
 
-        # Chat interface
-        with gr.Column(scale=4, elem_classes="chat-card fade-in"):
-            gr.HTML("""
+                # Polls the model warm-up until it has finished
+                warmup_timer = gr.Timer(2.0)
+
+            # Chat interface
+            with gr.Column(scale=4, elem_classes="chat-card fade-in"):
+                gr.HTML("""
             <h3>💬 Content Generation Chat</h3>
             """)
 
-            chatbot = gr.Chatbot(
-                height=600,
-                placeholder="👋 Welcome!Set your brand theme in the sidebar and type 'generate' to create your content plan.",
-                type="messages",
-                elem_classes="modern-chatbot",
-                avatar_images=("male-icon.svg", "chatbot-icon.svg"),
-                show_copy_button=True
-            )
-
-            with gr.Row():
-                msg = gr.Textbox(
-                    label="",
-                    placeholder="💬 Choose the prompt and press enter...",
-                    container=False,
-                    scale=4,
-                    elem_classes="modern-input"
-                )
-
-                send_btn = gr.Button(
-                    "Send 🚀",
-                    variant="primary",
-                    scale=1,
-                    elem_classes="modern-button"
+                chatbot = gr.Chatbot(
+                    height=600,
+                    placeholder="👋 Welcome!Set your brand theme in the sidebar and type 'generate' to create your content plan.",
+                    type="messages",
+                    elem_classes="modern-chatbot",
+                    avatar_images=("male-icon.svg", "chatbot-icon.svg"),
+                    show_copy_button=True
                 )
 
-            # Download section
-            with gr.Row():
-                download_file = gr.File(
-                    label="📁 Download Your Content Plan",
-                    visible=False,
-                    elem_classes="download-section"
-                )
-
-            # Example prompts
-            with gr.Row():
-                gr.Examples(
-                    examples=[
-                        ["generate"],
-                        ["create content plan"],
-                        ["help"],
-                        ["what can you do?"],
-                        ["show me examples"]
-                    ],
-                    inputs=msg,
-                    label="💡 Try these prompts:"
-                )
+                with gr.Row():
+                    msg = gr.Textbox(
+                        label="",
+                        placeholder="💬 Choose the prompt and press enter...",
+                        container=False,
+                        scale=4,
+                        elem_classes="modern-input"
+                    )
+
+                    send_btn = gr.Button(
+                        "Send 🚀",
+                        variant="primary",
+                        scale=1,
+                        elem_classes="modern-button"
+                    )
+
+                # Live table of days as they are generated
+                with gr.Row():
+                    live_table = gr.Dataframe(
+                        headers=COLUMNS,
+                        label="📊 Live Content Plan",
+                        visible=False,
+                        wrap=True,
+                        interactive=False
+                    )
+
+                # Download section
+                with gr.Row():
+                    download_file = gr.File(
+                        label="📁 Download Your Content Plan",
+                        visible=False,
+                        elem_classes="download-section"
+                    )
+
+                # Example prompts
+                with gr.Row():
+                    gr.Examples(
+                        examples=[
+                            ["generate"],
+                            ["create content plan"],
+                            ["help"],
+                            ["what can you do?"],
+                            ["show me examples"],
+                            ["regenerate day 2"],
+                            ["extend by 7 days"]
+                        ],
+                        inputs=msg,
+                        label="💡 Try these prompts:"
+                    )
     
-    # Handle message submission
-    def handle_message_submit(message, history, theme, duration, gen_method, randomness):
-        """Handle message submission with loading state."""
-        updated_history, cleared_msg, file_path = chat_interface(message, history, theme, duration, gen_method, randomness)
-
-        # Show download file if content was generated
-        if file_path:
-            return updated_history, cleared_msg, gr.File(value=file_path, visible=True)
-        else:
-            return updated_history, cleared_msg, gr.File(visible=False)
-
-    # Event handlers
-    msg.submit(
-        handle_message_submit,
-        inputs=[msg, chatbot, theme_input, duration_input, generation_method, randomness_level],
-        outputs=[chatbot, msg, download_file],
-        show_progress=True
-    )
+        # Handle message submission
+        async def handle_message_submit(message, history, theme, duration, gen_method, randomness, request: gr.Request):
+            """Handle message submission, streaming rows into the chat and live table and queue status into the sidebar."""
+            session_id = request.session_hash if request else None
+            async for updated_history, cleared_msg, file_path, rows, queue in chat_interface(
+                    message, history, theme, duration, gen_method, randomness, session_id):
+                table = live_table_update(rows)
+                status = format_queue_status(queue) if queue else update_status(theme, duration, gen_method, randomness)
+
+                # Show download file if content was generated
+                if file_path:
+                    yield updated_history, cleared_msg, gr.File(value=file_path, visible=True), table, status
+                else:
+                    yield updated_history, cleared_msg, gr.File(visible=False), table, status
+
+        # Event handlers
+        msg.submit(
+            handle_message_submit,
+            inputs=[msg, chatbot, theme_input, duration_input, generation_method, randomness_level],
+            outputs=[chatbot, msg, download_file, live_table, status_display],
+            show_progress=True,
+            concurrency_limit=None  # handlers are async; requests overlap on the event loop
+        )
 
-    send_btn.click(
-        handle_message_submit,
-        inputs=[msg, chatbot, theme_input, duration_input, generation_method, randomness_level],
-        outputs=[chatbot, msg, download_file],
-        show_progress=True
-    )
+        send_btn.click(
+            handle_message_submit,
+            inputs=[msg, chatbot, theme_input, duration_input, generation_method, randomness_level],
+            outputs=[chatbot, msg, download_file, live_table, status_display],
+            show_progress=True,
+            concurrency_limit=None  # handlers are async; requests overlap on the event loop
+        )
 
-    # Update status when settings change
-    def update_status(theme, duration, method, randomness):
-        if theme.strip():
-            method_emoji = "⚡" if "Rule-based" in method else "🤖"
-            randomness_emoji = {"Low": "🔒", "Medium": "⚖️", "High": "🎲"}.get(randomness, "⚖️")
-            return f"""
+        # Update status when settings change
+        def update_status(theme, duration, method, randomness):
+            model_status = format_model_status(get_warmup().status())
+            if theme.strip():
+                method_emoji = "⚡" if "Rule-based" in method else "🤖"
+                randomness_emoji = {"Low": "🔒", "Medium": "⚖️", "High": "🎲"}.get(randomness, "⚖️")
+                return f"""
             <div class="status-indicator status-success">
                 <span>✅</span> Ready to generate {duration} days of content for "{theme}" using {method_emoji} {method.split()[0]} with {randomness_emoji} {randomness} creativity
             </div>
-            """
-        else:
-            return """
+            """ + model_status
+            else:
+                return """
             <div class="status-indicator status-warning">
                 <span>⚠️</span> Please set a brand theme to continue
             </div>
-            """
+            """ + model_status
 
-    # Update status when inputs change
-    for input_component in [theme_input, duration_input, generation_method, randomness_level]:
-        input_component.change(
-            update_status,
+        def refresh_warmup_status(theme, duration, method, randomness):
+            """Show warm-up progress, and stop polling once the warm-up is over."""
+            loading = get_warmup().status()["state"] == WARMUP_LOADING
+            return update_status(theme, duration, method, randomness), gr.Timer(active=loading)
+
+        warmup_timer.tick(
+            refresh_warmup_status,
             inputs=[theme_input, duration_input, generation_method, randomness_level],
-            outputs=[status_display]
+            outputs=[status_display, warmup_timer]
         )
 
+        # Update status when inputs change
+        for input_component in [theme_input, duration_input, generation_method, randomness_level]:
+            input_component.change(
+                update_status,
+                inputs=[theme_input, duration_input, generation_method, randomness_level],
+                outputs=[status_display]
+            )
+
+    return demo
+
 if __name__ == "__main__":
     print("🚀 Starting Social Media Content Creator...")
     print("🎯 Modern Dark Theme UI Loaded")
     print("📱 Access the app at: http://localhost:7860")
 
+    demo = create_demo()
+    start_warmup()
+
     demo.launch(
         server_name="0.0.0.0",
         server_port=7860,
@@ -1,15 +1,26 @@
 import argparse
+import csv
+import json
 import os
-from typing import Dict, List, Optional, TypedDict
-
-import pandas as pd
-from langgraph.graph import END, START, StateGraph
+import re
+import time
+from typing import Annotated, Dict, List, Optional, Tuple, TypedDict
 
 # Import our custom nodes
-from nodes.day_planner import day_planner_node
-from nodes.content_generator import content_generator_node
-from nodes.formatter import formatter_node
-from nodes.save import save_node
+from nodes.day_planner import aday_planner_node, day_planner_node
+from nodes.editing import extend_plan, load_plan, regenerate_days, select_days
+from nodes.content_generator import (DEFAULT_BATCH_SIZE, acontent_branch_node, acontent_generator_node,
+                                     content_branch_node, content_generator_node, fan_out_topics, merge_content,
+                                     route_after_content)
+from nodes.checkpoints import (CHECKPOINT_DURABILITY, DEFAULT_CHECKPOINT_DAYS, new_run_id, open_checkpointer,
+                               run_config)
+from nodes.formatter import ContentTable, aformatter_node, formatter_node, plan_columns
+from nodes.save import asave_node, save_node
+from nodes.metrics import collect_run_metrics, format_summary, format_worker_stats, instrument_node, measure_node
+from nodes.sinks import EXTENSIONS, make_sink
+from nodes.llm_cache import get_completion_cache, reset_completion_cache, set_cache_enabled
+from nodes.model_utils import BACKENDS, backend_options_from_env, configure_backend, get_backend
+from nodes.platforms import PLATFORMS, validate_platforms
 
 # Define the state type
 class State(TypedDict):
@@ -17,32 +28,340 @@ class State(TypedDict):
     brand_theme: str
     duration: int
     topics: Optional[List[str]]
-    content: Optional[List[Dict]]
-    formatted_content: Optional[pd.DataFrame]
-    output_path: str
+    # Merged by day, so parallel fan-out branches can each add their own days
+    content: Annotated[Optional[List[Dict]], merge_content]
+    formatted_content: Optional[ContentTable]
+    output_path: Optional[str]
+    output_format: Optional[str]
+    output_bytes: Optional[bytes]
     use_model: bool
     randomness: str
+    batch_size: Optional[int]
+    seed: Optional[int]
+    session_id: Optional[str]
+    priority: Optional[int]
+    checkpoint_every: Optional[int]
+    fan_out: Optional[int]
+    platforms: Optional[List[str]]
+
+def build_graph(asynchronous: bool = False, checkpointer=None):
+    """Build and compile the LangGraph workflow.
+
+    Args:
+        asynchronous: Use the async node variants, for running the graph with
+            ainvoke/astream from an event loop. Model calls then run on a
+            dedicated executor instead of blocking the loop.
+        checkpointer: LangGraph checkpointer that saves the state after every
+            step (see nodes.checkpoints), so an interrupted run can be resumed
+            by its thread ID. Runs then need a config from run_config().
+    """
+    from langgraph.graph import END, START, StateGraph
 
-def build_graph() -> StateGraph:
-    """Build the LangGraph workflow."""
     # Initialize the graph
     workflow = StateGraph(State)
     
     # Add nodes
-    workflow.add_node("day_planner", day_planner_node)
-    workflow.add_node("content_generator", content_generator_node)
-    workflow.add_node("formatter", formatter_node)
-    workflow.add_node("save", save_node)
+    if asynchronous:
+        nodes = {"day_planner": aday_planner_node, "content_generator": acontent_generator_node,
+                 "formatter": aformatter_node, "save": asave_node}
+    else:
+        nodes = {"day_planner": day_planner_node, "content_generator": content_generator_node,
+                 "formatter": formatter_node, "save": save_node}
+    for name, node in nodes.items():
+        workflow.add_node(name, instrument_node(name)(node))
+    # Fan-out branches are retried one by one when the model fails on a topic
+    workflow.add_node("content_branch", instrument_node("content_branch")(
+        acontent_branch_node if asynchronous else content_branch_node))
     
     # Define the edges
     workflow.add_edge(START, "day_planner")
-    workflow.add_edge("day_planner", "content_generator")
-    workflow.add_edge("content_generator", "formatter")
+    # Content comes from the content generator, or from parallel branches when state["fan_out"] is set
+    workflow.add_conditional_edges("day_planner", fan_out_topics, ["content_generator", "content_branch"])
+    # Long plans loop through the content generator a chunk of days at a time
+    workflow.add_conditional_edges("content_generator", route_after_content, ["content_generator", "formatter"])
+    workflow.add_edge("content_branch", "formatter")
     workflow.add_edge("formatter", "save")
     workflow.add_edge("save", END)
     
     # Compile the graph
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
+
+def run_pipeline(initial_state: Dict) -> Dict:
+    """Run the nodes one after another without LangGraph.
+
+    The workflow is a straight line, so this gives the same plan as
+    graph.invoke. Rule-based CLI runs use it to skip importing and compiling
+    LangGraph, which would otherwise take most of their start-up time.
+    """
+    state = dict(initial_state)
+    for name, node in [("day_planner", day_planner_node), ("content_generator", content_generator_node),
+                       ("formatter", formatter_node), ("save", save_node)]:
+        state = instrument_node(name)(node)(state)
+    return state
+
+def run_streaming(graph, initial_state: Dict, config: Optional[Dict] = None, resume: bool = False) -> Dict:
+    """Run the graph, appending each content row to <output>.partial as it is produced.
+
+    The partial CSV shows progress while the plan is generated, in day order
+    even when fan-out branches finish out of order; the save node
+    then writes the finished plan to the output path in one atomic step and
+    the partial file is removed. When resuming, initial_state is the
+    checkpointed state and the days it already has are written first.
+    """
+    partial_path = initial_state["output_path"] + ".partial"
+    os.makedirs(os.path.dirname(partial_path) if os.path.dirname(partial_path) else ".", exist_ok=True)
+    
+    final_state = initial_state
+    with open(partial_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=plan_columns(initial_state.get("platforms")), lineterminator=os.linesep)
+        writer.writeheader()
+        rows = {row["day"]: row for row in initial_state.get("content") or []} if resume else {}
+        writer.writerows(rows[day] for day in sorted(rows))
+        last_day = max(rows, default=0)
+        
+        for mode, chunk in graph.stream(None if resume else initial_state, config, stream_mode=["custom", "values"],
+                                        durability=CHECKPOINT_DURABILITY):
+            if mode == "custom" and "row" in chunk:
+                row = chunk["row"]
+                rows[row["day"]] = row
+                if row["day"] > last_day:
+                    last_day = row["day"]
+                    writer.writerow(row)
+                else:
+                    # Fan-out branches finish out of order; rewrite the file to keep it in day order
+                    f.seek(0)
+                    f.truncate()
+                    writer.writeheader()
+                    writer.writerows(rows[day] for day in sorted(rows))
+                f.flush()
+                print(f"  Day {row['day']}/{chunk['total']}: {row['topic']}")
+            elif mode == "values":
+                final_state = chunk
+    
+    os.remove(partial_path)
+    return final_state
+
+# Compiled graph reused by every request a batch worker process handles
+_worker_graph = None
+
+def _init_batch_worker(cache_enabled: bool, backend_options: Dict) -> None:
+    """Set up a batch worker process: compile the graph once for all its requests."""
+    global _worker_graph
+    # A forked worker inherits the parent's cache connection (opened by --clear-cache)
+    reset_completion_cache()
+    set_cache_enabled(cache_enabled)
+    configure_backend(**backend_options)
+    _worker_graph = build_graph()
+
+def _run_batch_request(initial_state: Dict) -> Dict:
+    """Run one plan request inside a batch worker and describe the result for the manifest."""
+    start = time.perf_counter()
+    entry = {
+        "id": initial_state["request_id"],
+        "line": initial_state["request_line"],
+        "theme": initial_state["brand_theme"],
+        "duration": initial_state["duration"],
+        "output_path": None,
+        "status": "ok",
+        "error": None,
+    }
+    try:
+        final_state = _worker_graph.invoke(initial_state)
+        entry["output_path"] = final_state["output_path"]
+        entry["rows"] = len(final_state["content"])
+    except Exception as e:
+        entry["status"] = "error"
+        entry["error"] = str(e)
+    entry["seconds"] = round(time.perf_counter() - start, 3)
+    entry["worker_pid"] = os.getpid()
+    return entry
+
+def load_batch_requests(path: str, args: argparse.Namespace) -> Tuple[List[Dict], List[Dict]]:
+    """Read plan requests from a JSONL file into initial graph states.
+
+    Each line is a JSON object. Recognised fields are id, theme, duration,
+    method ("model" or "rule-based"), randomness, seed, output, format and
+    platforms; missing fields fall back to the command line arguments.
+
+    Returns:
+        The initial states of the valid requests, and a manifest entry for
+        each request that was rejected (invalid JSON or fields, or an output
+        path another request already writes to)
+    """
+    output_dir = args.output_dir
+    default_use_model = not args.rule_based if args.rule_based else args.use_model
+    states = []
+    rejected = []
+    used_paths: Dict[str, str] = {}
+    
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            request_id = f"request-{line_number}"
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("a request must be a JSON object")
+                request_id = str(request.get("id") or request.get("request_id") or request_id)
+                state = make_batch_state(request, request_id, line_number, args, default_use_model)
+                
+                # Default output names come from sanitised ids, which can clash; number the later ones
+                output_path = request.get("output")
+                if output_path is None:
+                    stem = os.path.join(output_dir, re.sub(r"[^A-Za-z0-9_.-]+", "_", request_id))
+                    extension = EXTENSIONS[state["output_format"] or "csv"]
+                    output_path = stem + extension
+                    suffix = 2
+                    while os.path.abspath(output_path) in used_paths:
+                        output_path = f"{stem}-{suffix}{extension}"
+                        suffix += 1
+                elif os.path.abspath(output_path) in used_paths:
+                    raise ValueError(f"output {output_path} is already written by request "
+                                     f"'{used_paths[os.path.abspath(output_path)]}'")
+                used_paths[os.path.abspath(output_path)] = request_id
+                state["output_path"] = output_path
+                states.append(state)
+            except (ValueError, TypeError) as e:
+                rejected.append({"id": request_id, "line": line_number, "output_path": None,
+                                 "status": "error", "error": f"Invalid request on line {line_number}: {e}"})
+    
+    return states, rejected
+
+def make_batch_state(request: Dict, request_id: str, line_number: int, args: argparse.Namespace,
+                     default_use_model: bool) -> Dict:
+    """Build the initial graph state for one batch request (without its output path).
+
+    Raises:
+        ValueError: A field has an invalid value
+    """
+    output_format = request.get("format") or args.format
+    if output_format is not None and output_format not in EXTENSIONS:
+        raise ValueError(f"unknown format '{output_format}'. Choose from: {', '.join(EXTENSIONS)}")
+    method = request.get("method")
+    if method not in (None, "model", "rule-based"):
+        raise ValueError(f"unknown method '{method}'. Choose from: model, rule-based")
+    randomness = request.get("randomness", args.randomness)
+    if randomness not in ("low", "medium", "high"):
+        raise ValueError(f"unknown randomness '{randomness}'. Choose from: low, medium, high")
+    duration = request.get("duration")
+    if duration is None:
+        duration = args.duration if args.duration is not None else 30
+    try:
+        duration = int(duration)
+    except (TypeError, ValueError):
+        raise ValueError(f"duration must be a whole number of days, not {duration!r}")
+    if duration < 1:
+        raise ValueError(f"duration must be at least 1 day, not {duration}")
+    platforms = request.get("platforms") or args.platforms
+    if isinstance(platforms, str):
+        platforms = [platforms]
+    
+    return {
+        "request_id": request_id,
+        "request_line": line_number,
+        "brand_theme": request.get("theme") or request.get("brand_theme") or request.get("title")
+                       or args.theme or "Fitness for Busy Professionals",
+        "duration": duration,
+        "output_path": None,
+        "output_format": output_format,
+        "use_model": default_use_model if method is None else method == "model",
+        "randomness": randomness,
+        "batch_size": args.batch_size,
+        "seed": request.get("seed", args.seed),
+        "platforms": validate_platforms(platforms),
+        "topics": None,
+        "content": None,
+        "formatted_content": None
+    }
+
+def get_backend_options(args: argparse.Namespace) -> Dict:
+    """Combine the backend flags with the LLM_* environment variables; flags win."""
+    options = backend_options_from_env()
+    if args.backend and args.backend != options["name"]:
+        options = {"name": args.backend}
+    if args.backend_url:
+        options["base_url"] = args.backend_url
+    if args.backend_model:
+        options["model"] = args.backend_model
+    if options["name"] == "llama-cpp-workers":
+        if args.workers:
+            options["workers"] = args.workers
+        if args.threads:
+            options["threads"] = args.threads
+        if args.mlock:
+            options["mlock"] = True
+    return options
+
+def run_batch(args: argparse.Namespace, backend_options: Dict) -> None:
+    """Generate every plan in a JSONL file across a pool of worker processes."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    states, entries = load_batch_requests(args.batch, args)
+    jobs = max(1, min(args.jobs or os.cpu_count() or 1, len(states) or 1))
+    os.makedirs(args.output_dir, exist_ok=True)
+    
+    for entry in entries:
+        print(f"  [{entry['id']}] skipped: {entry['error']}")
+    print(f"\nGenerating {len(states)} content plans with {jobs} worker processes...")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_batch_worker,
+                             initargs=(not args.no_cache, backend_options)) as executor:
+        for entry in executor.map(_run_batch_request, states):
+            entries.append(entry)
+            if entry["status"] == "ok":
+                print(f"  [{entry['id']}] {entry['rows']} days -> {entry['output_path']} ({entry['seconds']}s)")
+            else:
+                print(f"  [{entry['id']}] failed: {entry['error']}")
+    
+    manifest = {
+        "source": os.path.abspath(args.batch),
+        "jobs": jobs,
+        "seconds": round(time.perf_counter() - start, 3),
+        "succeeded": sum(entry["status"] == "ok" for entry in entries),
+        "failed": sum(entry["status"] != "ok" for entry in entries),
+        "requests": sorted(entries, key=lambda entry: entry["line"]),
+    }
+    manifest_path = os.path.join(args.output_dir, "manifest.json")
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    
+    print(f"{manifest['succeeded']} plans generated, {manifest['failed']} failed. Manifest saved to {os.path.abspath(manifest_path)}")
+
+def run_edit(args: argparse.Namespace, use_model: bool) -> None:
+    """Edit a saved plan in place of a full run: regenerate some of its days and/or extend it.
+
+    Only the selected days (and the new ones) are generated; the rest of the
+    plan is copied from the file as it is. The result replaces the file
+    unless --output names another one.
+    """
+    table = load_plan(args.from_path)
+    state = {
+        "brand_theme": args.theme,
+        "use_model": use_model,
+        "randomness": args.randomness,
+        "batch_size": args.batch_size,
+        "seed": args.seed,
+    }
+    output = args.output or args.from_path
+    print(f"\nEditing the {len(table)}-day plan in {args.from_path} (theme: '{args.theme}')...")
+    print(f"Using {'model-based' if use_model else 'rule-based'} generation with {args.randomness} randomness")
+    
+    with collect_run_metrics() as run_metrics:
+        if args.regenerate_day or args.regenerate_matching:
+            indices = select_days(table, args.regenerate_day or (), args.regenerate_matching)
+            print(f"Regenerating {len(indices)} of {len(table)} days")
+            with measure_node("regenerate"):
+                table = regenerate_days(table, indices, state)
+        if args.extend:
+            print(f"Extending the plan by {args.extend} days")
+            with measure_node("extend"):
+                table = extend_plan(table, args.extend, state)
+        with measure_node("save"):
+            location = make_sink(output, args.format).write(table)
+    
+    print(f"Content plan saved to {location}")
+    print(f"\n{format_summary(run_metrics)}\n")
 
 def get_user_input():
     """Get user input for theme and duration."""
@@ -109,44 +428,162 @@ def main():
     parser.add_argument("--rule-based", action="store_true", help="Use rule-based generation")
     parser.add_argument("--randomness", type=str, choices=["low", "medium", "high"], default="medium", 
                         help="Set randomness level for generation (default: medium)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Number of topics the model generates together (1 disables batching, default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--seed", type=int, help="Seed for rule-based generation, for reproducible plans")
+    parser.add_argument("--format", type=str, choices=list(EXTENSIONS),
+                        help="Output format (default: from the output file extension, otherwise csv)")
+    parser.add_argument("--stream", action="store_true", help="Append rows to <output>.partial as each day is generated")
+    parser.add_argument("--platforms", type=str, nargs="+", choices=list(PLATFORMS), metavar="PLATFORM",
+                        help=f"Write a post per platform ({', '.join(PLATFORMS)}) from one completion per topic, "
+                             "one column each")
+    parser.add_argument("--checkpoint-every", type=int, default=DEFAULT_CHECKPOINT_DAYS, metavar="DAYS",
+                        help=f"Save the progress of graph runs every DAYS days (0: only between nodes, default: {DEFAULT_CHECKPOINT_DAYS})")
+    parser.add_argument("--fan-out", type=int, nargs="?", const=DEFAULT_BATCH_SIZE, metavar="DAYS",
+                        help="Generate content in parallel graph branches of DAYS days each, retrying a failed "
+                             f"branch on its own (default DAYS: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--resume", type=str, metavar="RUN_ID",
+                        help="Continue an interrupted run from its last checkpoint")
+    parser.add_argument("--backend", type=str, choices=list(BACKENDS),
+                        help="LLM backend for model-based generation (default: llama-cpp, or $LLM_BACKEND)")
+    parser.add_argument("--backend-url", type=str, help="Base URL of the OpenAI-compatible server for --backend openai")
+    parser.add_argument("--backend-model", type=str, help="Model name to request from the OpenAI-compatible server")
+    parser.add_argument("--workers", type=int,
+                        help="Model worker processes for --backend llama-cpp-workers (default: 2, or $LLM_WORKERS)")
+    parser.add_argument("--threads", type=int,
+                        help="Threads shared out between the model workers (default: CPU count, or $LLM_THREADS)")
+    parser.add_argument("--mlock", action="store_true",
+                        help="Lock the memory-mapped model in RAM for --backend llama-cpp-workers")
+    parser.add_argument("--from", type=str, dest="from_path", metavar="PLAN",
+                        help="Edit a saved plan (csv, jsonl or parquet) instead of generating a new one; needs --theme")
+    parser.add_argument("--regenerate-day", type=int, nargs="+", metavar="DAY",
+                        help="With --from: write new content for these days")
+    parser.add_argument("--regenerate-matching", type=str, metavar="PATTERN",
+                        help="With --from: write new content for days whose topic or caption matches this regex")
+    parser.add_argument("--extend", type=int, metavar="DAYS",
+                        help="With --from: add this many days, with topics not already in the plan")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the LLM completion cache for this run")
+    parser.add_argument("--clear-cache", action="store_true", help="Clear the LLM completion cache before running")
+    parser.add_argument("--batch", type=str, metavar="REQUESTS_JSONL",
+                        help="Generate one plan per line of a JSONL file of plan requests")
+    parser.add_argument("--jobs", type=int, help="Worker processes for --batch (default: CPU count)")
+    parser.add_argument("--output-dir", type=str, default="output",
+                        help="Directory for --batch plans and manifest.json (default: output)")
     args = parser.parse_args()
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+    if args.duration is not None and args.duration < 1:
+        parser.error("--duration must be at least 1 day")
+    
+    # Configure the completion cache
+    if args.clear_cache:
+        removed = get_completion_cache().clear()
+        print(f"Cleared {removed} cached completions")
+    set_cache_enabled(not args.no_cache)
+    
+    # Select the LLM backend
+    backend_options = get_backend_options(args)
+    configure_backend(**backend_options)
     
-    # Determine if we should use interactive mode
-    interactive_mode = args.interactive or (args.theme is None and args.duration is None)
+    if args.batch:
+        run_batch(args, backend_options)
+        return
     
-    if interactive_mode:
-        # Get user input interactively
-        theme, duration, output, use_model, randomness = get_user_input()
+    if args.from_path:
+        if not args.theme:
+            parser.error("--from needs --theme, the brand theme of the saved plan")
+        if not (args.regenerate_day or args.regenerate_matching or args.extend):
+            parser.error("--from needs --regenerate-day, --regenerate-matching or --extend")
+        try:
+            run_edit(args, not args.rule_based if args.rule_based else args.use_model)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        return
+    
+    run_input: Optional[Dict]
+    if args.resume:
+        # Pick the run up from its last checkpoint, with the settings it was started with
+        graph = build_graph(checkpointer=open_checkpointer())
+        snapshot = graph.get_state({"configurable": {"thread_id": args.resume}})
+        if not snapshot.values or not snapshot.next:
+            parser.error(f"No unfinished run '{args.resume}' to resume (finished runs are not kept)")
+        initial_state = snapshot.values
+        run_input = None
+        run_id = args.resume
+        use_model = initial_state["use_model"]
+        done = len(initial_state.get("content") or [])
+        print(f"\nResuming run {run_id} for theme '{initial_state['brand_theme']}': "
+              f"{done} of {initial_state['duration']} days were already generated...")
     else:
-        # Use command line arguments or defaults
-        theme = args.theme or "Fitness for Busy Professionals"
-        duration = args.duration or 30
-        output = args.output or "content_calendar.csv"
-        # Determine generation method (rule-based flag takes precedence if both are specified)
-        use_model = not args.rule_based if args.rule_based else args.use_model
-        randomness = args.randomness
-    
-    # Build the graph
-    graph = build_graph()
-    
-    # Initialize the state
-    initial_state = {
-        "brand_theme": theme,
-        "duration": duration,
-        "output_path": output,
-        "use_model": use_model,
-        "randomness": randomness,
-        "topics": None,
-        "content": None,
-        "formatted_content": None
-    }
+        # Determine if we should use interactive mode
+        interactive_mode = args.interactive or (args.theme is None and args.duration is None)
+        
+        if interactive_mode:
+            # Get user input interactively
+            theme, duration, output, use_model, randomness = get_user_input()
+        else:
+            # Use command line arguments or defaults
+            theme = args.theme or "Fitness for Busy Professionals"
+            duration = args.duration or 30
+            output = args.output or "content_calendar.csv"
+            # Determine generation method (rule-based flag takes precedence if both are specified)
+            use_model = not args.rule_based if args.rule_based else args.use_model
+            randomness = args.randomness
+        
+        # Build the graph; rule-based runs without streaming or fan-out do not need it
+        graph = build_graph(checkpointer=open_checkpointer()) if use_model or args.stream or args.fan_out else None
+        run_id = new_run_id(theme) if graph is not None else None
+        checkpoint_every = (args.checkpoint_every or None) if run_id else None
+        
+        # Initialize the state
+        initial_state = {
+            "brand_theme": theme,
+            "duration": duration,
+            "output_path": output,
+            "output_format": args.format,
+            "use_model": use_model,
+            "randomness": randomness,
+            "batch_size": args.batch_size,
+            "seed": args.seed,
+            "checkpoint_every": checkpoint_every,
+            "fan_out": args.fan_out or None,
+            "platforms": validate_platforms(args.platforms),
+            "topics": None,
+            "content": None,
+            "formatted_content": None
+        }
+        run_input = initial_state
+        
+        print(f"\nGenerating {duration}-day content plan for theme: '{theme}'...")
+        print(f"Using {'model-based' if use_model else 'rule-based'} generation with {randomness} randomness")
+        if run_id:
+            print(f"Run ID: {run_id} (if the run is interrupted, continue it with --resume {run_id})")
     
     # Run the graph
-    print(f"\nGenerating {duration}-day content plan for theme: '{theme}'...")
-    print(f"Using {'model-based' if use_model else 'rule-based'} generation with {randomness} randomness")
-    final_state = graph.invoke(initial_state)
+    config = run_config(run_id, initial_state["duration"], initial_state.get("checkpoint_every")) if run_id else None
+    with collect_run_metrics() as run_metrics:
+        if args.stream:
+            final_state = run_streaming(graph, initial_state, config, resume=run_input is None)
+        elif graph is not None:
+            final_state = graph.invoke(run_input, config, durability=CHECKPOINT_DURABILITY)
+        else:
+            final_state = run_pipeline(initial_state)
+    
+    # The run is complete; its checkpoints are no longer needed
+    if run_id:
+        graph.checkpointer.delete_thread(run_id)
     
     print(f"Content plan saved to {final_state['output_path']}")
+    print(f"\n{format_summary(run_metrics)}\n")
+    
+    # Per-worker throughput when the model runs in worker processes
+    workers = getattr(get_backend(), "worker_stats", lambda: [])()
+    if workers:
+        print(f"{format_worker_stats(workers)}\n")
+    
+    if use_model and not args.no_cache:
+        stats = get_completion_cache().stats()
+        print(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries stored")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
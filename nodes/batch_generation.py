@@ -0,0 +1,360 @@
+"""Batched multi-sequence generation on top of llama.cpp.
+
+LlamaCpp (and llama_cpp.Llama) only decode one prompt at a time. For a
+content plan every topic prompt is independent, so here we open a scratch
+context on the already-loaded model, give each prompt its own sequence id and
+decode all of them together: prompt tokens are evaluated in shared batches
+and each decoding step advances every unfinished sequence with a single
+llama_decode call.
+
+The scratch context is kept with its model and reused by later calls that
+need one of the same size, so a plan does not allocate and free a context
+(and its KV cache) for every batch.
+
+Prompts built from one template share a long token prefix (the instructions
+and brand theme). That prefix is evaluated once, copied to every sequence,
+and its KV state is kept so later batches of the same plan restore it
+instead of evaluating it again.
+"""
+import ctypes
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from nodes import metrics
+
+
+# Shared prefixes shorter than this are evaluated with each sequence instead
+MIN_SHARED_PREFIX = 16
+
+# Number of saved prefix KV states kept, least recently used evicted first
+PREFIX_CACHE_SIZE = 8
+
+# Smallest n_batch for prompt evaluation; LangChain loads models with n_batch=8
+MIN_BATCH_TOKENS = 512
+
+_prefix_states: "OrderedDict[Tuple, bytes]" = OrderedDict()
+_prefix_lock = threading.Lock()
+
+# Scratch context of each model, with the (n_ctx, n_batch, n_seq) it was created for
+_contexts: "weakref.WeakKeyDictionary[Any, Tuple[Tuple[int, int, int], Any]]" = weakref.WeakKeyDictionary()
+_contexts_lock = threading.Lock()
+
+
+def shared_prefix_length(token_lists: List[List[int]]) -> int:
+    """Length of the token prefix common to every list, leaving each at least one token of its own."""
+    shortest = min(len(tokens) for tokens in token_lists)
+    length = 0
+    while length < shortest - 1 and all(tokens[length] == token_lists[0][length] for tokens in token_lists):
+        length += 1
+    return length
+
+
+def _save_prefix_state(ctx, key: Tuple) -> None:
+    """Store sequence 0's KV state under key."""
+    import llama_cpp
+
+    size = llama_cpp.llama_state_seq_get_size(ctx, 0)
+    buffer = (ctypes.c_uint8 * size)()
+    written = llama_cpp.llama_state_seq_get_data(ctx, buffer, size, 0)
+    if not written:
+        return
+    with _prefix_lock:
+        _prefix_states[key] = bytes(buffer[:written])
+        while len(_prefix_states) > PREFIX_CACHE_SIZE:
+            _prefix_states.popitem(last=False)
+
+
+def _restore_prefix_state(ctx, key: Tuple) -> bool:
+    """Load a saved KV state into sequence 0; return whether one was found and loaded."""
+    import llama_cpp
+
+    with _prefix_lock:
+        state = _prefix_states.get(key)
+        if state is not None:
+            _prefix_states.move_to_end(key)
+    if state is None:
+        return False
+    buffer = (ctypes.c_uint8 * len(state)).from_buffer_copy(state)
+    return llama_cpp.llama_state_seq_set_data(ctx, buffer, len(state), 0) > 0
+
+
+def clear_prefix_cache() -> None:
+    """Drop every saved prefix KV state, e.g. after unloading models."""
+    with _prefix_lock:
+        _prefix_states.clear()
+
+
+def _new_context(llama, n_ctx: int, n_batch: int, n_seq: int):
+    """Create a llama.cpp context with room for n_seq parallel sequences."""
+    import llama_cpp
+
+    params = llama_cpp.llama_context_default_params()
+    params.n_ctx = n_ctx
+    params.n_batch = n_batch
+    if hasattr(params, "n_ubatch"):
+        params.n_ubatch = n_batch
+    if hasattr(params, "n_seq_max"):
+        params.n_seq_max = n_seq
+    # Reuse the threading setup of the pooled model
+    base_params = getattr(llama, "context_params", None)
+    if base_params is not None:
+        params.n_threads = base_params.n_threads
+        params.n_threads_batch = base_params.n_threads_batch
+
+    if hasattr(llama_cpp, "llama_init_from_model"):
+        ctx = llama_cpp.llama_init_from_model(llama.model, params)
+    else:
+        ctx = llama_cpp.llama_new_context_with_model(llama.model, params)
+    if not ctx:
+        raise RuntimeError("Failed to create llama.cpp context for batched generation")
+    return ctx
+
+
+def _scratch_context(llama, n_ctx: int, n_batch: int, n_seq: int):
+    """Get an empty scratch context for the model, reusing its last one if that has the same shape.
+
+    Callers hold the model's lock, so a model's context is never used by two generations at once.
+    """
+    import llama_cpp
+
+    shape = (n_ctx, n_batch, n_seq)
+    with _contexts_lock:
+        entry = _contexts.get(llama)
+    if entry is not None and entry[0] == shape:
+        llama_cpp.llama_memory_clear(llama_cpp.llama_get_memory(entry[1]), True)
+        return entry[1]
+
+    if entry is not None:
+        with _contexts_lock:
+            _contexts.pop(llama, None)
+        llama_cpp.llama_free(entry[1])
+    ctx = _new_context(llama, n_ctx=n_ctx, n_batch=n_batch, n_seq=n_seq)
+    with _contexts_lock:
+        _contexts[llama] = (shape, ctx)
+    return ctx
+
+
+def release_contexts(llama=None) -> None:
+    """Free the scratch context of a model (of every model when omitted); call before the model is closed."""
+    import llama_cpp
+
+    with _contexts_lock:
+        models = [llama] if llama is not None else list(_contexts.keys())
+        entries = [_contexts.pop(model, None) for model in models]
+    for entry in entries:
+        if entry is not None:
+            llama_cpp.llama_free(entry[1])
+
+
+def max_parallel_sequences() -> int:
+    """Upper bound on sequences per context supported by the installed llama.cpp."""
+    import llama_cpp
+
+    if hasattr(llama_cpp, "llama_max_parallel_sequences"):
+        return int(llama_cpp.llama_max_parallel_sequences())
+    return 64
+
+
+def _sample(logits: np.ndarray, temperature: float, top_p: float, rng: np.random.Generator) -> int:
+    """Sample a token id from raw logits with temperature and nucleus filtering."""
+    if temperature <= 0:
+        return int(np.argmax(logits))
+
+    scaled = logits.astype(np.float64) / temperature
+    scaled -= scaled.max()
+    probs = np.exp(scaled)
+    probs /= probs.sum()
+
+    if top_p < 1.0:
+        order = np.argsort(-probs)
+        cumulative = np.cumsum(probs[order])
+        keep = order[: int(np.searchsorted(cumulative, top_p)) + 1]
+        return int(rng.choice(keep, p=probs[keep] / probs[keep].sum()))
+
+    return int(rng.choice(len(probs), p=probs))
+
+
+def _grammar_filter(sampler, logits: np.ndarray, candidates, view: np.ndarray) -> np.ndarray:
+    """Return a copy of logits with the tokens the grammar rejects set to -inf."""
+    import llama_cpp
+
+    view["logit"] = logits
+    array = llama_cpp.llama_token_data_array(candidates, len(logits), -1, False)
+    llama_cpp.llama_sampler_apply(sampler, ctypes.byref(array))
+    return view["logit"].copy()
+
+
+def generate_batch(
+    llama,
+    prompts: List[str],
+    max_tokens: int = 256,
+    temperature: float = 0.7,
+    top_p: float = 1.0,
+    stop: Optional[List[str]] = None,
+    seed: Optional[int] = None,
+    grammar: Optional[str] = None,
+    n_batch: Optional[int] = None,
+) -> List[str]:
+    """Generate a completion for every prompt, decoding them as parallel sequences.
+
+    Args:
+        llama: A loaded llama_cpp.Llama instance (LlamaCpp.client)
+        prompts: The prompts to complete; one sequence is used per prompt
+        max_tokens: Maximum number of tokens to generate per prompt
+        temperature: Sampling temperature (0 for greedy decoding)
+        top_p: Nucleus sampling threshold
+        stop: Strings that end a completion when generated
+        seed: Seed for the sampler
+        grammar: A GBNF grammar every completion must follow
+        n_batch: Tokens per llama_decode call during prompt evaluation. By
+            default the model's own n_batch, but at least MIN_BATCH_TOKENS,
+            since models loaded without a profile have LangChain's tiny default
+
+    Returns:
+        The completions, in the same order as the prompts.
+
+    Raises:
+        RuntimeError: If llama.cpp cannot create the context or decode a batch.
+        ValueError: If the grammar cannot be parsed.
+    """
+    import llama_cpp
+
+    if not prompts:
+        return []
+
+    stop = stop or []
+    n_seq = len(prompts)
+    if n_seq > max_parallel_sequences():
+        raise ValueError(f"Cannot decode {n_seq} sequences in one context")
+
+    prompt_tokens = [llama.tokenize(prompt.encode("utf-8"), add_bos=True) for prompt in prompts]
+    # llama.cpp pads contexts to multiples of 256 and splits them evenly between sequences
+    n_ctx_seq = max(len(tokens) for tokens in prompt_tokens) + max_tokens
+    n_ctx_seq = -(-n_ctx_seq // 256) * 256
+    if n_batch is None:
+        n_batch = max(getattr(llama, "n_batch", MIN_BATCH_TOKENS), MIN_BATCH_TOKENS)
+    n_batch = max(n_batch, n_seq)
+    n_vocab = llama.n_vocab()
+    eos_token = llama.token_eos()
+    rng = np.random.default_rng(seed)
+
+    # One grammar state per sequence; candidates is scratch space for applying them
+    samplers = []
+    if grammar:
+        vocab = llama_cpp.llama_model_get_vocab(llama.model)
+        for _ in prompts:
+            sampler = llama_cpp.llama_sampler_init_grammar(vocab, grammar.encode("utf-8"), b"root")
+            if not sampler:
+                for sampler in samplers:
+                    llama_cpp.llama_sampler_free(sampler)
+                raise ValueError("Failed to parse grammar for batched generation")
+            samplers.append(sampler)
+        candidates = (llama_cpp.llama_token_data * n_vocab)()
+        view = np.ctypeslib.as_array(candidates)
+        view["id"] = np.arange(n_vocab)
+
+    def sample(seq: int, logits: np.ndarray) -> int:
+        if samplers:
+            logits = _grammar_filter(samplers[seq], logits, candidates, view)
+        return _sample(logits, temperature, top_p, rng)
+
+    ctx = _scratch_context(llama, n_ctx=n_ctx_seq * n_seq, n_batch=n_batch, n_seq=n_seq)
+    batch = llama_cpp.llama_batch_init(n_batch, 0, 1)
+    try:
+        def decode(entries):
+            """Decode (seq, pos, token, want_logits) entries; return logits row per sequence."""
+            for i, (seq, pos, token, want_logits) in enumerate(entries):
+                batch.token[i] = token
+                batch.pos[i] = pos
+                batch.n_seq_id[i] = 1
+                batch.seq_id[i][0] = seq
+                batch.logits[i] = want_logits
+            batch.n_tokens = len(entries)
+            status = llama_cpp.llama_decode(ctx, batch)
+            if status != 0:
+                raise RuntimeError(f"llama_decode failed with status {status}")
+
+            rows = {}
+            for i, (seq, _, _, want_logits) in enumerate(entries):
+                if want_logits:
+                    pointer = llama_cpp.llama_get_logits_ith(ctx, i)
+                    rows[seq] = np.ctypeslib.as_array(
+                        ctypes.cast(pointer, ctypes.POINTER(ctypes.c_float)), shape=(n_vocab,)
+                    )
+            return rows
+
+        prefill_start = time.perf_counter()
+        evaluated = 0
+
+        # Evaluate (or restore) the shared prefix once in sequence 0 and copy it to the others;
+        # sequence 0 holds only the prefix here, and llama.cpp only copies whole sequences
+        prefix_len = shared_prefix_length(prompt_tokens)
+        if prefix_len < MIN_SHARED_PREFIX:
+            prefix_len = 0
+        if prefix_len:
+            key = (id(llama), tuple(prompt_tokens[0][:prefix_len]))
+            if not _restore_prefix_state(ctx, key):
+                prefix = [(0, pos, token, False) for pos, token in enumerate(prompt_tokens[0][:prefix_len])]
+                for start in range(0, prefix_len, n_batch):
+                    decode(prefix[start:start + n_batch])
+                evaluated += prefix_len
+                _save_prefix_state(ctx, key)
+            memory = llama_cpp.llama_get_memory(ctx)
+            for seq in range(1, n_seq):
+                llama_cpp.llama_memory_seq_cp(memory, 0, seq, -1, -1)
+
+        # Evaluate the rest of every prompt, packing tokens from different sequences into shared batches
+        pending = {}
+        entries = [
+            (seq, pos, tokens[pos], pos == len(tokens) - 1)
+            for seq, tokens in enumerate(prompt_tokens)
+            for pos in range(prefix_len, len(tokens))
+        ]
+        evaluated += len(entries)
+        for start in range(0, len(entries), n_batch):
+            for seq, logits in decode(entries[start:start + n_batch]).items():
+                pending[seq] = sample(seq, logits)
+
+        prefill_done = time.perf_counter()
+        outputs: List[List[int]] = [[] for _ in prompts]
+        texts = [""] * n_seq
+        active = set(range(n_seq))
+
+        # Advance every unfinished sequence by one token per decode call
+        while active:
+            step = []
+            for seq in sorted(active):
+                token = pending[seq]
+                if token == eos_token or len(outputs[seq]) >= max_tokens:
+                    active.discard(seq)
+                    continue
+
+                outputs[seq].append(token)
+                if samplers:
+                    llama_cpp.llama_sampler_accept(samplers[seq], token)
+                texts[seq] = llama.detokenize(outputs[seq]).decode("utf-8", errors="ignore")
+                hit = [texts[seq].index(s) for s in stop if s in texts[seq]]
+                if hit:
+                    texts[seq] = texts[seq][: min(hit)]
+                    active.discard(seq)
+                    continue
+
+                step.append((seq, len(prompt_tokens[seq]) + len(outputs[seq]) - 1, token, True))
+
+            if step:
+                for seq, logits in decode(step).items():
+                    pending[seq] = sample(seq, logits)
+
+        finished = time.perf_counter()
+        metrics.record_llm_call(evaluated, sum(len(tokens) for tokens in outputs), finished - prefill_start,
+                                prompt_eval_seconds=prefill_done - prefill_start, decode_seconds=finished - prefill_done)
+        return texts
+    finally:
+        llama_cpp.llama_batch_free(batch)
+        for sampler in samplers:
+            llama_cpp.llama_sampler_free(sampler)
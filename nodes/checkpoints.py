@@ -0,0 +1,77 @@
+"""Checkpointing of graph runs, so an interrupted plan can be resumed.
+
+Graph runs are compiled with a LangGraph SQLite checkpointer. The content
+generator works through a plan a few days per graph step and the
+checkpointer saves the state after every step, so a run that crashes or is
+restarted loses at most those few days. Each run is a LangGraph thread; its
+thread ID is the run ID that resumes it.
+"""
+import math
+import os
+import re
+import sqlite3
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+# Days generated between checkpoints; two full batches at the default batch size
+DEFAULT_CHECKPOINT_DAYS = 16
+
+# Write each checkpoint before the next step starts. LangGraph's default ("async")
+# writes them in the background, so a process killed outright (e.g. by the OOM
+# killer) can lose the last few, or every one of a short run
+CHECKPOINT_DURABILITY = "sync"
+
+# Graph steps other than content generation (day planner, formatter, save), plus headroom
+FIXED_GRAPH_STEPS = 10
+
+
+def get_checkpoint_path() -> str:
+    """Get the path to the checkpoint database ($GRAPH_CHECKPOINT_DB, or next to the completion cache)."""
+    if os.environ.get("GRAPH_CHECKPOINT_DB"):
+        return os.environ["GRAPH_CHECKPOINT_DB"]
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cache_dir = os.path.join(base_dir, "cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, "graph_checkpoints.sqlite3")
+
+
+def _serializer():
+    # The formatted plan is a ContentTable, which msgpack cannot encode; it is pickled
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+    return JsonPlusSerializer(pickle_fallback=True)
+
+
+def open_checkpointer(path: Optional[str] = None):
+    """Open the SQLite checkpointer for synchronous graph runs (invoke/stream)."""
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    conn = sqlite3.connect(path or get_checkpoint_path(), check_same_thread=False, timeout=30)
+    return SqliteSaver(conn, serde=_serializer())
+
+
+@asynccontextmanager
+async def open_async_checkpointer(path: Optional[str] = None) -> AsyncIterator[Any]:
+    """Open the SQLite checkpointer for async graph runs (ainvoke/astream) for the duration of the block."""
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    async with aiosqlite.connect(path or get_checkpoint_path(), timeout=30) as conn:
+        yield AsyncSqliteSaver(conn, serde=_serializer())
+
+
+def new_run_id(brand_theme: str) -> str:
+    """Make a run ID that is readable and unique: the theme's slug plus a random suffix."""
+    slug = re.sub(r"[^a-z0-9]+", "-", brand_theme.lower()).strip("-")[:40] or "plan"
+    return f"{slug}-{uuid.uuid4().hex[:8]}"
+
+
+def run_config(run_id: str, duration: int, checkpoint_days: Optional[int] = DEFAULT_CHECKPOINT_DAYS) -> Dict:
+    """Build the graph config for a checkpointed run.
+
+    The content generator takes one graph step per checkpoint_days days, so
+    the recursion limit is raised to fit long plans.
+    """
+    steps = math.ceil(duration / checkpoint_days) if checkpoint_days else 1
+    return {"configurable": {"thread_id": run_id}, "recursion_limit": steps + FIXED_GRAPH_STEPS}
@@ -1,130 +1,184 @@
-from typing import Dict
+from functools import lru_cache
+import itertools
+import json
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Union
 import random
-from langchain_core.prompts import ChatPromptTemplate
+import sys
+import numpy as np
 
 # Import the model utilities
-from nodes.model_utils import get_llm
+from nodes import metrics
+from nodes.model_utils import DEFAULT_BATCH_SIZE, get_llm, iter_completions, run_in_llm_executor
+from nodes.platforms import (PLATFORM_TEMPLATES, PLATFORMS, TEMPLATE_COUNTS, build_platform_grammar, compose_post,
+                             get_platform_prompt, parse_platform_response, pick_hashtags, platform_max_tokens)
 
-# Define the prompt template
-content_generator_prompt = ChatPromptTemplate.from_template(
-    """You are a social media content creator for a brand with the theme: '{brand_theme}'.
-    
-    Create engaging social media content for the topic: '{topic}'.
+# Token budget per completion. The grammar caps the caption at 200 characters
+# and five hashtags, which stays under this; it also bounds the KV cache each
+# batched sequence needs
+CONTENT_MAX_TOKENS = 160
+
+# Constrains completions to {"caption": "...", "hashtags": ["#a", ...]} with
+# 3-5 hashtags. Generation stops as soon as the closing brace is produced.
+CONTENT_GRAMMAR = r"""
+root ::= "{" ws "\"caption\":" ws caption "," ws "\"hashtags\":" ws "[" tag ("," ws tag){2,4} "]" ws "}"
+caption ::= "\"" [^"\\\x00-\x1f]{1,200} "\""
+tag ::= "\"#" [A-Za-z0-9_]{1,30} "\""
+ws ::= " "?
+"""
+
+# Backstop for servers that ignore the grammar; valid output never contains a newline
+CONTENT_STOP = ["\n\n"]
+
+# Attempts per topic in a fan-out branch (see content_branch_node). Topics the
+# model still fails on in the last attempt fall back to rule-based content
+BRANCH_ATTEMPTS = 3
+
+# Define the prompt template. The topic comes last so every prompt of a plan
+# shares the same prefix, which llama.cpp evaluates once and reuses
+CONTENT_GENERATOR_TEMPLATE = """You are a social media content creator for a brand with the theme: '{brand_theme}'.
     
     Your response should include:
     1. A short caption (1-2 sentences)
     2. 3-5 relevant hashtags
     
-    Format your response exactly like this:
-    Caption: [Your caption here]
-    Hashtags: [hashtag1] [hashtag2] [hashtag3] [hashtag4] [hashtag5]
+    Respond with a single JSON object exactly like this:
+    {{"caption": "Your caption here", "hashtags": ["#hashtag1", "#hashtag2", "#hashtag3", "#hashtag4", "#hashtag5"]}}
     
     Be concise, engaging, and on-brand.
+    
+    Create engaging social media content for the topic: '{topic}'.
     """
-)
+
+@lru_cache(maxsize=None)
+def get_content_generator_prompt():
+    """Build the prompt template on first use, so rule-based runs never load langchain_core.prompts."""
+    from langchain_core.prompts import ChatPromptTemplate
+
+    return ChatPromptTemplate.from_template(CONTENT_GENERATOR_TEMPLATE)
+
+# Template captions
+CAPTION_TEMPLATES = [
+    "Ready to transform your {} journey? Today we're focusing on {}!",
+    "Discover how {} can change your perspective on {}.",
+    "Let's explore {} together and see how it impacts your {}.",
+    "Today's {} tip: Make time for {} in your busy schedule.",
+    "The secret to successful {} is understanding {}. Here's why!",
+    "Have you incorporated {} into your {} routine yet? Here's how to start.",
+    "Struggling with {}? Our {} approach might be just what you need.",
+    "Your daily dose of {} inspiration: {} made simple.",
+    "The most overlooked aspect of {} is {}. Let's change that!",
+    "Small steps toward {} success: Focus on {} today.",
+    # Additional templates for more variety
+    "Breaking down {} concepts: {} explained simply.",
+    "The {} revolution starts with {}. Are you ready?",
+    "Mastering {} through the lens of {}. A fresh perspective!",
+    "Why {} matters: The impact of {} on your daily life.",
+    "From novice to expert: {} strategies for {}.",
+    "The untold benefits of {} when approaching {}.",
+    "Reimagining {} through innovative {} techniques.",
+    "Behind every successful {} is a solid {}. Here's the proof.",
+    "The {} advantage: Leveraging {} for maximum results.",
+    "Transformative {} practices: {} edition."
+]
+
+# Template hashtags for different themes with more variety
+HASHTAG_TEMPLATES = {
+    "fitness": [
+        ["#FitnessJourney", "#HealthyLifestyle", "#WorkoutMotivation", "#FitnessTips", "#ActiveLifestyle"],
+        ["#GetFit", "#FitnessGoals", "#TrainHard", "#HealthyBody", "#FitnessMotivation"],
+        ["#WorkoutRoutine", "#StayActive", "#FitLife", "#StrengthTraining", "#MoveYourBody"],
+        ["#FitnessCommunity", "#HealthyHabits", "#ExerciseDaily", "#FitnessJunkie", "#WorkoutWednesday"]
+    ],
+    "nutrition": [
+        ["#HealthyEating", "#NutritionTips", "#CleanEating", "#MealPrep", "#BalancedDiet"],
+        ["#EatWell", "#NutritionFacts", "#HealthyFood", "#FoodIsFuel", "#NutritiousFood"],
+        ["#HealthyMeals", "#WholeFoods", "#NutritionGoals", "#EatHealthy", "#FoodForThought"],
+        ["#MindfulEating", "#NutritionCoach", "#HealthyRecipes", "#FuelYourBody", "#EatTheRainbow"]
+    ],
+    "wellness": [
+        ["#SelfCare", "#WellnessJourney", "#MindBodyBalance", "#HealthyHabits", "#WellnessWednesday"],
+        ["#MentalHealth", "#Mindfulness", "#WellnessLifestyle", "#SelfLove", "#HealthAndWellness"],
+        ["#WellnessTips", "#HolisticHealth", "#WellBeing", "#MindfulLiving", "#BalancedLife"],
+        ["#WellnessWarrior", "#SelfCareRoutine", "#MindBodySpirit", "#WellnessCoach", "#InnerPeace"]
+    ],
+    "business": [
+        ["#BusinessTips", "#Entrepreneurship", "#Success", "#Leadership", "#BusinessGrowth"],
+        ["#StartupLife", "#BusinessStrategy", "#EntrepreneurMindset", "#SmallBusiness", "#BusinessOwner"],
+        ["#BusinessAdvice", "#GrowthMindset", "#BusinessCoach", "#MarketingStrategy", "#BusinessSuccess"],
+        ["#NetworkingTips", "#BusinessDevelopment", "#InnovationStrategy", "#LeadershipSkills", "#BusinessInsights"]
+    ],
+    "technology": [
+        ["#TechTips", "#Innovation", "#DigitalTransformation", "#FutureTech", "#TechnologyTrends"],
+        ["#TechNews", "#DigitalInnovation", "#EmergingTech", "#TechSolutions", "#InnovationMindset"],
+        ["#AITechnology", "#TechStartup", "#DigitalStrategy", "#TechForGood", "#InnovationLeadership"],
+        ["#TechCommunity", "#DigitalDisruption", "#FutureTrends", "#TechInnovation", "#SmartTechnology"]
+    ],
+    "default": [
+        ["#DailyTips", "#LifeHacks", "#Inspiration", "#Growth", "#Motivation"],
+        ["#LifeTips", "#PersonalGrowth", "#DailyInspiration", "#PositiveVibes", "#SuccessMindset"],
+        ["#GoodVibes", "#LifeLessons", "#MindsetMatters", "#DailyMotivation", "#InspirationDaily"],
+        ["#LifeGoals", "#PositiveThinking", "#MindsetShift", "#GrowthMindset", "#DailyWisdom"]
+    ]
+}
+
+# Emojis prepended to some captions at high randomness
+CAPTION_EMOJIS = ["✨", "🔥", "💪", "🌟", "📈", "🚀", "💯", "🎯", "⚡", "🌈"]
+
+# Every hashtag set holds this many tags, and these are all the ways to order them
+HASHTAGS_PER_SET = 5
+HASHTAG_ORDERS = list(itertools.permutations(range(HASHTAGS_PER_SET)))
+
+# Number of caption templates and hashtag sets to draw from at each randomness level
+RANDOMNESS_LEVELS = {
+    "low": {"templates": 5, "hashtag_sets": 1},
+    "medium": {"templates": 15, "hashtag_sets": 3},
+    "high": {"templates": len(CAPTION_TEMPLATES), "hashtag_sets": 4},
+}
+
+@lru_cache(maxsize=256)
+def get_hashtag_sets(brand_theme: str) -> List[List[str]]:
+    """Get the hashtag sets for the first theme keyword found in the brand theme."""
+    brand_theme = brand_theme.lower()
+    for theme_key, hashtag_sets in HASHTAG_TEMPLATES.items():
+        if theme_key in brand_theme:
+            return hashtag_sets
+    return HASHTAG_TEMPLATES["default"]
+
+def get_theme_word(brand_theme: str) -> str:
+    """Get the word used to fill the theme slot of caption templates."""
+    words = brand_theme.split()
+    return words[0].lower() if words else "lifestyle"
+
+def get_theme_hashtag(brand_theme: str) -> str:
+    """Get the hashtag built from the brand theme itself."""
+    return "#" + ''.join(word.capitalize() for word in brand_theme.split())
 
 def generate_rule_based_content(brand_theme: str, topic: str, randomness: str = "medium") -> Dict:
     """Generate content using rule-based approach when LLM is not available."""
-    # Template captions
-    caption_templates = [
-        "Ready to transform your {} journey? Today we're focusing on {}!",
-        "Discover how {} can change your perspective on {}.",
-        "Let's explore {} together and see how it impacts your {}.",
-        "Today's {} tip: Make time for {} in your busy schedule.",
-        "The secret to successful {} is understanding {}. Here's why!",
-        "Have you incorporated {} into your {} routine yet? Here's how to start.",
-        "Struggling with {}? Our {} approach might be just what you need.",
-        "Your daily dose of {} inspiration: {} made simple.",
-        "The most overlooked aspect of {} is {}. Let's change that!",
-        "Small steps toward {} success: Focus on {} today.",
-        # Additional templates for more variety
-        "Breaking down {} concepts: {} explained simply.",
-        "The {} revolution starts with {}. Are you ready?",
-        "Mastering {} through the lens of {}. A fresh perspective!",
-        "Why {} matters: The impact of {} on your daily life.",
-        "From novice to expert: {} strategies for {}.",
-        "The untold benefits of {} when approaching {}.",
-        "Reimagining {} through innovative {} techniques.",
-        "Behind every successful {} is a solid {}. Here's the proof.",
-        "The {} advantage: Leveraging {} for maximum results.",
-        "Transformative {} practices: {} edition."
-    ]
-    
-    # Template hashtags for different themes with more variety
-    hashtag_templates = {
-        "fitness": [
-            ["#FitnessJourney", "#HealthyLifestyle", "#WorkoutMotivation", "#FitnessTips", "#ActiveLifestyle"],
-            ["#GetFit", "#FitnessGoals", "#TrainHard", "#HealthyBody", "#FitnessMotivation"],
-            ["#WorkoutRoutine", "#StayActive", "#FitLife", "#StrengthTraining", "#MoveYourBody"],
-            ["#FitnessCommunity", "#HealthyHabits", "#ExerciseDaily", "#FitnessJunkie", "#WorkoutWednesday"]
-        ],
-        "nutrition": [
-            ["#HealthyEating", "#NutritionTips", "#CleanEating", "#MealPrep", "#BalancedDiet"],
-            ["#EatWell", "#NutritionFacts", "#HealthyFood", "#FoodIsFuel", "#NutritiousFood"],
-            ["#HealthyMeals", "#WholeFoods", "#NutritionGoals", "#EatHealthy", "#FoodForThought"],
-            ["#MindfulEating", "#NutritionCoach", "#HealthyRecipes", "#FuelYourBody", "#EatTheRainbow"]
-        ],
-        "wellness": [
-            ["#SelfCare", "#WellnessJourney", "#MindBodyBalance", "#HealthyHabits", "#WellnessWednesday"],
-            ["#MentalHealth", "#Mindfulness", "#WellnessLifestyle", "#SelfLove", "#HealthAndWellness"],
-            ["#WellnessTips", "#HolisticHealth", "#WellBeing", "#MindfulLiving", "#BalancedLife"],
-            ["#WellnessWarrior", "#SelfCareRoutine", "#MindBodySpirit", "#WellnessCoach", "#InnerPeace"]
-        ],
-        "business": [
-            ["#BusinessTips", "#Entrepreneurship", "#Success", "#Leadership", "#BusinessGrowth"],
-            ["#StartupLife", "#BusinessStrategy", "#EntrepreneurMindset", "#SmallBusiness", "#BusinessOwner"],
-            ["#BusinessAdvice", "#GrowthMindset", "#BusinessCoach", "#MarketingStrategy", "#BusinessSuccess"],
-            ["#NetworkingTips", "#BusinessDevelopment", "#InnovationStrategy", "#LeadershipSkills", "#BusinessInsights"]
-        ],
-        "technology": [
-            ["#TechTips", "#Innovation", "#DigitalTransformation", "#FutureTech", "#TechnologyTrends"],
-            ["#TechNews", "#DigitalInnovation", "#EmergingTech", "#TechSolutions", "#InnovationMindset"],
-            ["#AITechnology", "#TechStartup", "#DigitalStrategy", "#TechForGood", "#InnovationLeadership"],
-            ["#TechCommunity", "#DigitalDisruption", "#FutureTrends", "#TechInnovation", "#SmartTechnology"]
-        ],
-        "default": [
-            ["#DailyTips", "#LifeHacks", "#Inspiration", "#Growth", "#Motivation"],
-            ["#LifeTips", "#PersonalGrowth", "#DailyInspiration", "#PositiveVibes", "#SuccessMindset"],
-            ["#GoodVibes", "#LifeLessons", "#MindsetMatters", "#DailyMotivation", "#InspirationDaily"],
-            ["#LifeGoals", "#PositiveThinking", "#MindsetShift", "#GrowthMindset", "#DailyWisdom"]
-        ]
-    }
-    
     # Set temperature based on randomness level
     if randomness == "low":
         # Less random - use first few templates
-        caption_template = random.choice(caption_templates[:5])
+        caption_template = random.choice(CAPTION_TEMPLATES[:5])
         hashtag_set_index = 0
     elif randomness == "high":
         # More random - use all templates and add some variations
-        caption_template = random.choice(caption_templates)
+        caption_template = random.choice(CAPTION_TEMPLATES)
         # Sometimes add an emoji to the caption
-        emojis = ["✨", "🔥", "💪", "🌟", "📈", "🚀", "💯", "🎯", "⚡", "🌈"]
         if random.random() > 0.5:
-            caption_template = random.choice(emojis) + " " + caption_template
+            caption_template = random.choice(CAPTION_EMOJIS) + " " + caption_template
         hashtag_set_index = random.randint(0, 3)
     else:  # medium (default)
-        caption_template = random.choice(caption_templates[:15])
+        caption_template = random.choice(CAPTION_TEMPLATES[:15])
         hashtag_set_index = random.randint(0, 2)
     
     # Format the caption
-    words = brand_theme.split()
-    theme_word = words[0].lower() if words else "lifestyle"
-    caption = caption_template.format(theme_word, topic)
-    
-    # Select hashtags based on theme
-    for theme_key in hashtag_templates.keys():
-        if theme_key in brand_theme.lower():
-            hashtag_set = hashtag_templates[theme_key]
-            break
-    else:
-        hashtag_set = hashtag_templates["default"]
+    caption = caption_template.format(get_theme_word(brand_theme), topic)
     
-    # Get the hashtags from the selected set
-    hashtags = hashtag_set[hashtag_set_index].copy()
+    # Get the hashtags from the set selected for the theme
+    hashtags = get_hashtag_sets(brand_theme)[hashtag_set_index].copy()
     
     # Add a theme-specific hashtag
-    theme_hashtag = "#" + ''.join(word.capitalize() for word in brand_theme.split())
+    theme_hashtag = get_theme_hashtag(brand_theme)
     if theme_hashtag not in hashtags:
         hashtags[random.randint(0, len(hashtags)-1)] = theme_hashtag
     
@@ -137,13 +191,207 @@ def generate_rule_based_content(brand_theme: str, topic: str, randomness: str =
         "hashtags": " ".join(hashtags)
     }
 
-def content_generator_node(state: Dict) -> Dict:
-    """Generate content (caption and hashtags) for each topic."""
-    # Extract parameters from state
+def generate_rule_based_bulk(brand_themes: Union[str, Sequence[str]], topics: Sequence[str],
+                             randomness: str = "medium", seed: Optional[int] = None) -> Dict[str, List[str]]:
+    """Generate rule-based captions and hashtags for many rows in one vectorized pass.
+
+    Each row follows the same rules as generate_rule_based_content, but all
+    random choices are drawn up front from one seeded NumPy generator and
+    rows are assembled by indexing string tables built once per distinct theme.
+
+    Args:
+        brand_themes: The brand theme for every row, or a single theme shared by all rows
+        topics: The topic for each row
+        randomness: The randomness level (low/medium/high)
+        seed: Seed for the random generator; the same seed gives the same output
+
+    Returns:
+        A dict with "caption" and "hashtags" lists, one entry per topic.
+    """
+    n = len(topics)
+    if isinstance(brand_themes, str):
+        brand_themes = [brand_themes] * n if n else []
+    if len(brand_themes) != n:
+        raise ValueError("brand_themes and topics must have the same length")
+    if n == 0:
+        return {"caption": [], "hashtags": []}
+
+    level = RANDOMNESS_LEVELS.get(randomness, RANDOMNESS_LEVELS["medium"])
+    shuffle = randomness == "high"
+    rng = np.random.default_rng(seed)
+
+    # Draw every random choice for all rows at once. A uniformly random
+    # shuffle of five hashtags is a uniform pick among their 120 orderings.
+    template_ids = rng.integers(0, level["templates"], size=n)
+    emoji_ids = np.full(n, len(CAPTION_EMOJIS))
+    if randomness == "high":
+        with_emoji = rng.random(n) > 0.5
+        emoji_ids[with_emoji] = rng.integers(0, len(CAPTION_EMOJIS), size=int(with_emoji.sum()))
+    set_ids = rng.integers(0, level["hashtag_sets"], size=n)
+    replace_positions = rng.integers(0, HASHTAGS_PER_SET, size=n)
+    order_ids = rng.integers(0, len(HASHTAG_ORDERS), size=n) if shuffle else np.zeros(n, dtype=int)
+
+    # Split each template around its slots so captions are plain concatenations
+    template_parts = [template.split("{}") for template in CAPTION_TEMPLATES]
+    emoji_prefixes = [emoji + " " for emoji in CAPTION_EMOJIS] + [""]
+    tail_table = np.array([parts[2] for parts in template_parts], dtype=object)
+    orders = HASHTAG_ORDERS if shuffle else HASHTAG_ORDERS[:1]
+
+    # Map each row to its distinct theme
+    theme_index: Dict[str, int] = {}
+    theme_ids = np.fromiter((theme_index.setdefault(theme, len(theme_index)) for theme in brand_themes),
+                            dtype=np.int64, count=n)
+
+    heads = np.empty(n, dtype=object)
+    hashtags = np.empty(n, dtype=object)
+
+    for brand_theme, index in theme_index.items():
+        rows = slice(None) if len(theme_index) == 1 else np.flatnonzero(theme_ids == index)
+        theme_word = get_theme_word(brand_theme)
+        theme_hashtag = get_theme_hashtag(brand_theme)
+
+        # Caption heads for every (emoji, template) pair of this theme
+        head_table = np.array(
+            [[prefix + parts[0] + theme_word + parts[1] for parts in template_parts] for prefix in emoji_prefixes],
+            dtype=object,
+        )
+        heads[rows] = head_table[emoji_ids[rows], template_ids[rows]]
+
+        # Finished hashtag strings for every (set, replaced position, ordering) of this theme
+        tag_table = np.empty((len(HASHTAG_TEMPLATES["default"]), HASHTAGS_PER_SET, len(orders)), dtype=object)
+        for set_id, hashtag_set in enumerate(get_hashtag_sets(brand_theme)):
+            for position in range(HASHTAGS_PER_SET):
+                tags = list(hashtag_set)
+                if theme_hashtag not in tags:
+                    tags[position] = theme_hashtag
+                for order_id, order in enumerate(orders):
+                    tag_table[set_id, position, order_id] = " ".join(tags[i] for i in order)
+        hashtags[rows] = tag_table[set_ids[rows], replace_positions[rows], order_ids[rows]]
+
+    tails = tail_table[template_ids]
+    captions = [head + topic + tail for head, topic, tail in zip(heads, topics, tails)]
+    return {"caption": captions, "hashtags": hashtags.tolist()}
+
+def generate_rule_based_platform_bulk(brand_theme: str, topics: Sequence[str], platforms: Sequence[str],
+                                      randomness: str = "medium", seed: Optional[int] = None) -> Dict[str, List[str]]:
+    """Generate rule-based posts for several platforms from one rule-based caption per topic.
+
+    Each platform wraps the caption in its own templates (see
+    nodes.platforms.PLATFORM_TEMPLATES) and takes as many of the hashtags as it uses.
+
+    Returns:
+        A dict with a list of finished posts, one per topic, for each platform.
+    """
+    bulk = generate_rule_based_bulk(brand_theme, topics, randomness, seed=seed)
+    rng = np.random.default_rng(None if seed is None else seed + 1)
+    theme_word = get_theme_word(brand_theme)
+    theme_hashtag = get_theme_hashtag(brand_theme)
+    template_count = TEMPLATE_COUNTS.get(randomness, TEMPLATE_COUNTS["medium"])
+    
+    posts = {}
+    for platform in platforms:
+        templates = PLATFORM_TEMPLATES[platform][:template_count]
+        template_ids = rng.integers(0, len(templates), size=len(topics))
+        count = PLATFORMS[platform]["hashtags"][1]
+        posts[platform] = [
+            compose_post(platform,
+                         templates[template_id].format(caption=caption, topic=topic, topic_lower=topic.lower(),
+                                                       theme_word=theme_word),
+                         " ".join(pick_hashtags(hashtags.split(), count, theme_hashtag)))
+            for topic, caption, hashtags, template_id in zip(topics, bulk["caption"], bulk["hashtags"], template_ids)
+        ]
+    return posts
+
+def parse_content_response(response: str) -> Optional[Dict]:
+    """Parse a completion into caption and hashtags, returning None if either part is missing.
+
+    Accepts the JSON object the grammar produces, and the older
+    'Caption:' / 'Hashtags:' lines from backends that do not enforce it.
+    """
+    caption = ""
+    hashtags = []
+    
+    try:
+        data = json.loads(response)
+    except ValueError:
+        data = None
+    
+    if isinstance(data, dict):
+        caption = str(data.get("caption") or "").strip()
+        if isinstance(data.get("hashtags"), list):
+            hashtags = [str(tag).strip() for tag in data["hashtags"] if str(tag).strip()]
+    else:
+        for line in response.strip().split("\n"):
+            if line.startswith("Caption:"):
+                caption = line.replace("Caption:", "").strip()
+            elif line.startswith("Hashtags:"):
+                hashtag_text = line.replace("Hashtags:", "").strip()
+                # Extract hashtags (they might be space-separated or formatted as #tag)
+                hashtags = [tag.strip() for tag in hashtag_text.split() if tag.strip()]
+    
+    # Ensure hashtags start with #
+    hashtags = [tag if tag.startswith("#") else f"#{tag}" for tag in hashtags]
+    
+    if caption and hashtags:
+        return {
+            "caption": caption,
+            "hashtags": " ".join(hashtags[:5])  # Limit to 5 hashtags
+        }
+    return None
+
+def parse_and_count(response: Optional[str], platforms: Optional[Sequence[str]] = None) -> Optional[Dict]:
+    """Parse a completion (a multi-platform one if platforms are given), counting completions that came back unparseable."""
+    if not response:
+        return None
+    parsed = parse_platform_response(response, platforms) if platforms else parse_content_response(response)
+    if parsed is None:
+        metrics.record(parse_failures=1)
+    return parsed
+
+def get_row_writer() -> Callable[[Dict], None]:
+    """Get the LangGraph stream writer, or a no-op when called outside a graph run.
+
+    Rows written here are delivered to callers streaming the graph with
+    stream_mode="custom".
+    """
+    # A graph run has already loaded langgraph; don't import it just to find out there is none
+    if "langgraph.config" not in sys.modules:
+        return lambda chunk: None
+    from langgraph.config import get_stream_writer
+
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda chunk: None
+
+class TopicGenerationError(RuntimeError):
+    """The model returned no usable content for a topic."""
+
+def generate_content(state: Dict, topics: List[str], first_day: int = 1, cache: bool = True,
+                     fallback: bool = True, days: Optional[Sequence[int]] = None) -> Iterator[Dict]:
+    """Generate a caption and hashtags for each topic, yielding one content row per day.
+
+    Args:
+        state: Plan settings (brand_theme, use_model, randomness, batch_size,
+            seed, session_id, priority, platforms), as in the graph state.
+            With platforms, each row holds a finished post per platform
+            instead of a caption and hashtags.
+        topics: The topics to write content for, in day order
+        first_day: Day number of the first topic
+        cache: Serve repeated prompts from the completion cache. Edits that
+            regenerate a day turn it off, or they would get the same content back.
+        fallback: Replace content the model fails on with rule-based content.
+            Without it failed topics are left out, and TopicGenerationError
+            is raised once the other rows have been yielded, so the caller
+            can retry just those.
+        days: Day number of each topic, for topics that are not consecutive
+            (default: numbered from first_day)
+    """
     brand_theme = state["brand_theme"]
-    topics = state["topics"]
     use_model = state.get("use_model", True)  # Default to True if not specified
     randomness = state.get("randomness", "medium")  # Default to medium if not specified
+    batch_size = state.get("batch_size") or DEFAULT_BATCH_SIZE
+    platforms = state.get("platforms")
     
     # Set temperature based on randomness level
     if randomness == "low":
@@ -156,62 +404,151 @@ def content_generator_node(state: Dict) -> Dict:
     # Try to use LLM for content generation if requested
     llm = None
     if use_model:
-        llm = get_llm(temperature=temperature)
-    content_list = []
-    
-    for day, topic in enumerate(topics, start=1):
-        content_item = {
-            "day": day,
-            "topic": topic,
-            "caption": "",
-            "hashtags": ""
-        }
-        
+        llm = get_llm(temperature=temperature, session_id=state.get("session_id"),
+                      priority=state.get("priority"), cache=cache)
+    
+    if platforms:
+        # Every platform's post comes from one completion per topic
         if llm:
-            try:
-                # Generate the prompt
-                prompt = content_generator_prompt.format(brand_theme=brand_theme, topic=topic)
-                
-                # Get response from LLM with adjusted temperature
-                response = llm.invoke(prompt, temperature=temperature)
-                
-                # Parse the response
-                caption = ""
-                hashtags = []
-                
-                for line in response.strip().split("\n"):
-                    if line.startswith("Caption:"):
-                        caption = line.replace("Caption:", "").strip()
-                    elif line.startswith("Hashtags:"):
-                        hashtag_text = line.replace("Hashtags:", "").strip()
-                        # Extract hashtags (they might be space-separated or formatted as #tag)
-                        hashtags = [tag.strip() for tag in hashtag_text.split() if tag.strip()]
-                        # Ensure hashtags start with #
-                        hashtags = [tag if tag.startswith("#") else f"#{tag}" for tag in hashtags]
-                
-                if caption and hashtags:
-                    content_item["caption"] = caption
-                    content_item["hashtags"] = " ".join(hashtags[:5])  # Limit to 5 hashtags
-                else:
-                    # Fallback if parsing failed
-                    rule_based = generate_rule_based_content(brand_theme, topic, randomness)
-                    content_item["caption"] = rule_based["caption"]
-                    content_item["hashtags"] = rule_based["hashtags"]
-                    
-            except Exception as e:
-                print(f"Error using LLM for content generation for topic '{topic}': {e}")
-                print("Falling back to rule-based content generation...")
-                rule_based = generate_rule_based_content(brand_theme, topic, randomness)
-                content_item["caption"] = rule_based["caption"]
-                content_item["hashtags"] = rule_based["hashtags"]
+            prompt = get_platform_prompt(tuple(platforms))
+            prompts = [prompt.format(brand_theme=brand_theme, topic=topic) for topic in topics]
+            generated: Iterable[Optional[Dict]] = iter_completions(
+                llm, prompts, batch_size, task="content generation",
+                parse=lambda response: parse_and_count(response, platforms), temperature=temperature,
+                max_tokens=platform_max_tokens(platforms), stop=CONTENT_STOP, grammar=build_platform_grammar(platforms))
         else:
-            # Use rule-based approach if LLM is not available or not requested
-            rule_based = generate_rule_based_content(brand_theme, topic, randomness)
-            content_item["caption"] = rule_based["caption"]
-            content_item["hashtags"] = rule_based["hashtags"]
+            bulk = generate_rule_based_platform_bulk(brand_theme, topics, platforms, randomness, seed=state.get("seed"))
+            generated = (dict(zip(platforms, posts)) for posts in zip(*(bulk[platform] for platform in platforms)))
+    elif llm:
+        prompts = [get_content_generator_prompt().format(brand_theme=brand_theme, topic=topic) for topic in topics]
+        generated = iter_completions(llm, prompts, batch_size, task="content generation", parse=parse_and_count,
+                                     temperature=temperature, max_tokens=CONTENT_MAX_TOKENS, stop=CONTENT_STOP,
+                                     grammar=CONTENT_GRAMMAR)
+    else:
+        # Rule-based plans are generated in one vectorized pass
+        bulk = generate_rule_based_bulk(brand_theme, topics, randomness, seed=state.get("seed"))
+        generated = (
+            {"caption": caption, "hashtags": hashtags}
+            for caption, hashtags in zip(bulk["caption"], bulk["hashtags"])
+        )
+    
+    failed = []
+    for day, topic, parsed in zip(days or itertools.count(first_day), topics, generated):
+        # Fall back to rule-based content if the LLM failed or returned
+        # something we could not parse
+        if parsed is None:
+            if not fallback:
+                failed.append(day)
+                continue
+            if platforms:
+                bulk = generate_rule_based_platform_bulk(brand_theme, [topic], platforms, randomness)
+                parsed = {platform: bulk[platform][0] for platform in platforms}
+            else:
+                parsed = generate_rule_based_content(brand_theme, topic, randomness)
+            metrics.record(rule_based_fallbacks=1)
         
+        yield {"day": day, "topic": topic, **parsed}
+    
+    if failed:
+        raise TopicGenerationError(f"No usable content for day{'s' if len(failed) > 1 else ''} "
+                                   f"{', '.join(map(str, failed))}")
+
+def content_generator_node(state: Dict) -> Dict:
+    """Generate content (caption and hashtags) for each topic, carrying on after the days already done.
+
+    With state["checkpoint_every"] set, one call generates at most that many
+    days; the graph then loops back here (see route_after_content), so a
+    checkpointed run saves its progress between chunks.
+    """
+    topics = state["topics"]
+    content_list = list(state.get("content") or [])
+    done = len(content_list)
+    chunk_days = state.get("checkpoint_every")
+    pending = topics[done:done + chunk_days] if chunk_days else topics[done:]
+    write_row = get_row_writer()
+    
+    for content_item in generate_content(state, pending, first_day=done + 1):
         content_list.append(content_item)
+        
+        # Emit the finished day to anyone streaming the graph
+        write_row({"row": content_item, "total": len(topics)})
     
     # Update the state with the content
     state["content"] = content_list
-    return state
\ No newline at end of file
+    return state
+
+def route_after_content(state: Dict) -> str:
+    """Pick the graph step after content_generator: itself again until every topic has content."""
+    return "content_generator" if len(state["content"]) < len(state["topics"]) else "formatter"
+
+async def acontent_generator_node(state: Dict) -> Dict:
+    """Async content_generator_node: rule-based content runs inline, model content on the model executor."""
+    if state.get("use_model", True):
+        return await run_in_llm_executor(content_generator_node, state)
+    return content_generator_node(state)
+
+def merge_content(existing: Optional[List[Dict]], new: Optional[List[Dict]]) -> Optional[List[Dict]]:
+    """Reducer for the content state key: merge content rows by day, in day order.
+
+    Fan-out branches each return the rows of their own days, in whatever
+    order they finish. The content generator returns every row so far, which
+    merges to itself.
+    """
+    if existing is None or new is None:
+        return existing if new is None else new
+    rows = {row["day"]: row for row in existing}
+    rows.update((row["day"], row) for row in new)
+    return [rows[day] for day in sorted(rows)]
+
+def fan_out_topics(state: Dict):
+    """Pick the graph step after day_planner.
+
+    With state["fan_out"] set, content is generated in parallel branches of
+    that many consecutive days each (one Send to content_branch per branch);
+    otherwise the content generator works through the topics in order.
+    """
+    days = state.get("fan_out")
+    if not days:
+        return "content_generator"
+    from langgraph.types import Send
+
+    topics = state["topics"]
+    seed = state.get("seed")
+    # Each branch gets its own seed, or seeded rule-based branches would all repeat the first one's choices
+    return [
+        Send("content_branch", dict(state, topics=topics[start:start + days], first_day=start + 1,
+                                    seed=None if seed is None else seed + start))
+        for start in range(0, len(topics), days)
+    ]
+
+def content_branch_node(state: Dict) -> Dict:
+    """Generate content for one fan-out branch: the topics in state, numbered from state["first_day"].
+
+    Topics the model fails on are retried on their own, up to BRANCH_ATTEMPTS
+    attempts in all, bypassing the completion cache so a retry gets a fresh
+    completion; the days that succeeded are kept. In the last attempt failed
+    topics fall back to rule-based content instead. Each row is streamed as
+    soon as it succeeds.
+    """
+    topics = dict(zip(itertools.count(state["first_day"]), state["topics"]))
+    rows: Dict[int, Dict] = {}
+    write_row = get_row_writer()
+    
+    for attempt in range(1, BRANCH_ATTEMPTS + 1):
+        pending = [day for day in topics if day not in rows]
+        try:
+            for row in generate_content(state, [topics[day] for day in pending], days=pending, cache=attempt == 1,
+                                        fallback=attempt == BRANCH_ATTEMPTS):
+                rows[row["day"]] = row
+                write_row({"row": row, "total": state["duration"]})
+            break
+        except TopicGenerationError as e:
+            print(f"{e}; retrying (attempt {attempt + 1} of {BRANCH_ATTEMPTS})")
+    
+    return {"content": [rows[day] for day in sorted(rows)]}
+
+async def acontent_branch_node(state: Dict) -> Dict:
+    """Async content_branch_node: rule-based content runs inline, model content on the model executor."""
+    if state.get("use_model", True):
+        return await run_in_llm_executor(content_branch_node, state)
+    return content_branch_node(state)
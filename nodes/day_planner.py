@@ -1,22 +1,93 @@
-from typing import Dict, List
-from langchain_core.prompts import ChatPromptTemplate
+import json
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
 
 # Import the model utilities
-from nodes.model_utils import get_llm
+from nodes import metrics
+from nodes.dedup import NearDuplicateIndex
+from nodes.model_utils import DEFAULT_BATCH_SIZE, get_llm, iter_completions, run_in_llm_executor
 
-# Define the prompt template
-day_planner_prompt = ChatPromptTemplate.from_template(
-    """You are a social media content strategist. 
-    Generate {duration} unique and engaging topic ideas for a social media content calendar 
+# Define the prompt template. The window-specific scope comes last so the
+# windows of a plan share a prompt prefix
+DAY_PLANNER_TEMPLATE = """You are a social media content strategist. 
+    Generate {count} unique and engaging topic ideas for a social media content calendar 
     based on the theme: '{brand_theme}'.
     
     Each topic should be concise (5-10 words) and directly related to the theme.
     Ensure topics are varied and cover different aspects of the theme.
     
-    Format your response as a numbered list with one topic per line.
+    Respond with a JSON array of {count} topic strings, like ["First topic", "Second topic"].
     Do not include any explanations or additional text.
+    {scope}
     """
-)
+
+@lru_cache(maxsize=None)
+def get_day_planner_prompt():
+    """Build the prompt template on first use, so rule-based runs never load langchain_core.prompts."""
+    from langchain_core.prompts import ChatPromptTemplate
+
+    return ChatPromptTemplate.from_template(DAY_PLANNER_TEMPLATE)
+
+# Long plans are requested in windows of this many days, decoded in parallel
+TOPICS_PER_CHUNK = 10
+
+# Extra topics requested per window to replace near-duplicates
+SPARE_TOPICS_PER_CHUNK = 3
+
+# Each window of a multi-window plan is steered to a different angle so
+# windows decoded in parallel do not all suggest the same topics
+FOCUS_AREAS = [
+    "getting started and the basics",
+    "practical tips and how-tos",
+    "common myths and mistakes",
+    "success stories and inspiration",
+    "tools, resources and recommendations",
+    "daily habits and routines",
+    "community and engagement",
+    "advanced techniques",
+    "seasonal and timely ideas",
+    "motivation and mindset",
+    "behind the scenes",
+    "questions and answers",
+]
+
+# Token budget per topic; the grammar caps a topic at 80 characters
+TOPIC_MAX_TOKENS = 24
+
+# Backstop for servers that ignore the grammar; valid output never contains a newline
+TOPICS_STOP = ["\n\n"]
+
+def build_topics_grammar(duration: int) -> str:
+    """Build a GBNF grammar for a JSON array of exactly duration topic strings."""
+    return (
+        f'root ::= "[" topic ("," " "? topic){{{max(duration - 1, 0)}}} "]"\n'
+        'topic ::= "\\"" [^"\\\\\\x00-\\x1f]{3,80} "\\""\n'
+    )
+
+def parse_topics_response(response: str) -> List[str]:
+    """Parse topics from a JSON array, or from a numbered list for backends that ignore the grammar."""
+    try:
+        data = json.loads(response)
+    except ValueError:
+        data = None
+    if isinstance(data, list):
+        return [str(topic).strip() for topic in data if str(topic).strip()]
+    if response.lstrip().startswith("["):
+        # A JSON array cut short, e.g. by max_tokens
+        return []
+    
+    topics = []
+    for line in response.strip().split("\n"):
+        # Remove numbering and whitespace
+        cleaned_line = line.strip()
+        if cleaned_line:
+            # Extract just the topic text (remove numbering like "1. ")
+            if ". " in cleaned_line and cleaned_line[0].isdigit():
+                topic = cleaned_line.split(". ", 1)[1]
+            else:
+                topic = cleaned_line
+            topics.append(topic)
+    return topics
 
 def generate_rule_based_topics(brand_theme: str, duration: int) -> List[str]:
     """Generate topics using rule-based approach when LLM is not available."""
@@ -64,54 +135,119 @@ def generate_rule_based_topics(brand_theme: str, duration: int) -> List[str]:
     
     return topics
 
-def day_planner_node(state: Dict) -> Dict:
-    """Generate topic ideas for each day based on the brand theme."""
-    # Extract parameters from state
+def plan_windows(duration: int, chunk_size: int = TOPICS_PER_CHUNK) -> List[Tuple[int, int]]:
+    """Split a plan into (first_day, last_day) windows of at most chunk_size days."""
+    return [(first, min(first + chunk_size - 1, duration)) for first in range(1, duration + 1, chunk_size)]
+
+def parse_and_count(response: str) -> List[str]:
+    """Parse a topic completion, counting completions that came back unparseable."""
+    topics = parse_topics_response(response)
+    if not topics:
+        metrics.record(parse_failures=1)
+    return topics
+
+def generate_llm_topics(llm, brand_theme: str, duration: int, index: NearDuplicateIndex,
+                        batch_size: int = DEFAULT_BATCH_SIZE, first_day: int = 1) -> List[str]:
+    """Generate topics window by window, decoding the windows as parallel sequences.
+
+    Every window asks for the same number of topics (its days plus spares)
+    so they share one grammar and one batch. Windows are merged in day
+    order, skipping near-duplicates of topics already accepted; a window
+    that comes up short passes its shortfall on to the next one.
+
+    A plan being extended passes the day its new topics start at; the
+    windows then carry on the existing calendar's day numbers and focus
+    areas, and its topics should already be in index.
+
+    Returns:
+        Up to duration unique topics; fewer if the model did not produce enough.
+    """
+    offset = first_day - 1
+    windows = [(first + offset, last + offset) for first, last in plan_windows(duration)]
+    count = min(TOPICS_PER_CHUNK, duration) + SPARE_TOPICS_PER_CHUNK
+    prompts = []
+    for number, (window_first, window_last) in enumerate(windows, start=offset // TOPICS_PER_CHUNK):
+        scope = ""
+        if len(windows) > 1 or offset:
+            focus = FOCUS_AREAS[number % len(FOCUS_AREAS)]
+            scope = (f"These are days {window_first}-{window_last} of a {offset + duration}-day calendar; "
+                     f"focus this part on {focus}.")
+        prompts.append(get_day_planner_prompt().format(brand_theme=brand_theme, count=count, scope=scope))
+    
+    parsed = iter_completions(llm, prompts, batch_size, task="topic generation", parse=parse_and_count,
+                              max_tokens=8 + count * TOPIC_MAX_TOKENS, stop=TOPICS_STOP,
+                              grammar=build_topics_grammar(count))
+    
+    topics: List[str] = []
+    needed = 0
+    for (window_first, window_last), window_topics in zip(windows, parsed):
+        needed += window_last - window_first + 1
+        
+        for topic in window_topics or []:
+            if len(topics) >= needed:
+                break
+            if index.add(topic):
+                topics.append(topic)
+    return topics
+
+def plan_topics(state: Dict, duration: int, existing: Sequence[str] = (), first_day: int = 1) -> List[str]:
+    """Come up with duration topics, none of them a near-duplicate of the existing topics.
+
+    Args:
+        state: Plan settings (brand_theme, use_model, batch_size, session_id,
+            priority), as in the graph state
+        duration: Number of topics (days) to plan
+        existing: Topics already in the calendar, when extending a saved plan
+        first_day: Day number of the first new topic
+    """
     brand_theme = state["brand_theme"]
-    duration = state["duration"]
     use_model = state.get("use_model", True)  # Default to True if not specified
     
+    batch_size = state.get("batch_size") or DEFAULT_BATCH_SIZE
+    
     # Try to use LLM for topic generation if requested
     llm = None
     if use_model:
-        llm = get_llm()  # Use TinyLlama for topic generation
+        llm = get_llm(session_id=state.get("session_id"),
+                      priority=state.get("priority"))  # Use TinyLlama for topic generation
     topics = []
     
-    if llm:
-        try:
-            # Generate the prompt
-            prompt = day_planner_prompt.format(brand_theme=brand_theme, duration=duration)
-            
-            # Get response from LLM
-            response = llm.invoke(prompt)
-            
-            # Parse the response into a list of topics
-            for line in response.strip().split("\n"):
-                # Remove numbering and whitespace
-                cleaned_line = line.strip()
-                if cleaned_line:
-                    # Extract just the topic text (remove numbering like "1. ")
-                    if ". " in cleaned_line and cleaned_line[0].isdigit():
-                        topic = cleaned_line.split(". ", 1)[1]
-                    else:
-                        topic = cleaned_line
-                    topics.append(topic)
-        except Exception as e:
-            print(f"Error using LLM for topic generation: {e}")
-            print("Falling back to rule-based topic generation...")
-            topics = []
+    index = NearDuplicateIndex(ignore=[brand_theme])
+    for topic in existing:
+        index.add(topic)
     
-    # If LLM failed or is not available or not requested, use rule-based approach
-    if not topics:
+    if llm:
+        topics = generate_llm_topics(llm, brand_theme, duration, index, batch_size, first_day)
+        
+        # Top up a short LLM plan with rule-based topics it does not already cover
+        if len(topics) < duration:
+            print(f"LLM produced {len(topics)} of {duration} unique topics, filling the rest with rule-based topics...")
+            missing = duration - len(topics)
+            topics.extend(topic for topic in generate_rule_based_topics(brand_theme, len(existing) + duration)
+                          if index.add(topic))
+            topics = topics[:duration]
+            metrics.record(rule_based_fallbacks=missing)
+    elif existing:
+        # The rule-based topics run in a fixed order; skip the ones the calendar has
+        topics = [topic for topic in generate_rule_based_topics(brand_theme, len(existing) + duration)
+                  if index.add(topic)][:duration]
+    else:
         topics = generate_rule_based_topics(brand_theme, duration)
     
-    # Ensure we have exactly the requested number of topics
-    topics = topics[:duration]
-    
     # If we still don't have enough topics, generate some generic ones
     while len(topics) < duration:
-        topics.append(f"Day {len(topics) + 1} - {brand_theme} Tips")
+        topics.append(f"Day {first_day + len(topics)} - {brand_theme} Tips")
     
+    return topics
+
+def day_planner_node(state: Dict) -> Dict:
+    """Generate topic ideas for each day based on the brand theme."""
     # Update the state with the topics
-    state["topics"] = topics
-    return state
\ No newline at end of file
+    state["topics"] = plan_topics(state, state["duration"])
+    return state
+
+async def aday_planner_node(state: Dict) -> Dict:
+    """Async day_planner_node: rule-based plans run inline, model plans on the model executor."""
+    if state.get("use_model", True):
+        return await run_in_llm_executor(day_planner_node, state)
+    return day_planner_node(state)
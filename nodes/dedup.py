@@ -0,0 +1,69 @@
+import re
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Set
+
+# Words that do not distinguish one topic from another
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how in into is it its of on or our the to with your you".split()
+)
+
+
+def normalize_words(text: str, ignore: Iterable[str] = ()) -> FrozenSet[str]:
+    """Reduce text to its set of significant lowercase words, with plural 's' stripped."""
+    words = set()
+    for word in re.findall(r"[a-z0-9]+", text.lower().replace("'", "")):
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        if word not in STOPWORDS:
+            words.add(word)
+    return frozenset(words - set(ignore))
+
+
+class NearDuplicateIndex:
+    """Incremental index for spotting near-duplicate short texts such as topics.
+
+    Texts are compared as sets of significant words by Jaccard similarity.
+    An inverted index from word to texts limits each lookup to the texts
+    sharing at least one word, so adding n topics stays close to linear.
+    Words shared by everything (e.g. the brand theme) are passed as ignore
+    and left out of the comparison.
+    """
+
+    def __init__(self, threshold: float = 0.75, ignore: Iterable[str] = ()):
+        self.threshold = threshold
+        self.ignore = normalize_words(" ".join(ignore))
+        self._entries: List[FrozenSet[str]] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._exact: Set[FrozenSet[str]] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_duplicate(self, text: str) -> bool:
+        """Check whether text is a near-duplicate of anything already added."""
+        words = normalize_words(text, self.ignore)
+        if words in self._exact:
+            return True
+
+        overlaps: Dict[int, int] = defaultdict(int)
+        for word in words:
+            for entry in self._postings.get(word, ()):
+                overlaps[entry] += 1
+        for entry, overlap in overlaps.items():
+            union = len(words) + len(self._entries[entry]) - overlap
+            if overlap / union >= self.threshold:
+                return True
+        return False
+
+    def add(self, text: str) -> bool:
+        """Add text unless it is a near-duplicate; return whether it was added."""
+        if self.is_duplicate(text):
+            return False
+
+        words = normalize_words(text, self.ignore)
+        entry = len(self._entries)
+        self._entries.append(words)
+        self._exact.add(words)
+        for word in words:
+            self._postings[word].append(entry)
+        return True
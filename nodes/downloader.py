@@ -0,0 +1,318 @@
+"""Resumable, verified model downloads.
+
+Files are fetched into <dest>.part with parallel HTTP range requests. The
+pieces already written are recorded in <dest>.part.json, so an interrupted
+download resumes where it stopped. Only once the size and SHA-256 check
+out is the file renamed to <dest>, so a file at <dest> is always complete;
+a file already there is checked the same way before it is reused.
+A lock file keeps concurrent processes from downloading the same file
+twice: the second one waits and then finds the finished file.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Where models are fetched from; any server with Hugging Face's URL layout works
+DEFAULT_MIRROR_URL = "https://huggingface.co"
+
+# Parallel range requests per download
+DEFAULT_CONNECTIONS = 4
+
+# Size of each range request, and so the granularity of resuming
+PIECE_SIZE = 16 * 1024 * 1024
+
+# Bytes read from the network per write
+CHUNK_SIZE = 1024 * 1024
+
+# Attempts per piece before the download fails
+PIECE_RETRIES = 3
+
+# Seconds to wait for the server before giving up on a request
+REQUEST_TIMEOUT = 30
+
+
+class DownloadError(Exception):
+    """A download could not be completed or verified."""
+
+
+def model_url(repo_id: str, filename: str, mirror_url: Optional[str] = None) -> str:
+    """Build the URL of a file in a model repository on the mirror (default: $MODEL_MIRROR_URL or Hugging Face)."""
+    mirror_url = mirror_url or os.environ.get("MODEL_MIRROR_URL") or DEFAULT_MIRROR_URL
+    return f"{mirror_url.rstrip('/')}/{repo_id}/resolve/main/{filename}"
+
+
+def sha256_file(path: str) -> str:
+    """Hash a file with SHA-256."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive lock on path (created if missing) across processes.
+
+    The lock is released by the operating system if the holder dies, so a
+    crashed download never leaves others waiting forever.
+    """
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass  # LK_LOCK gives up after 10 seconds; keep waiting
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def probe(url: str) -> Tuple[int, bool, Optional[str]]:
+    """Ask the server for the file's size, whether it serves byte ranges and its SHA-256 if it says.
+
+    Hugging Face reports the SHA-256 of LFS files in the X-Linked-Etag header.
+    """
+    import requests
+
+    response = requests.head(url, allow_redirects=True, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    size = int(response.headers.get("Content-Length") or 0)
+    ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+
+    sha256 = None
+    for request in list(response.history) + [response]:
+        etag = request.headers.get("X-Linked-Etag", "").strip('"')
+        if re.fullmatch(r"[0-9a-f]{64}", etag):
+            sha256 = etag
+            break
+    return size, ranges, sha256
+
+
+class _Progress:
+    """Downloaded pieces of a file, saved so a later run can resume."""
+
+    def __init__(self, path: str, url: str, size: int, sha256: Optional[str], pieces: int):
+        self.path = path
+        self.url = url
+        self.size = size
+        self.sha256 = sha256
+        self.pieces = pieces
+        self.done: List[int] = []
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """Pick up the pieces of an earlier run for the same file, if any.
+
+        The earlier run may have used another mirror. Pieces are kept when
+        the size matches and the checksums, where both are known, agree;
+        the final checksum catches anything else.
+        """
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        saved_sha256 = saved.get("sha256")
+        same_file = saved.get("size") == self.size and (
+            saved_sha256 == self.sha256 or saved_sha256 is None or self.sha256 is None)
+        if same_file:
+            self.done = saved.get("done", [])
+
+    def mark_done(self, start: int) -> None:
+        with self._lock:
+            self.done.append(start)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"url": self.url, "size": self.size, "sha256": self.sha256, "done": self.done}, f)
+            os.replace(temp_path, self.path)
+            # Report roughly every tenth of the file
+            if len(self.done) * 10 // self.pieces > (len(self.done) - 1) * 10 // self.pieces:
+                print(f"  {len(self.done) * 100 // self.pieces}% downloaded")
+
+
+def _fetch_piece(url: str, part_path: str, start: int, end: int) -> None:
+    """Download bytes start..end (inclusive) into the same offsets of part_path, retrying on errors."""
+    import requests
+
+    for attempt in range(1, PIECE_RETRIES + 1):
+        try:
+            response = requests.get(url, headers={"Range": f"bytes={start}-{end}"}, stream=True,
+                                   timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise DownloadError(f"server ignored the range request for bytes {start}-{end}")
+            written = 0
+            with open(part_path, "r+b") as f:
+                f.seek(start)
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    written += len(chunk)
+            if written != end - start + 1:
+                raise DownloadError(f"got {written} of {end - start + 1} bytes for bytes {start}-{end}")
+            return
+        except Exception:
+            if attempt == PIECE_RETRIES:
+                raise
+            time.sleep(2 ** attempt)
+
+
+def _fetch_whole(url: str, part_path: str) -> None:
+    """Download the file in one request, for servers that do not serve byte ranges."""
+    import requests
+
+    response = requests.get(url, stream=True, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    with open(part_path, "wb") as f:
+        for chunk in response.iter_content(CHUNK_SIZE):
+            f.write(chunk)
+
+
+def _verified_path(path: str) -> str:
+    return path + ".sha256.json"
+
+
+def _remember_sha256(path: str, sha256: str) -> None:
+    """Record the SHA-256 of a verified file next to it, so reusing it later skips the hash."""
+    stat = os.stat(path)
+    try:
+        with open(_verified_path(path), "w", encoding="utf-8") as f:
+            json.dump({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}, f)
+    except OSError:
+        pass  # Only costs a rehash next time
+
+
+def _matches(path: str, size: Optional[int], sha256: Optional[str]) -> bool:
+    """Whether the file at path has the given size and SHA-256, skipping whichever is unknown.
+
+    The hash recorded by _remember_sha256 is used while the file's size and
+    modification time are unchanged.
+    """
+    stat = os.stat(path)
+    if size and stat.st_size != size:
+        return False
+    if not sha256:
+        return True
+    try:
+        with open(_verified_path(path), encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("size") == stat.st_size and saved.get("mtime_ns") == stat.st_mtime_ns:
+            return saved.get("sha256") == sha256
+    except (OSError, ValueError):
+        pass
+    actual_sha256 = sha256_file(path)
+    _remember_sha256(path, actual_sha256)
+    return actual_sha256 == sha256
+
+
+def download_file(url: str, dest: str, sha256: Optional[str] = None, connections: Optional[int] = None) -> str:
+    """Download url to dest, resuming an interrupted download and verifying the result.
+
+    Args:
+        url: The file's URL
+        dest: Where to save it
+        sha256: Expected SHA-256 of the file; taken from the server's
+            X-Linked-Etag header when not given. Without either only the
+            size is checked.
+        connections: Parallel range requests (default: $MODEL_DOWNLOAD_CONNECTIONS or 4)
+
+    Returns:
+        dest
+
+    Raises:
+        DownloadError: The file could not be downloaded or failed verification
+    """
+    import requests
+
+    connections = connections or int(os.environ.get("MODEL_DOWNLOAD_CONNECTIONS", DEFAULT_CONNECTIONS))
+    part_path = dest + ".part"
+    os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+
+    with file_lock(dest + ".lock"):
+        try:
+            size, ranges, server_sha256 = probe(url)
+        except requests.RequestException as e:
+            # Offline: an existing file is used if it matches the checksum we were given
+            if os.path.exists(dest) and _matches(dest, None, (sha256 or "").lower() or None):
+                print(f"Cannot reach {url} to check {dest}; using it as it is")
+                return dest
+            raise DownloadError(f"cannot reach {url}: {e}")
+        sha256 = (sha256 or server_sha256 or "").lower() or None
+
+        # Another process may have finished the download while we waited, or
+        # an earlier run left a file there; either way it must match
+        if os.path.exists(dest):
+            if _matches(dest, size, sha256):
+                return dest
+            print(f"{dest} does not match {url}; downloading it again")
+            os.remove(dest)
+            if os.path.exists(_verified_path(dest)):
+                os.remove(_verified_path(dest))
+
+        pieces = [(start, min(start + PIECE_SIZE, size) - 1) for start in range(0, size, PIECE_SIZE)]
+        progress = _Progress(part_path + ".json", url, size, sha256, len(pieces))
+        try:
+            if ranges and size:
+                progress.load()
+                if not progress.done or not os.path.exists(part_path):
+                    progress.done = []
+                    with open(part_path, "wb") as f:
+                        f.truncate(size)
+                done = set(progress.done)
+                remaining = [piece for piece in pieces if piece[0] not in done]
+                if done:
+                    print(f"Resuming download: {len(pieces) - len(remaining)} of {len(pieces)} pieces already done")
+
+                def fetch(piece: Tuple[int, int]) -> None:
+                    _fetch_piece(url, part_path, *piece)
+                    progress.mark_done(piece[0])
+
+                with ThreadPoolExecutor(max_workers=max(1, connections)) as executor:
+                    list(executor.map(fetch, remaining))
+            else:
+                _fetch_whole(url, part_path)
+        except requests.RequestException as e:
+            raise DownloadError(f"download of {url} failed: {e}")
+
+        # Verify before the file takes its final name
+        actual_size = os.path.getsize(part_path)
+        if size and actual_size != size:
+            raise DownloadError(f"downloaded {actual_size} bytes of {url}, expected {size}")
+        if sha256:
+            actual_sha256 = sha256_file(part_path)
+            if actual_sha256 != sha256:
+                os.remove(part_path)
+                if os.path.exists(progress.path):
+                    os.remove(progress.path)
+                raise DownloadError(f"SHA-256 of {url} is {actual_sha256}, expected {sha256}")
+        else:
+            print(f"No SHA-256 known for {url}; only the size was checked")
+
+        os.replace(part_path, dest)
+        if sha256:
+            _remember_sha256(dest, sha256)
+        if os.path.exists(progress.path):
+            os.remove(progress.path)
+    return dest
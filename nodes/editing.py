@@ -0,0 +1,152 @@
+"""Incremental edits to a saved content plan.
+
+Regenerating a few days or extending a calendar does not rerun the whole
+workflow: only the affected days go through the day planner and content
+generator, and every other row is copied unchanged from the saved plan.
+"""
+import csv
+import json
+import re
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from nodes.content_generator import generate_content
+from nodes.day_planner import plan_topics
+from nodes.formatter import COLUMNS, ContentTable, plan_columns
+from nodes.platforms import validate_platforms
+from nodes.sinks import format_for_path
+
+
+def iter_plan_rows(path: str) -> Iterator[Dict]:
+    """Read the rows of a saved plan (CSV, JSONL or Parquet) one by one.
+
+    The columns are those of the first row: a caption and hashtags, or a
+    post per platform.
+
+    Raises:
+        ValueError: The file is not a content plan
+    """
+    fmt = format_for_path(path)
+    if fmt == "parquet":
+        import pandas as pd
+
+        rows: Iterable[Dict] = pd.read_parquet(path).to_dict("records")
+    else:
+        f = open(path, newline="", encoding="utf-8")
+        rows = csv.DictReader(f) if fmt == "csv" else (json.loads(line) for line in f if line.strip())
+
+    try:
+        columns = None
+        for row in rows:
+            columns = columns or columns_of(path, row)
+            missing = [column for column in columns if column not in row]
+            if missing:
+                raise ValueError(f"{path} is not a content plan: missing {', '.join(missing)}")
+            yield row
+    finally:
+        if fmt != "parquet":
+            f.close()
+
+
+def columns_of(path: str, row: Dict) -> List[str]:
+    """Work out a plan's columns from one of its rows."""
+    if "caption" in row or "hashtags" in row:
+        return list(COLUMNS)
+    platforms = [column for column in row if column not in ("day", "topic")]
+    try:
+        return plan_columns(validate_platforms(platforms))
+    except ValueError:
+        raise ValueError(f"{path} is not a content plan: unexpected columns {', '.join(platforms)}")
+
+
+def load_plan(path: str) -> ContentTable:
+    """Load a saved plan into a ContentTable."""
+    rows = iter_plan_rows(path)
+    first = next(rows, None)
+    table = ContentTable(columns=columns_of(path, first) if first else None)
+    if first:
+        table.append(first)
+    for row in rows:
+        table.append(row)
+    return table
+
+
+def select_days(table: ContentTable, days: Iterable[int] = (), matching: Optional[str] = None) -> List[int]:
+    """Find the rows to regenerate.
+
+    Args:
+        table: The plan
+        days: Day numbers to select
+        matching: Also select days whose topic or caption (or any
+            platform's post) matches this regular expression (case-insensitive)
+
+    Returns:
+        Row indices in plan order
+
+    Raises:
+        ValueError: A requested day is not in the plan, or matching is not a valid pattern
+    """
+    wanted = set(days)
+    missing = wanted.difference(table.day)
+    if missing:
+        raise ValueError(f"The plan has no day {', '.join(map(str, sorted(missing)))} "
+                         f"(it covers days {min(table.day, default=0)}-{max(table.day, default=0)})")
+    try:
+        pattern = re.compile(matching, re.IGNORECASE) if matching else None
+    except re.error as e:
+        raise ValueError(f"Invalid filter '{matching}': {e}")
+
+    searched = [table.text[column] for column in ["topic"] + (table.platforms or ["caption"])]
+    return [
+        index for index in range(len(table))
+        if table.day[index] in wanted or (pattern and any(pattern.search(values[index]) for values in searched))
+    ]
+
+
+def regenerate_days(table: ContentTable, indices: List[int], state: Dict) -> ContentTable:
+    """Write new captions and hashtags (or platform posts) for some days of a plan, keeping their topics.
+
+    The completion cache is bypassed for these days; it would hand back the
+    content being replaced.
+
+    Args:
+        table: The saved plan
+        indices: Rows to regenerate (see select_days)
+        state: Plan settings (brand_theme, use_model, randomness, ...), as in the graph state
+
+    Returns:
+        A new table with the regenerated rows in place of the old ones
+    """
+    state = dict(state, platforms=table.platforms or None)
+    topics = [table.topic[index] for index in indices]
+    regenerated = dict(zip(indices, generate_content(state, topics, cache=False)))
+
+    edited = ContentTable(columns=table.columns)
+    for index, row in enumerate(table):
+        if index in regenerated:
+            row = dict(regenerated[index], day=row["day"])
+        edited.append(row)
+    return edited
+
+
+def extend_plan(table: ContentTable, days: int, state: Dict) -> ContentTable:
+    """Add days to the end of a plan.
+
+    New topics are planned against the topics already in the calendar, so
+    the extension does not repeat them, and are numbered on from its last day.
+
+    Args:
+        table: The saved plan
+        days: Number of days to add
+        state: Plan settings (brand_theme, use_model, randomness, ...), as in the graph state
+
+    Returns:
+        A new table with the existing rows followed by the new days
+    """
+    state = dict(state, platforms=table.platforms or None)
+    first_day = max(table.day, default=0) + 1
+    topics = plan_topics(state, days, existing=table.topic, first_day=first_day)
+
+    extended = ContentTable(table, table.columns)
+    for row in generate_content(state, topics, first_day=first_day):
+        extended.append(row)
+    return extended
@@ -1,18 +1,107 @@
-from typing import Dict
-import pandas as pd
+import csv
+import io
+import json
+import os
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+COLUMNS = ["day", "topic", "caption", "hashtags"]
+
+
+def plan_columns(platforms: Optional[Sequence[str]] = None) -> List[str]:
+    """Columns of a plan: a caption and hashtags, or one finished post per platform."""
+    if platforms:
+        return ["day", "topic"] + list(platforms)
+    return list(COLUMNS)
+
+
+class ContentTable:
+    """Column-oriented content plan.
+
+    Days are kept in a compact integer array and the text columns in plain
+    lists of strings, so a plan costs little more than its strings. Hashtag
+    lines repeat a lot across days and are stored once each. pandas is only
+    imported when a caller asks for a DataFrame. A multi-platform plan has
+    a post column per platform instead of caption and hashtags.
+    """
+
+    def __init__(self, rows: Iterable[Dict[str, Any]] = (), columns: Optional[Sequence[str]] = None):
+        self.columns = list(columns or COLUMNS)
+        self.day = array("l")
+        self.text: Dict[str, List[str]] = {column: [] for column in self.columns if column != "day"}
+        self._hashtag_lines: Dict[str, str] = {}
+        for row in rows:
+            self.append(row)
+
+    @property
+    def topic(self) -> List[str]:
+        return self.text["topic"]
+
+    @property
+    def caption(self) -> List[str]:
+        return self.text["caption"]
+
+    @property
+    def hashtags(self) -> List[str]:
+        return self.text["hashtags"]
+
+    @property
+    def platforms(self) -> List[str]:
+        """The platforms of a multi-platform plan; empty for a single-caption plan."""
+        return self.columns[2:] if self.columns != COLUMNS else []
+
+    def append(self, row: Dict[str, Any]) -> None:
+        """Add one day of content."""
+        self.day.append(int(row["day"]))
+        for column, values in self.text.items():
+            value = str(row[column])
+            if column == "hashtags":
+                value = self._hashtag_lines.setdefault(value, value)
+            values.append(value)
+
+    def __len__(self) -> int:
+        return len(self.day)
+
+    def row(self, index: int) -> Dict[str, Any]:
+        """Get one day of content as a dict."""
+        row: Dict[str, Any] = {"day": self.day[index]}
+        for column, values in self.text.items():
+            row[column] = values[index]
+        return row
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(len(self)):
+            yield self.row(index)
+
+    def to_csv(self) -> str:
+        """Render the plan as CSV with a header row."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator=os.linesep)
+        writer.writerow(self.columns)
+        writer.writerows(zip(self.day, *self.text.values()))
+        return buffer.getvalue()
+
+    def to_jsonl(self) -> str:
+        """Render the plan as JSON Lines, one object per day."""
+        return "".join(json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n" for row in self)
+
+    def to_dataframe(self):
+        """Build a pandas DataFrame of the plan."""
+        import pandas as pd
+
+        return pd.DataFrame({"day": self.day, **self.text}, columns=self.columns)
+
 
 def formatter_node(state: Dict) -> Dict:
-    """Format the content into a structured DataFrame."""
+    """Format the content into a ContentTable."""
     # Extract content from state
     content_list = state["content"]
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(content_list)
-    
-    # Ensure columns are in the correct order
-    df = df[["day", "topic", "caption", "hashtags"]]
-    
-    # Store the DataFrame in the state
-    state["formatted_content"] = df
-    
-    return state
\ No newline at end of file
+
+    # Store the columns in the order they are written out; one post column per platform
+    state["formatted_content"] = ContentTable(content_list, plan_columns(state.get("platforms")))
+
+    return state
+
+async def aformatter_node(state: Dict) -> Dict:
+    """Async formatter_node; building the table is quick enough to run inline."""
+    return formatter_node(state)
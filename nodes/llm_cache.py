@@ -0,0 +1,270 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Default cache limits; the least recently used completions are evicted first
+DEFAULT_MAX_ENTRIES = 50_000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key TEXT PRIMARY KEY,
+    completion TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS completions_last_used ON completions (last_used);
+CREATE TABLE IF NOT EXISTS model_hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    sha256 TEXT NOT NULL
+);
+"""
+
+def get_cache_path() -> str:
+    """Get the path to the completion cache database."""
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cache_dir = os.path.join(base_dir, "cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, "llm_cache.sqlite3")
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Compute the sha256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CompletionCache:
+    """SQLite-backed cache of LLM completions with LRU eviction.
+
+    The cache is bounded both by number of entries and by total completion
+    size. It is safe to share between threads, and between processes through
+    SQLite's own locking.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path or get_cache_path()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def make_key(model_hash: str, prompt: str, temperature: float, seed: int, **params: Any) -> str:
+        """Build the cache key for a completion request."""
+        payload = json.dumps(
+            {"model": model_hash, "prompt": prompt, "temperature": temperature, "seed": seed, "params": params},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Look up a completion, marking it as recently used."""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT completion FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, completion: str) -> None:
+        """Store a completion, evicting the least recently used entries if over the limits."""
+        size = len(completion.encode("utf-8"))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, completion, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, completion, size, time.time()),
+            )
+            self._evict()
+
+    def discard(self, key: str) -> None:
+        """Remove a completion, e.g. one that turned out not to parse."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+
+    def _evict(self) -> None:
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        stale = []
+        for key, size in self._conn.execute("SELECT key, size FROM completions ORDER BY last_used"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            stale.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM completions WHERE key = ?", stale)
+
+    def model_hash(self, model_path: str) -> str:
+        """Get the sha256 of a model file, reusing the stored hash while size and mtime are unchanged."""
+        path = os.path.abspath(model_path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime, sha256 FROM model_hashes WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime:
+            return row[2]
+
+        sha256 = file_sha256(path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO model_hashes (path, size, mtime, sha256) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime, sha256),
+            )
+        return sha256
+
+    def clear(self) -> int:
+        """Remove every cached completion and return how many were removed."""
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM completions").rowcount
+
+    def stats(self) -> Dict[str, int]:
+        """Get entry count, stored bytes and this process's hit/miss counters."""
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+        return {"entries": count, "bytes": total, "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedLLM:
+    """Wraps an LLM handle so repeated requests are served from the cache.
+
+    A hit returns the stored completion without running the model at all.
+    The handle itself is only created, by calling load, on the first miss,
+    so a fully cached run never loads the model. model_id identifies the
+    model behind the handle, e.g. the sha256 of the GGUF file for the
+    in-process backend; temperature and seed are the handle's defaults,
+    which are part of every cache key.
+
+    New completions are only stored once the caller has parsed them and
+    calls commit(), so a truncated or malformed completion is not replayed
+    on every later run.
+    """
+
+    def __init__(self, load: Callable[[], Any], cache: CompletionCache, model_id: str, temperature: float,
+                 seed: int = -1):
+        self._load = load
+        self._llm = None
+        self._load_failed = False
+        self._load_lock = threading.Lock()
+        self.cache = cache
+        self.model_id = model_id
+        self.temperature = temperature
+        self.seed = seed
+        # Completions generated through this handle and not committed yet, by cache key
+        self._fresh: Dict[str, str] = {}
+        self._fresh_lock = threading.Lock()
+
+    @property
+    def llm(self):
+        """The wrapped handle, created on first use.
+
+        Raises:
+            RuntimeError: load returned no handle (the model is unavailable)
+        """
+        with self._load_lock:
+            if self._llm is None and not self._load_failed:
+                self._llm = self._load()
+                self._load_failed = self._llm is None
+            if self._llm is None:
+                raise RuntimeError("the model is not available")
+            return self._llm
+
+    def _key(self, prompt: Any, kwargs: Dict[str, Any]) -> str:
+        params = dict(kwargs)
+        temperature = params.pop("temperature", self.temperature)
+        seed = params.pop("seed", self.seed)
+        return self.cache.make_key(self.model_id, str(prompt), temperature, seed, **params)
+
+    def invoke(self, prompt: Any, **kwargs: Any) -> str:
+        key = self._key(prompt, kwargs)
+        completion = self.cache.get(key)
+        if completion is None:
+            completion = self.llm.invoke(prompt, **kwargs)
+            with self._fresh_lock:
+                self._fresh[key] = completion
+        return completion
+
+    def generate_batch(self, prompts: List[str], **kwargs: Any) -> List[str]:
+        """Batched generation that only decodes the prompts missing from the cache."""
+        keys = [self._key(prompt, kwargs) for prompt in prompts]
+        completions = [self.cache.get(key) for key in keys]
+        missing = [i for i, completion in enumerate(completions) if completion is None]
+
+        if missing:
+            generated = self.llm.generate_batch([prompts[i] for i in missing], **kwargs)
+            with self._fresh_lock:
+                for i, completion in zip(missing, generated):
+                    completions[i] = completion
+                    self._fresh[keys[i]] = completion
+        return completions
+
+    def commit(self, prompt: Any, valid: bool = True, **kwargs: Any) -> None:
+        """Store the completion generated for a prompt once the caller has parsed it.
+
+        With valid=False the completion is dropped instead, and so is a
+        cached one that no longer parses, so the prompt runs the model again
+        next time.
+        """
+        key = self._key(prompt, kwargs)
+        with self._fresh_lock:
+            completion = self._fresh.pop(key, None)
+        if not valid:
+            self.cache.discard(key)
+        elif completion is not None:
+            self.cache.put(key, completion)
+
+
+_cache: Optional[CompletionCache] = None
+_cache_enabled = True
+_cache_lock = threading.Lock()
+
+
+def set_cache_enabled(enabled: bool) -> None:
+    """Turn the completion cache on or off for this process."""
+    global _cache_enabled
+    _cache_enabled = enabled
+
+
+def is_cache_enabled() -> bool:
+    return _cache_enabled
+
+
+def reset_completion_cache() -> None:
+    """Drop this process's cache connection so the next use opens a new one.
+
+    A forked process must call this before using the cache: an SQLite
+    connection inherited from the parent is not safe to use. The inherited
+    connection is left unclosed, since it is still the parent's.
+    """
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+
+def get_completion_cache() -> CompletionCache:
+    """Get the process-wide completion cache, opening it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CompletionCache()
+        return _cache
@@ -0,0 +1,203 @@
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+# Per-node counters. Wall and LLM times are in seconds.
+NODE_FIELDS = [
+    "runs",
+    "wall_seconds",
+    "llm_calls",
+    "prompt_tokens",
+    "completion_tokens",
+    "prompt_eval_seconds",
+    "decode_seconds",
+    "llm_seconds",
+    "parse_failures",
+    "rule_based_fallbacks",
+]
+
+_METRIC_HELP = {
+    "runs": ("node_runs_total", "counter", "Number of times the node ran"),
+    "wall_seconds": ("node_wall_seconds_total", "counter", "Wall time spent in the node"),
+    "llm_calls": ("llm_calls_total", "counter", "LLM requests made by the node (a batch counts once)"),
+    "prompt_tokens": ("llm_prompt_tokens_total", "counter", "Prompt tokens evaluated by the LLM"),
+    "completion_tokens": ("llm_completion_tokens_total", "counter", "Tokens generated by the LLM"),
+    "prompt_eval_seconds": ("llm_prompt_eval_seconds_total", "counter", "Time the LLM spent evaluating prompts"),
+    "decode_seconds": ("llm_decode_seconds_total", "counter", "Time the LLM spent generating tokens"),
+    "llm_seconds": ("llm_seconds_total", "counter", "Wall time of LLM requests"),
+    "parse_failures": ("llm_parse_failures_total", "counter", "LLM completions that could not be parsed"),
+    "rule_based_fallbacks": ("rule_based_fallbacks_total", "counter", "Items produced by the rule-based fallback"),
+}
+
+_current_node: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_node", default=None)
+_current_run: contextvars.ContextVar[Optional["RunMetrics"]] = contextvars.ContextVar("current_run", default=None)
+
+
+class RunMetrics:
+    """Metrics of one graph run, broken down by node."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.nodes: Dict[str, Dict[str, float]] = {}
+
+    def add(self, node: str, **values: float) -> None:
+        with self._lock:
+            stats = self.nodes.setdefault(node, dict.fromkeys(NODE_FIELDS, 0))
+            for field, value in values.items():
+                stats[field] += value
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {node: dict(stats) for node, stats in self.nodes.items()}
+
+
+class MetricsRegistry(RunMetrics):
+    """Process-wide metrics, accumulated over every run."""
+
+    def __init__(self):
+        super().__init__()
+        self.model_loads = 0
+        self.model_load_seconds = 0.0
+
+    def record_model_load(self, seconds: float) -> None:
+        with self._lock:
+            self.model_loads += 1
+            self.model_load_seconds += seconds
+
+    def render_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        nodes = self.snapshot()
+        lines = []
+        for field in NODE_FIELDS:
+            name, kind, help_text = _METRIC_HELP[field]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for node, stats in sorted(nodes.items()):
+                lines.append(f'{name}{{node="{node}"}} {stats[field]:g}')
+
+        lines.append("# HELP llm_tokens_per_second Generation throughput over the process lifetime")
+        lines.append("# TYPE llm_tokens_per_second gauge")
+        for node, stats in sorted(nodes.items()):
+            lines.append(f'llm_tokens_per_second{{node="{node}"}} {tokens_per_second(stats):g}')
+
+        with self._lock:
+            lines.append("# HELP model_loads_total Models loaded into memory")
+            lines.append("# TYPE model_loads_total counter")
+            lines.append(f"model_loads_total {self.model_loads}")
+            lines.append("# HELP model_load_seconds_total Time spent loading models")
+            lines.append("# TYPE model_load_seconds_total counter")
+            lines.append(f"model_load_seconds_total {self.model_load_seconds:g}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def tokens_per_second(stats: Dict[str, float]) -> float:
+    """Completion tokens per second of decode time, or of LLM time when decode time is unknown."""
+    seconds = stats["decode_seconds"] or stats["llm_seconds"]
+    return stats["completion_tokens"] / seconds if seconds else 0.0
+
+
+def record(**values: float) -> None:
+    """Add values to the metrics of the node currently running."""
+    node = _current_node.get() or "other"
+    registry.add(node, **values)
+    run = _current_run.get()
+    if run is not None:
+        run.add(node, **values)
+
+
+def record_llm_call(prompt_tokens: int, completion_tokens: int, seconds: float,
+                    prompt_eval_seconds: float = 0.0, decode_seconds: float = 0.0) -> None:
+    """Record one LLM request made on behalf of the current node."""
+    record(llm_calls=1, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, llm_seconds=seconds,
+           prompt_eval_seconds=prompt_eval_seconds, decode_seconds=decode_seconds)
+
+
+@contextmanager
+def measure_node(name: str) -> Iterator[None]:
+    """Attribute the wall time and LLM usage of the block to the named node."""
+    token = _current_node.set(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(runs=1, wall_seconds=time.perf_counter() - start)
+        _current_node.reset(token)
+
+
+def instrument_node(name: str) -> Callable:
+    """Decorate a graph node (sync or async) so its wall time and LLM usage are attributed to it."""
+    def decorator(node: Callable[[Dict], Dict]) -> Callable[[Dict], Dict]:
+        if inspect.iscoroutinefunction(node):
+            @functools.wraps(node)
+            async def async_wrapper(state: Dict) -> Dict:
+                with measure_node(name):
+                    return await node(state)
+            return async_wrapper
+
+        @functools.wraps(node)
+        def wrapper(state: Dict) -> Dict:
+            with measure_node(name):
+                return node(state)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def collect_run_metrics() -> Iterator[RunMetrics]:
+    """Collect the metrics of everything run inside the block, e.g. one graph.invoke."""
+    run = RunMetrics()
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+
+
+def format_summary(run: RunMetrics) -> str:
+    """Format a run's metrics as a per-node table."""
+    headers = ["Node", "Wall (s)", "LLM calls", "Prompt tok", "Gen tok", "Tok/s", "Parse fail", "Fallbacks"]
+    rows: List[List[str]] = []
+    for node, stats in run.snapshot().items():
+        rows.append([
+            node,
+            f"{stats['wall_seconds']:.3f}",
+            f"{stats['llm_calls']:g}",
+            f"{stats['prompt_tokens']:g}",
+            f"{stats['completion_tokens']:g}",
+            f"{tokens_per_second(stats):.1f}",
+            f"{stats['parse_failures']:g}",
+            f"{stats['rule_based_fallbacks']:g}",
+        ])
+
+    widths = [max(len(row[i]) for row in rows + [headers]) for i in range(len(headers))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(headers, widths))]
+    lines.append("  ".join("-" * width for width in widths))
+    lines.extend("  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in rows)
+    return "\n".join(lines)
+
+
+def format_worker_stats(workers: List[Dict[str, float]]) -> str:
+    """Format per-worker throughput of a model worker pool as a table."""
+    headers = ["Worker", "PID", "Calls", "Prompts", "Gen tok", "Busy (s)", "Tok/s"]
+    rows = [[
+        f"{stats['worker']:g}",
+        f"{stats['pid']:g}",
+        f"{stats['calls']:g}",
+        f"{stats['prompts']:g}",
+        f"{stats['completion_tokens']:g}",
+        f"{stats['seconds']:.3f}",
+        f"{stats['tokens_per_second']:.1f}",
+    ] for stats in workers]
+
+    widths = [max(len(row[i]) for row in rows + [headers]) for i in range(len(headers))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(headers, widths))]
+    lines.append("  ".join("-" * width for width in widths))
+    lines.extend("  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in rows)
+    return "\n".join(lines)
@@ -1,19 +1,253 @@
+import asyncio
+import atexit
+import contextvars
+import functools
+import json
 import os
+import re
 import sys
-from typing import Optional, Tuple
-from langchain_community.llms import LlamaCpp
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-# Check if huggingface_hub is installed
-try:
-    from huggingface_hub import hf_hub_download
-    HUGGINGFACE_HUB_AVAILABLE = True
-except ImportError:
-    HUGGINGFACE_HUB_AVAILABLE = False
+from nodes import metrics
+from nodes.batch_generation import clear_prefix_cache, generate_batch, release_contexts
+from nodes.downloader import DownloadError, download_file, model_url
+from nodes.llm_cache import CachedLLM, get_completion_cache, is_cache_enabled
+from nodes.runtime_profile import load_profile
+from nodes.scheduler import PRIORITY_NORMAL, ScheduledLLM, get_scheduler
+
+# llama_cpp and langchain_community are imported where they are used, so
+# rule-based runs never pay for loading them
+if TYPE_CHECKING:
+    from langchain_community.llms import LlamaCpp
 
 # TinyLlama model information
 TINYLLAMA_REPO_ID = "TheBloke/TinyLlama-1.1B-Chat-v1.0-GGUF"
 TINYLLAMA_FILENAME = "tinyllama-1.1b-chat-v1.0.Q4_K_M.gguf"
 
+# Default completion budget, matching the in-process LlamaCpp settings
+DEFAULT_MAX_TOKENS = 2048
+
+# Number of prompts decoded together as parallel sequences when using the model
+DEFAULT_BATCH_SIZE = 8
+
+# Worker processes of the llama-cpp-workers backend
+DEFAULT_MODEL_WORKERS = 2
+
+# Threads that run blocking model work on behalf of async nodes. Most of them
+# just wait for a scheduler slot, so there are enough for many queued plans
+LLM_EXECUTOR_WORKERS = 32
+
+# Default address of a local OpenAI-compatible server (llama-cpp-python's server)
+DEFAULT_OPENAI_BASE_URL = "http://localhost:8000/v1"
+
+
+class PooledLLM:
+    """A per-caller handle to a shared LlamaCpp instance.
+
+    The underlying model is owned by the pool. Each handle carries its own
+    default temperature and serialises calls on the model's lock, since a
+    llama.cpp context cannot run two generations at once. n_batch is the
+    batch size the model was loaded with explicitly (e.g. from the runtime
+    profile), which batched generation then uses too.
+    """
+
+    def __init__(self, llm: "LlamaCpp", lock: threading.Lock, temperature: float, n_batch: Optional[int] = None):
+        self.llm = llm
+        self.lock = lock
+        self.temperature = temperature
+        self.n_batch = n_batch
+
+    @property
+    def seed(self) -> int:
+        """The sampling seed the model was loaded with (-1 for random)."""
+        return getattr(self.llm, "seed", -1)
+
+    def invoke(self, prompt: Any, **kwargs: Any) -> str:
+        """Run a completion, applying this handle's temperature unless overridden.
+
+        A GBNF grammar may be passed as a string in the grammar keyword. A
+        prompt whose completion would not fit the model's context (llama.cpp
+        would silently cut max_tokens short) is decoded through
+        generate_batch instead, which sizes a context for it.
+        """
+        kwargs.setdefault("temperature", self.temperature)
+        if kwargs.get("max_tokens") and not self._fits_context(str(prompt), kwargs["max_tokens"]):
+            return self.generate_batch([str(prompt)], **kwargs)[0]
+        if isinstance(kwargs.get("grammar"), str):
+            from llama_cpp import LlamaGrammar
+            kwargs["grammar"] = LlamaGrammar.from_string(kwargs["grammar"], verbose=False)
+        with self.lock:
+            ctx = getattr(self.llm.client, "ctx", None)
+            if ctx is not None:
+                import llama_cpp
+                llama_cpp.llama_perf_context_reset(ctx)
+            start = time.perf_counter()
+            completion = self.llm.invoke(prompt, **kwargs)
+            seconds = time.perf_counter() - start
+            self._record_call(str(prompt), completion, seconds, ctx)
+            return completion
+
+    def _fits_context(self, prompt: str, max_tokens: int) -> bool:
+        client = self.llm.client
+        return len(client.tokenize(prompt.encode("utf-8"))) + max_tokens <= client.n_ctx()
+
+    def _record_call(self, prompt: str, completion: str, seconds: float, ctx: Any) -> None:
+        """Record token counts and timings of a completion, from llama.cpp's perf counters when available."""
+        if ctx is not None:
+            import llama_cpp
+            perf = llama_cpp.llama_perf_context(ctx)
+            metrics.record_llm_call(perf.n_p_eval, perf.n_eval, seconds,
+                                    prompt_eval_seconds=perf.t_p_eval_ms / 1000,
+                                    decode_seconds=perf.t_eval_ms / 1000)
+            return
+
+        client = self.llm.client
+        metrics.record_llm_call(len(client.tokenize(prompt.encode("utf-8"))),
+                                len(client.tokenize(completion.encode("utf-8"), add_bos=False)), seconds)
+
+    def generate_batch(self, prompts: List[str], **kwargs: Any) -> List[str]:
+        """Complete several prompts together as parallel llama.cpp sequences.
+
+        Accepts the keyword arguments of nodes.batch_generation.generate_batch.
+        """
+        kwargs.setdefault("temperature", self.temperature)
+        kwargs.setdefault("n_batch", self.n_batch)
+        with self.lock:
+            return generate_batch(self.llm.client, prompts, **kwargs)
+
+
+class ModelPool:
+    """Process-wide cache of loaded LlamaCpp models.
+
+    Models are keyed by their path and runtime settings (context size, thread
+    count, ...). Each model is loaded at most once; concurrent callers asking
+    for the same key wait for the first load instead of starting another one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[Tuple, "LlamaCpp"] = {}
+        self._model_locks: Dict[Tuple, threading.Lock] = {}
+        self._load_locks: Dict[Tuple, threading.Lock] = {}
+
+    @staticmethod
+    def make_key(model_path: str, settings: Dict[str, Any]) -> Tuple:
+        """Build the pool key for a model path and its runtime settings."""
+        return (os.path.abspath(model_path),) + tuple(sorted(settings.items()))
+
+    def get(self, model_path: str, temperature: float = 0.7, **settings: Any) -> PooledLLM:
+        """Return a handle to the model, loading it on first use.
+
+        Raises whatever LlamaCpp raises if the model cannot be loaded; failed
+        loads are not cached so a later call can retry.
+        """
+        key = self.make_key(model_path, settings)
+        with self._lock:
+            llm = self._models.get(key)
+            if llm is not None:
+                return PooledLLM(llm, self._model_locks[key], temperature, settings.get("n_batch"))
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Load outside the pool lock so different models can load in parallel
+        with load_lock:
+            with self._lock:
+                llm = self._models.get(key)
+            if llm is None:
+                from langchain_community.llms import LlamaCpp
+
+                start = time.perf_counter()
+                llm = LlamaCpp(
+                    model_path=model_path,
+                    temperature=temperature,
+                    max_tokens=DEFAULT_MAX_TOKENS,
+                    top_p=1,
+                    verbose=False,
+                    **settings,
+                )
+                metrics.registry.record_model_load(time.perf_counter() - start)
+                with self._lock:
+                    self._models[key] = llm
+                    self._model_locks[key] = threading.Lock()
+                    self._load_locks.pop(key, None)
+            with self._lock:
+                return PooledLLM(llm, self._model_locks[key], temperature, settings.get("n_batch"))
+
+    def evict(self, model_path: Optional[str] = None) -> int:
+        """Unload pooled models.
+
+        Args:
+            model_path: Only evict models loaded from this path. Evicts every
+                model when omitted.
+
+        Returns:
+            The number of models evicted.
+        """
+        target = os.path.abspath(model_path) if model_path else None
+        with self._lock:
+            keys = [key for key in self._models if target is None or key[0] == target]
+            evicted = [(self._models.pop(key), self._model_locks.pop(key)) for key in keys]
+
+        for llm, model_lock in evicted:
+            # Wait for any in-flight generation before freeing the context
+            with model_lock:
+                if getattr(llm, "client", None) is not None:
+                    release_contexts(llm.client)
+                close = getattr(getattr(llm, "client", None), "close", None)
+                if close is not None:
+                    close()
+        if evicted:
+            # Saved prefix states are keyed by model instance
+            clear_prefix_cache()
+        return len(evicted)
+
+    def close(self) -> None:
+        """Unload every pooled model."""
+        self.evict()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._models)
+
+
+_model_pool = ModelPool()
+atexit.register(_model_pool.close)
+
+
+def get_model_pool() -> ModelPool:
+    """Get the process-wide model pool."""
+    return _model_pool
+
+
+def evict_llm(model_path: Optional[str] = None) -> int:
+    """Unload pooled models, optionally only those loaded from model_path."""
+    return _model_pool.evict(model_path)
+
+_llm_executor: Optional[ThreadPoolExecutor] = None
+_llm_executor_lock = threading.Lock()
+
+
+def get_llm_executor() -> ThreadPoolExecutor:
+    """Get the dedicated executor for blocking model work, creating it on first use."""
+    global _llm_executor
+    with _llm_executor_lock:
+        if _llm_executor is None:
+            _llm_executor = ThreadPoolExecutor(max_workers=LLM_EXECUTOR_WORKERS, thread_name_prefix="llm")
+        return _llm_executor
+
+
+async def run_in_llm_executor(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Await func(*args, **kwargs) on the model executor, keeping the event loop free.
+
+    The caller's context variables (current node, run metrics, LangGraph's
+    stream writer) are carried over to the executor thread.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await loop.run_in_executor(get_llm_executor(), call)
+
 def get_models_dir() -> str:
     """Get the path to the models directory."""
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -21,83 +255,605 @@ def get_models_dir() -> str:
     os.makedirs(models_dir, exist_ok=True)
     return models_dir
 
-def download_model(repo_id: str, filename: str) -> Optional[str]:
-    """Download a model from Hugging Face Hub."""
-    if not HUGGINGFACE_HUB_AVAILABLE:
-        print("\nhuggingface_hub is not installed. To enable automatic model downloading, run:")
-        print("pip install huggingface_hub")
-        return None
-    
+def download_model(repo_id: str, filename: str, mirror_url: Optional[str] = None,
+                   sha256: Optional[str] = None) -> Optional[str]:
+    """Download a model from Hugging Face Hub or a mirror with the same URL layout.
+
+    The download resumes after interruptions, runs parallel range requests
+    and is verified before it is used (see nodes.downloader). A model that
+    is already on disk is verified the same way rather than trusted.
+
+    Args:
+        repo_id: The model repository
+        filename: The file in the repository
+        mirror_url: Base URL to download from (default: $MODEL_MIRROR_URL or https://huggingface.co)
+        sha256: Expected SHA-256 (default: $MODEL_SHA256, or what the server reports)
+    """
     models_dir = get_models_dir()
     model_path = os.path.join(models_dir, filename)
     
-    # Check if model already exists
-    if os.path.exists(model_path):
-        print(f"Model already exists at {model_path}")
-        return model_path
-    
+    url = model_url(repo_id, filename, mirror_url)
     try:
-        print(f"\nDownloading {filename} from {repo_id}...")
-        print("This may take a while depending on your internet connection.")
+        # An existing model is only reused once its size and checksum match the server's
+        if os.path.exists(model_path):
+            print(f"Checking existing model at {model_path}...")
+        else:
+            print(f"\nDownloading {filename} from {url}...")
+            print("This may take a while depending on your internet connection.")
         
         # Download the model
-        downloaded_path = hf_hub_download(
-            repo_id=repo_id,
-            filename=filename,
-            local_dir=models_dir,
-            local_dir_use_symlinks=False
-        )
+        downloaded_path = download_file(url, model_path, sha256=sha256 or os.environ.get("MODEL_SHA256"))
         
-        print(f"Model downloaded successfully to {downloaded_path}")
+        print(f"Model ready at {downloaded_path}")
         return downloaded_path
-    except Exception as e:
+    except (DownloadError, OSError) as e:
         print(f"Error downloading model: {e}")
         return None
 
-def get_llm(temperature: float = 0.7) -> Optional[LlamaCpp]:
-    """Initialize the LLM with appropriate settings.
+class LLMBackend:
+    """Interface for the model tier behind get_llm.
 
-    Args:
-        temperature: The temperature setting for generation (0.0-1.0)
+    A backend hands out per-caller LLM handles. Every handle offers
+    invoke(prompt, **kwargs) -> str and generate_batch(prompts, **kwargs) ->
+    List[str], and carries a default temperature that per-call kwargs
+    override.
     """
-    # Use TinyLlama model
-    repo_id = TINYLLAMA_REPO_ID
-    filename = TINYLLAMA_FILENAME
-    
-    models_dir = get_models_dir()
-    model_path = os.path.join(models_dir, filename)
-    
-    # Check if model exists, if not try to download it
-    if not os.path.exists(model_path):
-        if HUGGINGFACE_HUB_AVAILABLE:
+
+    name = ""
+
+    def get_handle(self, temperature: float = 0.7, **settings: Any) -> Optional[Any]:
+        """Get an LLM handle, or None if the backend is unavailable."""
+        raise NotImplementedError
+
+    def available(self) -> bool:
+        """Whether get_handle can work, checked without loading the model."""
+        return True
+
+    def cache_id(self) -> str:
+        """Identify the model behind this backend for the completion cache."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release any resources held by the backend."""
+
+
+class LlamaCppBackend(LLMBackend):
+    """Runs TinyLlama in-process through llama.cpp, using the process-wide model pool."""
+
+    name = "llama-cpp"
+
+    def __init__(self, repo_id: str = TINYLLAMA_REPO_ID, filename: str = TINYLLAMA_FILENAME):
+        self.repo_id = repo_id
+        self.filename = filename
+        self.model_path = os.path.join(get_models_dir(), filename)
+
+    def locate_model(self) -> Optional[str]:
+        """Get the path of the model file, downloading it if needed; None if it is unavailable."""
+        repo_id = self.repo_id
+        filename = self.filename
+        models_dir = get_models_dir()
+        model_path = self.model_path
+        
+        # Check if model exists, if not try to download it
+        if not os.path.exists(model_path):
             print(f"Model not found at {model_path}. Attempting to download...")
             model_path = download_model(repo_id, filename)
             if model_path is None:
-                return None
-        else:
-            print(f"\nModel not found at {model_path}")
-            print("To use the LLM functionality, you have two options:")
-            print("\n1. Install huggingface_hub for automatic downloads:")
-            print("   pip install huggingface_hub")
-            print("\n2. Manually download the model:")
-            print(f"   a. Visit https://huggingface.co/{repo_id}/")
-            print(f"   b. Download the '{filename}' file")
-            print(f"   c. Place it in the '{models_dir}' directory\n")
+                print("\nTo use the LLM functionality, you can also download the model manually:")
+                print(f"   a. Visit https://huggingface.co/{repo_id}/")
+                print(f"   b. Download the '{filename}' file")
+                print(f"   c. Place it in the '{models_dir}' directory\n")
+                print("Using rule-based fallback for generation...")
+        return model_path
+
+    def get_handle(self, temperature: float = 0.7, **settings: Any) -> Optional[PooledLLM]:
+        model_path = self.locate_model()
+        if model_path is None:
+            return None
+        
+        # Settings tuned for this host by autotune.py; explicit settings win
+        settings = {**load_profile(model_path), **settings}
+        
+        try:
+            # Print the model usage message when we're actually going to use it
+            print("\nUsing TinyLlama model for generation")
+
+            return _model_pool.get(model_path, temperature=temperature, **settings)
+        except Exception as e:
+            print(f"Error loading LlamaCpp model: {e}")
             print("Using rule-based fallback for generation...")
             return None
-    
-    try:
-        # Print the model usage message when we're actually going to use it
-        print("\nUsing TinyLlama model for generation")
-
-        return LlamaCpp(
-            model_path=model_path,
-            temperature=temperature,
-            max_tokens=2048,
-            top_p=1,
-            verbose=False,
-        )
-    except Exception as e:
-        print(f"Error loading LlamaCpp model: {e}")
-        print("Using rule-based fallback for generation...")
-        return None
\ No newline at end of file
+
+    def available(self) -> bool:
+        return self.locate_model() is not None
+
+    def cache_id(self) -> str:
+        return get_completion_cache().model_hash(self.model_path)
+
+    def close(self) -> None:
+        _model_pool.evict(self.model_path)
+
+
+# The model handle of a worker process, loaded by _init_model_worker
+_worker_llm: Optional[PooledLLM] = None
+
+
+def _init_model_worker(model_path: str, settings: Dict[str, Any]) -> None:
+    """Load the model in a worker process; its weights are memory-mapped, not copied."""
+    global _worker_llm
+    _worker_llm = _model_pool.get(model_path, **settings)
+
+
+def _model_worker_ready() -> int:
+    """Return once the worker has loaded its model."""
+    return os.getpid()
+
+
+def _run_in_model_worker(prompts: List[str], kwargs: Dict[str, Any]) -> Tuple[List[str], Dict[str, float], float]:
+    """Complete prompts in a worker process.
+
+    Returns the completions, the LLM metrics the worker recorded for them
+    (to be recorded again in the parent, where the current node is known)
+    and the wall time taken.
+    """
+    start = time.perf_counter()
+    with metrics.collect_run_metrics() as run:
+        if len(prompts) == 1:
+            completions = [_worker_llm.invoke(prompts[0], **kwargs)]
+        else:
+            completions = _worker_llm.generate_batch(prompts, **kwargs)
+    return completions, run.snapshot().get("other", {}), time.perf_counter() - start
+
+
+class ModelWorkerPool:
+    """A set of worker processes that each run llama.cpp on the same GGUF file.
+
+    Every worker memory-maps the model file, so the weights sit once in the
+    page cache and are shared by all workers instead of being copied into
+    each one; with mlock the pages are also pinned in RAM. The threads are
+    split between the workers. Work goes to the worker with the fewest
+    prompts outstanding, and batches are split across workers so their
+    prompts are decoded in parallel.
+    """
+
+    def __init__(self, model_path: str, workers: int, threads: Optional[int] = None, mlock: bool = False,
+                 **settings: Any):
+        self.model_path = model_path
+        self.workers = max(1, workers)
+        threads = threads or os.cpu_count() or 1
+        self.settings = {
+            "n_threads": max(1, threads // self.workers),
+            "use_mmap": True,
+            "use_mlock": mlock,
+            **settings,
+        }
+        self._lock = threading.Lock()
+        self._executors: List[Any] = []
+        self._pending: List[int] = []
+        self._stats: List[Dict[str, float]] = []
+
+    def start(self) -> None:
+        """Start the workers and wait until every one has loaded the model."""
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Spawned rather than forked: the parent has threads that a fork would copy mid-flight
+        context = multiprocessing.get_context("spawn")
+        start = time.perf_counter()
+        executors = [
+            ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_init_model_worker,
+                                initargs=(self.model_path, self.settings))
+            for _ in range(self.workers)
+        ]
+        try:
+            pids = [future.result() for future in [executor.submit(_model_worker_ready) for executor in executors]]
+        except Exception:
+            for executor in executors:
+                executor.shutdown(cancel_futures=True)
+            raise
+        metrics.registry.record_model_load(time.perf_counter() - start)
+
+        with self._lock:
+            self._executors = executors
+            self._pending = [0] * len(executors)
+            self._stats = [{"worker": index, "pid": pid, "calls": 0, "prompts": 0, "completion_tokens": 0,
+                            "seconds": 0.0} for index, pid in enumerate(pids)]
+
+    def _submit(self, prompts: List[str], kwargs: Dict[str, Any]) -> Tuple[int, Any]:
+        with self._lock:
+            worker = min(range(len(self._executors)), key=lambda index: self._pending[index])
+            self._pending[worker] += len(prompts)
+            return worker, self._executors[worker].submit(_run_in_model_worker, prompts, kwargs)
+
+    def _collect(self, worker: int, prompts: List[str], future: Any) -> List[str]:
+        try:
+            completions, llm_metrics, seconds = future.result()
+        finally:
+            with self._lock:
+                self._pending[worker] -= len(prompts)
+        metrics.record(**llm_metrics)
+        with self._lock:
+            stats = self._stats[worker]
+            stats["calls"] += 1
+            stats["prompts"] += len(prompts)
+            stats["completion_tokens"] += llm_metrics.get("completion_tokens", 0)
+            stats["seconds"] += seconds
+        return completions
+
+    def invoke(self, prompt: str, **kwargs: Any) -> str:
+        worker, future = self._submit([prompt], kwargs)
+        return self._collect(worker, [prompt], future)[0]
+
+    def generate_batch(self, prompts: List[str], **kwargs: Any) -> List[str]:
+        """Split the prompts into one contiguous share per worker and decode the shares in parallel."""
+        shares = min(len(self._executors), len(prompts))
+        bounds = [len(prompts) * index // shares for index in range(shares + 1)]
+        chunks = [prompts[bounds[index]:bounds[index + 1]] for index in range(shares)]
+        submitted = [self._submit(chunk, kwargs) for chunk in chunks]
+
+        completions: List[str] = []
+        for chunk, (worker, future) in zip(chunks, submitted):
+            completions.extend(self._collect(worker, chunk, future))
+        return completions
+
+    def worker_stats(self) -> List[Dict[str, float]]:
+        """Per-worker totals: pid, calls, prompts, completion tokens, busy seconds and tokens per second."""
+        with self._lock:
+            return [
+                dict(stats, tokens_per_second=stats["completion_tokens"] / stats["seconds"] if stats["seconds"] else 0.0)
+                for stats in self._stats
+            ]
+
+    def close(self) -> None:
+        with self._lock:
+            executors, self._executors = self._executors, []
+        for executor in executors:
+            executor.shutdown(cancel_futures=True)
+
+
+class WorkerPoolLLM:
+    """A per-caller handle to a ModelWorkerPool, carrying its own default temperature."""
+
+    def __init__(self, pool: ModelWorkerPool, temperature: float):
+        self.pool = pool
+        self.temperature = temperature
+
+    def invoke(self, prompt: Any, **kwargs: Any) -> str:
+        kwargs.setdefault("temperature", self.temperature)
+        return self.pool.invoke(str(prompt), **kwargs)
+
+    def generate_batch(self, prompts: List[str], **kwargs: Any) -> List[str]:
+        kwargs.setdefault("temperature", self.temperature)
+        return self.pool.generate_batch(prompts, **kwargs)
+
+
+class LlamaCppWorkersBackend(LlamaCppBackend):
+    """Runs TinyLlama in several llama.cpp worker processes sharing one memory-mapped model file."""
+
+    name = "llama-cpp-workers"
+
+    def __init__(self, repo_id: str = TINYLLAMA_REPO_ID, filename: str = TINYLLAMA_FILENAME,
+                 workers: int = DEFAULT_MODEL_WORKERS, threads: Optional[int] = None, mlock: bool = False):
+        super().__init__(repo_id, filename)
+        self.workers = int(workers)
+        self.threads = int(threads) if threads else None
+        self.mlock = mlock
+        self._lock = threading.Lock()
+        self._pools: Dict[Tuple, ModelWorkerPool] = {}
+
+    def get_handle(self, temperature: float = 0.7, **settings: Any) -> Optional[WorkerPoolLLM]:
+        with self._lock:
+            model_path = self.locate_model()
+            if model_path is None:
+                return None
+            # Threads and memory locking are set by the pool; take the rest of the tuned profile
+            profile = load_profile(model_path)
+            settings = {**{key: value for key, value in profile.items() if key in ("n_batch", "n_ctx")}, **settings}
+            key = tuple(sorted(settings.items()))
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = ModelWorkerPool(model_path, self.workers, self.threads, self.mlock, **settings)
+                try:
+                    print(f"\nUsing TinyLlama model for generation in {pool.workers} worker processes")
+                    pool.start()
+                except Exception as e:
+                    print(f"Error starting model workers: {e}")
+                    print("Using rule-based fallback for generation...")
+                    return None
+                self._pools[key] = pool
+        return WorkerPoolLLM(pool, temperature)
+
+    def worker_stats(self) -> List[Dict[str, float]]:
+        """Per-worker throughput of every pool this backend has started."""
+        with self._lock:
+            pools = list(self._pools.values())
+        return [stats for pool in pools for stats in pool.worker_stats()]
+
+    def close(self) -> None:
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close()
+
+
+class StubLLM:
+    """Deterministic stand-in for a real model.
+
+    Completions depend only on the prompt and follow the JSON formats the
+    nodes' grammars describe: a topic array for planner prompts, a caption
+    object per platform for multi-platform prompts, a caption object
+    otherwise. Optional latencies simulate inference cost per prompt token
+    and per generated token (tokens approximated as four characters);
+    batched calls are charged by their longest completion, like one forward
+    pass per step.
+    """
+
+    def __init__(self, temperature: float = 0.7, token_latency: float = 0.0, prompt_latency: float = 0.0):
+        self.temperature = temperature
+        self.token_latency = token_latency
+        self.prompt_latency = prompt_latency
+
+    @staticmethod
+    def count_tokens(text: str) -> int:
+        return max(1, len(text) // 4)
+
+    @staticmethod
+    def complete(prompt: str) -> str:
+        """Build the completion for a prompt without any delay."""
+        count = re.search(r"Generate (\d+) unique", prompt)
+        theme = re.search(r"theme: '([^']*)'", prompt)
+        theme = theme.group(1) if theme else "content"
+        if count:
+            days = re.search(r"These are days (\d+)-", prompt)
+            first = int(days.group(1)) if days else 1
+            return json.dumps([f"{theme} idea number {i}" for i in range(first, first + int(count.group(1)))])
+
+        topic = re.search(r"for the topic: '([^']*)'", prompt)
+        topic = topic.group(1) if topic else theme
+        tag = "".join(word.capitalize() for word in re.findall(r"\w+", topic))[:30] or "Content"
+        content = {"caption": f"Let's talk about {topic} today.",
+                   "hashtags": [f"#{tag}", "#Daily", "#Tips", "#Growth", "#Motivation"]}
+        # Multi-platform prompts list one platform per line: "- x (X): ..."
+        platforms = re.findall(r"^\s*- (\w+) \(", prompt, re.MULTILINE)
+        if platforms:
+            return json.dumps({platform: {"caption": f"{content['caption']} ({platform})",
+                                          "hashtags": content["hashtags"][:2]} for platform in platforms})
+        return json.dumps(content)
+
+    def invoke(self, prompt: Any, **kwargs: Any) -> str:
+        return self.generate_batch([prompt], **kwargs)[0]
+
+    def generate_batch(self, prompts: List[str], **kwargs: Any) -> List[str]:
+        completions = [self.complete(str(prompt)) for prompt in prompts]
+        if completions:
+            prompt_tokens = sum(self.count_tokens(str(prompt)) for prompt in prompts)
+            completion_tokens = [self.count_tokens(completion) for completion in completions]
+            prompt_eval_seconds = self.prompt_latency * prompt_tokens
+            decode_seconds = self.token_latency * max(completion_tokens)
+            time.sleep(prompt_eval_seconds + decode_seconds)
+            metrics.record_llm_call(prompt_tokens, sum(completion_tokens), prompt_eval_seconds + decode_seconds,
+                                    prompt_eval_seconds=prompt_eval_seconds, decode_seconds=decode_seconds)
+        return completions
+
+
+class StubBackend(LLMBackend):
+    """Deterministic offline backend for tests, benchmarks and demos."""
+
+    name = "stub"
+
+    def __init__(self, token_latency: float = 0.0, prompt_latency: float = 0.0):
+        self.token_latency = token_latency
+        self.prompt_latency = prompt_latency
+
+    def get_handle(self, temperature: float = 0.7, **settings: Any) -> StubLLM:
+        return StubLLM(temperature, self.token_latency, self.prompt_latency)
+
+    def cache_id(self) -> str:
+        return "stub"
+
+
+class OpenAICompatibleLLM:
+    """Handle onto an OpenAI-compatible completions server."""
+
+    def __init__(self, backend: "OpenAICompatibleBackend", temperature: float):
+        self.backend = backend
+        self.temperature = temperature
+
+    def invoke(self, prompt: Any, **kwargs: Any) -> str:
+        kwargs.setdefault("temperature", self.temperature)
+        return self.backend.complete([str(prompt)], **kwargs)[0]
+
+    def generate_batch(self, prompts: List[str], **kwargs: Any) -> List[str]:
+        kwargs.setdefault("temperature", self.temperature)
+        return self.backend.complete([str(prompt) for prompt in prompts], **kwargs)
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """Sends completions to a locally hosted OpenAI-compatible server.
+
+    Works with servers exposing POST {base_url}/completions, such as
+    llama-cpp-python's or llama.cpp's own server. Requests go through one
+    shared session whose connection pool keeps connections alive between
+    calls and threads.
+    """
+
+    name = "openai"
+
+    def __init__(self, base_url: str = DEFAULT_OPENAI_BASE_URL, model: str = TINYLLAMA_FILENAME,
+                 api_key: Optional[str] = None, timeout: float = 300.0, pool_size: int = 16):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def complete(self, prompts: List[str], **kwargs: Any) -> List[str]:
+        """Complete prompts in one request, returning the texts in prompt order."""
+        payload = {"model": self.model, "prompt": prompts if len(prompts) > 1 else prompts[0],
+                   "max_tokens": DEFAULT_MAX_TOKENS, "top_p": 1}
+        payload.update({key: value for key, value in kwargs.items() if value is not None})
+        start = time.perf_counter()
+        response = self.session.post(f"{self.base_url}/completions", json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        body = response.json()
+
+        # The server reports token usage but not how time splits between prompt and decode
+        usage = body.get("usage") or {}
+        metrics.record_llm_call(usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0),
+                                time.perf_counter() - start)
+
+        choices = sorted(body["choices"], key=lambda choice: choice.get("index", 0))
+        if len(choices) != len(prompts):
+            raise RuntimeError(f"Expected {len(prompts)} completions from {self.base_url}, got {len(choices)}")
+        return [choice["text"] for choice in choices]
+
+    def get_handle(self, temperature: float = 0.7, **settings: Any) -> OpenAICompatibleLLM:
+        return OpenAICompatibleLLM(self, temperature)
+
+    def cache_id(self) -> str:
+        return f"openai:{self.base_url}:{self.model}"
+
+    def close(self) -> None:
+        self.session.close()
+
+
+BACKENDS = {
+    LlamaCppBackend.name: LlamaCppBackend,
+    LlamaCppWorkersBackend.name: LlamaCppWorkersBackend,
+    StubBackend.name: StubBackend,
+    OpenAICompatibleBackend.name: OpenAICompatibleBackend,
+}
+
+_backend: Optional[LLMBackend] = None
+_backend_lock = threading.Lock()
+
+
+def backend_options_from_env() -> Dict[str, Any]:
+    """Read backend selection from LLM_BACKEND, LLM_BASE_URL, LLM_MODEL, LLM_API_KEY, LLM_WORKERS,
+    LLM_THREADS and LLM_MLOCK."""
+    options: Dict[str, Any] = {"name": os.environ.get("LLM_BACKEND", LlamaCppBackend.name)}
+    if options["name"] == OpenAICompatibleBackend.name:
+        for key, env_var in (("base_url", "LLM_BASE_URL"), ("model", "LLM_MODEL"), ("api_key", "LLM_API_KEY")):
+            if os.environ.get(env_var):
+                options[key] = os.environ[env_var]
+    elif options["name"] == LlamaCppWorkersBackend.name:
+        for key, env_var in (("workers", "LLM_WORKERS"), ("threads", "LLM_THREADS")):
+            if os.environ.get(env_var):
+                options[key] = int(os.environ[env_var])
+        options["mlock"] = os.environ.get("LLM_MLOCK", "0") == "1"
+    return options
+
+
+def configure_backend(name: str = LlamaCppBackend.name, **options: Any) -> LLMBackend:
+    """Select the backend used by get_llm for the rest of the process.
+
+    Args:
+        name: One of "llama-cpp", "llama-cpp-workers", "stub" or "openai"
+        **options: Keyword arguments for the backend's constructor
+    """
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    backend = BACKENDS[name](**options)
+    with _backend_lock:
+        previous, _backend = _backend, backend
+    if previous is not None and previous is not backend:
+        previous.close()
+    return backend
+
+
+def get_backend() -> LLMBackend:
+    """Get the configured backend, taking the selection from the environment on first use."""
+    with _backend_lock:
+        backend = _backend
+    return backend if backend is not None else configure_backend(**backend_options_from_env())
+
+
+def get_llm(temperature: float = 0.7, session_id: Optional[str] = None, priority: Optional[int] = None,
+            cache: bool = True, **settings: Any) -> Optional[Any]:
+    """Get an LLM handle from the configured backend.
+
+    Calls through the handle wait their turn in the process-wide inference
+    scheduler. Unless the completion cache is disabled, the handle is also
+    wrapped in a CachedLLM so repeated prompts skip inference (and the queue);
+    the model is then only loaded once a prompt misses the cache.
+
+    Args:
+        temperature: The default temperature for calls made through the handle (0.0-1.0)
+        session_id: Who the calls are made for; the scheduler shares the model fairly between sessions
+        priority: Scheduler priority of the calls (nodes.scheduler.PRIORITY_*, default normal)
+        cache: Use the completion cache if it is enabled; False always runs the model
+        **settings: Extra runtime settings for the backend. For llama.cpp these
+            are LlamaCpp settings (n_ctx, n_threads, ...) and default to the
+            host's tuned profile (see autotune.py); each distinct combination
+            is loaded once and kept for the process.
+    """
+    backend = get_backend()
+
+    def load() -> Optional[ScheduledLLM]:
+        llm = backend.get_handle(temperature=temperature, **settings)
+        if llm is None:
+            return None
+        return ScheduledLLM(llm, get_scheduler(), session_id, PRIORITY_NORMAL if priority is None else priority)
+
+    if cache and is_cache_enabled():
+        if not backend.available():
+            return None
+        return CachedLLM(load, get_completion_cache(), backend.cache_id(), temperature, settings.get("seed", -1))
+    return load()
+
+
+def iter_completions(llm, prompts: List[str], batch_size: int = DEFAULT_BATCH_SIZE, task: str = "generation",
+                     parse: Optional[Callable[[str], Any]] = None, **params: Any) -> Iterator[Any]:
+    """Yield a completion for each prompt in order, or None for prompts that failed.
+
+    With batch_size > 1 the prompts are decoded batch_size at a time as
+    parallel sequences; a batch that cannot be decoded is retried one prompt
+    at a time. Completions are yielded as soon as their batch finishes.
+
+    Args:
+        llm: A handle from get_llm
+        prompts: The prompts to complete
+        batch_size: Number of prompts per generate_batch call (1 disables batching)
+        task: What the completions are for, used in error messages
+        parse: Turns a completion into its result, which is yielded instead;
+            a falsy result means the completion did not parse. Only
+            completions that parse are stored in the completion cache.
+        **params: Completion parameters (temperature, max_tokens, stop, grammar, ...)
+    """
+    if parse is not None:
+        commit = getattr(llm, "commit", None)
+        for prompt, response in zip(prompts, iter_completions(llm, prompts, batch_size, task, **params)):
+            parsed = parse(response) if response else None
+            if commit is not None and response:
+                commit(prompt, bool(parsed), **params)
+            yield parsed
+        return
+
+    batch_size = max(batch_size, 1)
+    for start in range(0, len(prompts), batch_size):
+        chunk = prompts[start:start + batch_size]
+        
+        if batch_size > 1:
+            try:
+                yield from llm.generate_batch(chunk, **params)
+                continue
+            except Exception as e:
+                print(f"Error in batched {task} for items {start + 1}-{start + len(chunk)}: {e}")
+                print("Retrying these items one at a time...")
+        
+        for offset, prompt in enumerate(chunk):
+            try:
+                response = llm.invoke(prompt, **params)
+            except Exception as e:
+                print(f"Error using LLM for {task} of item {start + offset + 1}: {e}")
+                print("Falling back to rule-based generation...")
+                response = None
+            yield response
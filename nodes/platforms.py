@@ -0,0 +1,172 @@
+"""Per-platform post variants.
+
+A multi-platform plan asks the model for every platform's caption and
+hashtags in one structured completion per topic, instead of one run of the
+whole plan per platform. Each platform has its own caption length and
+hashtag count, enforced by the grammar, and the finished post (caption plus
+hashtags) is kept within the platform's character limit.
+"""
+import json
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Caption and hashtag limits per platform. caption_chars bounds what the model
+# writes; post_chars is the platform's limit for the whole post
+PLATFORMS = {
+    "instagram": {
+        "name": "Instagram",
+        "style": "warm and visual, ending with a call to action",
+        "caption_chars": 300,
+        "hashtags": (3, 5),
+        "post_chars": 2200,
+        "separator": "\n\n",
+    },
+    "x": {
+        "name": "X",
+        "style": "one punchy sentence",
+        "caption_chars": 200,
+        "hashtags": (1, 2),
+        "post_chars": 280,
+        "separator": " ",
+    },
+    "linkedin": {
+        "name": "LinkedIn",
+        "style": "professional and insightful, ending with a question for the reader",
+        "caption_chars": 400,
+        "hashtags": (2, 3),
+        "post_chars": 3000,
+        "separator": "\n\n",
+    },
+}
+
+# Rule-based post templates per platform, wrapped around the rule-based
+# caption. Low randomness uses the first template, medium the first two, high all
+PLATFORM_TEMPLATES = {
+    "instagram": [
+        "{caption} 💡 Save this post for later!",
+        "{caption} 👇 Tell us in the comments how you approach {topic_lower}.",
+        "✨ {topic} ✨ {caption} 📌 Share this with someone who needs it today.",
+    ],
+    "x": [
+        "{caption}",
+        "{topic}: small {theme_word} changes add up. Where do you start?",
+        "Today in {theme_word}: {topic}. Agree or disagree?",
+    ],
+    "linkedin": [
+        "{caption}\n\nWhat has your experience been with {topic_lower}? I'd love to hear your thoughts.",
+        "{topic}\n\n{caption} Here is what it has taught me, and what it could do for your team.",
+        "{caption}\n\nIf this resonates, repost it to help someone in your network.",
+    ],
+}
+
+# Templates per randomness level
+TEMPLATE_COUNTS = {"low": 1, "medium": 2, "high": 3}
+
+PLATFORM_TAG_RULE = 'tag ::= "\\"#" [A-Za-z0-9_]{1,30} "\\""'
+
+
+def validate_platforms(platforms: Optional[Sequence[str]]) -> Optional[List[str]]:
+    """Normalise a platform selection to known names in PLATFORMS order; None or empty means a single-caption plan.
+
+    Raises:
+        ValueError: An unknown platform was named
+    """
+    if not platforms:
+        return None
+    names = {platform.lower() for platform in platforms}
+    unknown = names.difference(PLATFORMS)
+    if unknown:
+        raise ValueError(f"Unknown platform '{sorted(unknown)[0]}'. Choose from: {', '.join(PLATFORMS)}")
+    return [platform for platform in PLATFORMS if platform in names]
+
+
+def build_platform_grammar(platforms: Sequence[str]) -> str:
+    """Build a GBNF grammar for one JSON object with a caption and hashtags per platform."""
+    fields = ' "," ws '.join(f'"\\"{platform}\\":" ws {platform}' for platform in platforms)
+    rules = [f'root ::= "{{" ws {fields} ws "}}"']
+    for platform in platforms:
+        spec = PLATFORMS[platform]
+        low, high = spec["hashtags"]
+        rules.append(
+            f'{platform} ::= "{{" ws "\\"caption\\":" ws "\\"" [^"\\\\\\x00-\\x1f]{{1,{spec["caption_chars"]}}} "\\"" '
+            f'"," ws "\\"hashtags\\":" ws "[" tag ("," ws tag){{{low - 1},{high - 1}}} "]" ws "}}"'
+        )
+    rules.append(PLATFORM_TAG_RULE)
+    rules.append('ws ::= " "?')
+    return "\n".join(rules) + "\n"
+
+
+def platform_max_tokens(platforms: Sequence[str]) -> int:
+    """Token budget for a multi-platform completion: about 3 characters a token plus room for the hashtags."""
+    return 8 + sum(PLATFORMS[platform]["caption_chars"] // 3 + PLATFORMS[platform]["hashtags"][1] * 8 + 16
+                   for platform in platforms)
+
+
+@lru_cache(maxsize=None)
+def get_platform_prompt(platforms: Tuple[str, ...]):
+    """Build the multi-platform prompt template for a platform selection.
+
+    As with the single-caption prompt, the topic comes last so the prompts
+    of a plan share their prefix.
+    """
+    from langchain_core.prompts import ChatPromptTemplate
+
+    guide = "\n".join(
+        f"    - {platform} ({PLATFORMS[platform]['name']}): {PLATFORMS[platform]['style']}; caption of at most "
+        f"{PLATFORMS[platform]['caption_chars']} characters, {PLATFORMS[platform]['hashtags'][0]}-"
+        f"{PLATFORMS[platform]['hashtags'][1]} hashtags"
+        for platform in platforms
+    )
+    example = json.dumps({platform: {"caption": "Your caption here", "hashtags": ["#hashtag1", "#hashtag2"]}
+                          for platform in platforms})
+    template = f"""You are a social media content creator for a brand with the theme: '{{brand_theme}}'.
+
+    Write a post for each of these platforms:
+{guide}
+
+    Respond with a single JSON object exactly like this:
+    {example.replace("{", "{{").replace("}", "}}")}
+
+    Be engaging and on-brand, and match each platform's style.
+
+    Create social media content for the topic: '{{topic}}'.
+    """
+    return ChatPromptTemplate.from_template(template)
+
+
+def compose_post(platform: str, caption: str, hashtags: str) -> str:
+    """Join a caption and its hashtags into the finished post, shortening the caption to fit the platform."""
+    spec = PLATFORMS[platform]
+    room = spec["post_chars"] - len(spec["separator"]) - len(hashtags)
+    if len(caption) > room:
+        caption = caption[:room - 1].rsplit(" ", 1)[0].rstrip(" ,.;:") + "…"
+    return f"{caption}{spec['separator']}{hashtags}" if hashtags else caption
+
+
+def pick_hashtags(hashtags: Sequence[str], count: int, theme_hashtag: str) -> List[str]:
+    """Choose a platform's hashtags from a larger set, keeping the brand's own hashtag first."""
+    others = [tag for tag in hashtags if tag != theme_hashtag]
+    return ([theme_hashtag] + others)[:count]
+
+
+def parse_platform_response(response: str, platforms: Sequence[str]) -> Optional[Dict[str, str]]:
+    """Parse a multi-platform completion into a finished post per platform, or None if any platform is missing."""
+    try:
+        data = json.loads(response)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    posts = {}
+    for platform in platforms:
+        entry = data.get(platform)
+        if not isinstance(entry, dict) or not isinstance(entry.get("hashtags"), list):
+            return None
+        caption = str(entry.get("caption") or "").strip()
+        hashtags = [str(tag).strip() for tag in entry["hashtags"] if str(tag).strip()]
+        hashtags = [tag if tag.startswith("#") else f"#{tag}" for tag in hashtags]
+        if not caption or not hashtags:
+            return None
+        posts[platform] = compose_post(platform, caption, " ".join(hashtags[:PLATFORMS[platform]["hashtags"][1]]))
+    return posts
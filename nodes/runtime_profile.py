@@ -0,0 +1,82 @@
+import json
+import os
+import platform
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+# Profile file name inside the models directory, unless $LLM_PROFILE names another path
+PROFILE_FILENAME = "runtime_profile.json"
+
+# Settings a profile may set for a llama.cpp model
+PROFILE_SETTINGS = ("n_threads", "n_batch", "n_ctx", "use_mmap", "use_mlock")
+
+_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+_cache_lock = threading.Lock()
+
+
+def default_profile_path() -> str:
+    """Where the runtime profile lives: $LLM_PROFILE, or next to the models."""
+    if os.environ.get("LLM_PROFILE"):
+        return os.environ["LLM_PROFILE"]
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_dir, "models", PROFILE_FILENAME)
+
+
+def host_info() -> Dict[str, Any]:
+    """Describe the machine a profile was tuned on."""
+    return {"cpu_count": os.cpu_count(), "machine": platform.machine(), "hostname": platform.node()}
+
+
+def _read(path: str) -> Dict[str, Any]:
+    """Read a profile file, re-reading it only when it changes."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    try:
+        with open(path, encoding="utf-8") as f:
+            profile = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable runtime profile {path}: {e}")
+        profile = {}
+    with _cache_lock:
+        _cache[path] = (mtime, profile)
+    return profile
+
+
+def load_profile(model_path: str, path: Optional[str] = None) -> Dict[str, Any]:
+    """Get the tuned llama.cpp settings for a model on this host.
+
+    Returns an empty dict when there is no profile, it has no entry for the
+    model, or it was tuned on a machine with a different CPU count (e.g. a
+    copied models directory), so library defaults apply.
+    """
+    profile = _read(path or default_profile_path())
+    entry = profile.get("models", {}).get(os.path.basename(model_path))
+    if not entry:
+        return {}
+    host = profile.get("host", {})
+    if host.get("cpu_count") != os.cpu_count() or host.get("machine") != platform.machine():
+        return {}
+    return {key: value for key, value in entry.get("settings", {}).items() if key in PROFILE_SETTINGS}
+
+
+def save_profile(model_path: str, settings: Dict[str, Any], results: Any = None, path: Optional[str] = None) -> str:
+    """Store the tuned settings for a model on this host, keeping entries for other models."""
+    path = path or default_profile_path()
+    profile = _read(path)
+    if profile.get("host", {}).get("cpu_count") != os.cpu_count():
+        profile = {}
+    models = dict(profile.get("models", {}))
+    models[os.path.basename(model_path)] = {"settings": settings, "results": results}
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({"host": host_info(), "models": models}, f, indent=2)
+    os.replace(temp_path, path)
+    return path
@@ -1,19 +1,30 @@
 from typing import Dict
-import os
+import asyncio
+
+from nodes.sinks import MemorySink, make_sink
 
 def save_node(state: Dict) -> Dict:
-    """Save the formatted content to a CSV file."""
-    # Extract the DataFrame and output path from state
-    df = state["formatted_content"]
-    output_path = state["output_path"]
-    
-    # Ensure the directory exists
-    os.makedirs(os.path.dirname(output_path) if os.path.dirname(output_path) else ".", exist_ok=True)
+    """Write the formatted content through the output sink.
+
+    The format follows state["output_format"] or the output path's extension
+    (csv, parquet or jsonl). Files are written atomically; without an
+    output path the encoded plan is kept in state["output_bytes"] instead.
+    """
+    # Extract the content table and output path from state
+    table = state["formatted_content"]
+    sink = make_sink(state.get("output_path"), state.get("output_format"))
     
-    # Save to CSV
-    df.to_csv(output_path, index=False)
+    # Write the plan exactly once
+    location = sink.write(table)
     
-    # Update the state with the saved path
-    state["output_path"] = os.path.abspath(output_path)
+    # Update the state with the saved path or the encoded plan
+    if isinstance(sink, MemorySink):
+        state["output_bytes"] = sink.data
+    else:
+        state["output_path"] = location
     
-    return state
\ No newline at end of file
+    return state
+
+async def asave_node(state: Dict) -> Dict:
+    """Async save_node; the file write runs in a worker thread."""
+    return await asyncio.to_thread(save_node, state)
@@ -0,0 +1,162 @@
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# Lower values are served first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# Generations allowed to run at once; llama.cpp on CPU gains nothing from more than one
+DEFAULT_MAX_IN_FLIGHT = 1
+
+
+class _Ticket:
+    """A generation waiting for a slot."""
+
+    def __init__(self, session_id: str, priority: int, tag: float, seq: int):
+        self.session_id = session_id
+        self.priority = priority
+        self.tag = tag
+        self.seq = seq
+
+    @property
+    def key(self):
+        return (self.priority, self.tag, self.seq)
+
+
+class InferenceScheduler:
+    """Admission control in front of the LLM backend.
+
+    At most max_in_flight generations run at once; the rest wait in a queue
+    ordered by priority, then by a per-session virtual time, then FIFO. Each
+    LLM call of a session advances that session's virtual time, so a long
+    plan making many calls takes turns with a short plan instead of holding
+    the model until it is done. Rule-based plans never call the model and
+    so never wait here.
+    """
+
+    def __init__(self, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        self.max_in_flight = max(1, max_in_flight)
+        self._cond = threading.Condition()
+        self._waiting: List[_Ticket] = []
+        self._running: Dict[str, int] = {}
+        self._session_tags: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._seq = itertools.count()
+        self._average_seconds: Optional[float] = None
+
+    def _enqueue(self, session_id: Optional[str], priority: int) -> _Ticket:
+        seq = next(self._seq)
+        session_id = session_id or f"anonymous-{seq}"
+        tag = max(self._virtual_time, self._session_tags.get(session_id, 0.0)) + 1
+        self._session_tags[session_id] = tag
+        ticket = _Ticket(session_id, priority, tag, seq)
+        self._waiting.append(ticket)
+        return ticket
+
+    def _dispatch(self, ticket: _Ticket) -> None:
+        self._waiting.remove(ticket)
+        self._running[ticket.session_id] = self._running.get(ticket.session_id, 0) + 1
+        self._virtual_time = max(self._virtual_time, ticket.tag)
+        # Sessions whose tag has fallen behind virtual time would restart from it anyway
+        self._session_tags = {
+            session: tag for session, tag in self._session_tags.items()
+            if tag > self._virtual_time or session in self._running
+        }
+
+    @contextmanager
+    def slot(self, session_id: Optional[str] = None, priority: int = PRIORITY_NORMAL) -> Iterator[None]:
+        """Block until the caller may run one generation, and hold the slot for the block."""
+        with self._cond:
+            ticket = self._enqueue(session_id, priority)
+            while (sum(self._running.values()) >= self.max_in_flight
+                   or min(self._waiting, key=lambda waiting: waiting.key) is not ticket):
+                self._cond.wait()
+            self._dispatch(ticket)
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._cond:
+                running = self._running[ticket.session_id] - 1
+                if running:
+                    self._running[ticket.session_id] = running
+                else:
+                    del self._running[ticket.session_id]
+                self._average_seconds = seconds if self._average_seconds is None else (
+                    0.8 * self._average_seconds + 0.2 * seconds
+                )
+                self._cond.notify_all()
+
+    def status(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Describe where a session stands in the queue.
+
+        Returns:
+            None if the session has nothing queued or running, otherwise a dict
+            with "running" (bool), "position" (1-based place of its next
+            generation in the queue, 0 if none is waiting) and "wait_seconds"
+            (estimated time until that generation starts).
+        """
+        with self._cond:
+            ordered = sorted(self._waiting, key=lambda waiting: waiting.key)
+            running = session_id in self._running
+            position = next((i + 1 for i, ticket in enumerate(ordered) if ticket.session_id == session_id), 0)
+            if not running and not position:
+                return None
+
+            wait_seconds = 0.0
+            busy = sum(self._running.values()) >= self.max_in_flight
+            if position and self._average_seconds is not None and (busy or position > 1):
+                wait_seconds = (position - 1 + busy) / self.max_in_flight * self._average_seconds
+            return {"running": running, "position": position, "wait_seconds": wait_seconds}
+
+    def __len__(self) -> int:
+        """Number of generations waiting for a slot."""
+        with self._cond:
+            return len(self._waiting)
+
+
+class ScheduledLLM:
+    """Wraps an LLM handle so every call goes through the scheduler first."""
+
+    def __init__(self, llm, scheduler: InferenceScheduler, session_id: Optional[str] = None,
+                 priority: int = PRIORITY_NORMAL):
+        self.llm = llm
+        self.scheduler = scheduler
+        self.session_id = session_id
+        self.priority = priority
+
+    @property
+    def temperature(self) -> float:
+        return self.llm.temperature
+
+    @property
+    def seed(self) -> int:
+        return getattr(self.llm, "seed", -1)
+
+    def invoke(self, prompt: Any, **kwargs: Any) -> str:
+        with self.scheduler.slot(self.session_id, self.priority):
+            return self.llm.invoke(prompt, **kwargs)
+
+    def generate_batch(self, prompts: List[str], **kwargs: Any) -> List[str]:
+        with self.scheduler.slot(self.session_id, self.priority):
+            return self.llm.generate_batch(prompts, **kwargs)
+
+
+_scheduler: Optional[InferenceScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> InferenceScheduler:
+    """Get the process-wide scheduler; LLM_MAX_CONCURRENCY sets its number of slots."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = InferenceScheduler(int(os.environ.get("LLM_MAX_CONCURRENCY", DEFAULT_MAX_IN_FLIGHT)))
+        return _scheduler
@@ -0,0 +1,150 @@
+import atexit
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Optional
+
+from nodes.formatter import ContentTable
+
+# Output formats by file extension
+FORMATS = {".csv": "csv", ".parquet": "parquet", ".jsonl": "jsonl"}
+EXTENSIONS = {fmt: ext for ext, fmt in FORMATS.items()}
+
+# Reserved plan paths not written to for this long are deleted when new ones are reserved
+OUTPUT_MAX_AGE_SECONDS = 24 * 60 * 60
+
+_output_root: Optional[str] = None
+_output_root_lock = threading.Lock()
+
+
+def format_for_path(path: str, default: str = "csv") -> str:
+    """Pick the output format from a path's extension."""
+    return FORMATS.get(os.path.splitext(path)[1].lower(), default)
+
+
+def serialize(table: ContentTable, fmt: str) -> bytes:
+    """Encode a content plan in one of the supported formats.
+
+    CSV and JSONL are written straight from the table's columns; only
+    Parquet goes through pandas.
+    """
+    if fmt == "csv":
+        return table.to_csv().encode("utf-8")
+    if fmt == "jsonl":
+        return table.to_jsonl().encode("utf-8")
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("Writing Parquet requires pyarrow. Install it with: pip install pyarrow")
+        buffer = io.BytesIO()
+        table.to_dataframe().to_parquet(buffer, index=False)
+        return buffer.getvalue()
+    raise ValueError(f"Unknown output format '{fmt}'. Choose from: {', '.join(EXTENSIONS)}")
+
+
+class OutputSink:
+    """Destination for a finished content plan."""
+
+    def __init__(self, fmt: str = "csv"):
+        if fmt not in EXTENSIONS:
+            raise ValueError(f"Unknown output format '{fmt}'. Choose from: {', '.join(EXTENSIONS)}")
+        self.fmt = fmt
+
+    def write(self, table: ContentTable) -> Optional[str]:
+        """Write the plan once; return where it went (a path), or None for in-memory sinks."""
+        raise NotImplementedError
+
+
+class FileSink(OutputSink):
+    """Writes a plan to a file atomically.
+
+    The data goes to a temporary file in the destination directory, which is
+    then renamed over the destination, so readers never see a partial file.
+    """
+
+    def __init__(self, path: str, fmt: Optional[str] = None):
+        super().__init__(fmt or format_for_path(path))
+        self.path = os.path.abspath(path)
+
+    def write(self, table: ContentTable) -> str:
+        data = serialize(table, self.fmt)
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(self.path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp creates owner-only files; keep the permissions a plain write would give
+            mode = os.stat(self.path).st_mode & 0o777 if os.path.exists(self.path) else 0o644
+            os.chmod(temp_path, mode)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return self.path
+
+
+class MemorySink(OutputSink):
+    """Keeps the encoded plan in memory, e.g. for serving it over HTTP without touching disk."""
+
+    def __init__(self, fmt: str = "csv"):
+        super().__init__(fmt)
+        self.data: Optional[bytes] = None
+
+    def write(self, table: ContentTable) -> None:
+        self.data = serialize(table, self.fmt)
+        return None
+
+
+def get_output_root() -> str:
+    """Get this process's directory for reserved plan paths, created on first use and removed at exit."""
+    global _output_root
+    with _output_root_lock:
+        if _output_root is None:
+            _output_root = tempfile.mkdtemp(prefix="content-plans-")
+            atexit.register(shutil.rmtree, _output_root, ignore_errors=True)
+        return _output_root
+
+
+def remove_stale_outputs(directory: str, max_age: float = OUTPUT_MAX_AGE_SECONDS) -> int:
+    """Delete the reserved plan directories under directory that have not been written to for max_age seconds."""
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in os.scandir(directory):
+        try:
+            stale = entry.name.startswith("plan-") and entry.is_dir() and entry.stat().st_mtime < cutoff
+        except OSError:
+            continue
+        if stale:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def unique_output_path(filename: str, directory: Optional[str] = None) -> str:
+    """Reserve a path for filename that no other plan will use.
+
+    The file keeps its readable name inside a freshly created directory, so
+    concurrent plans with the same name do not overwrite each other. Without
+    a directory, paths are reserved under get_output_root(), where plans
+    older than OUTPUT_MAX_AGE_SECONDS are cleared out as new ones arrive.
+    """
+    if directory is None:
+        directory = get_output_root()
+        remove_stale_outputs(directory)
+    return os.path.join(tempfile.mkdtemp(prefix="plan-", dir=directory), filename)
+
+
+def make_sink(output_path: Optional[str], fmt: Optional[str] = None) -> OutputSink:
+    """Choose the sink for a plan: a file sink for a path, an in-memory sink without one."""
+    if output_path:
+        return FileSink(output_path, fmt)
+    return MemorySink(fmt or "csv")
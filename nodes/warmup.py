@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from nodes.model_utils import get_backend
+from nodes.scheduler import PRIORITY_LOW, ScheduledLLM, get_scheduler
+
+# Readiness states of the model warm-up
+WARMUP_IDLE = "idle"
+WARMUP_LOADING = "loading"
+WARMUP_WARM = "warm"
+WARMUP_FAILED = "failed"
+
+# Short completion that pulls the weights into memory and runs one decode
+PRIMING_PROMPT = "Suggest one social media post topic about coffee:"
+PRIMING_MAX_TOKENS = 8
+
+
+class ModelWarmup:
+    """Loads the model in the background when a server starts.
+
+    The first model-based request would otherwise pay for the model load
+    (and possibly the download). The warm-up gets a handle from the
+    configured backend, which loads the model into the shared pool, then
+    runs a short priming completion at low scheduler priority so real
+    requests that arrive meanwhile go first.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._state = WARMUP_IDLE
+        self._error: Optional[str] = None
+        self._started_at: Optional[float] = None
+        self._seconds: Optional[float] = None
+
+    def start(self) -> None:
+        """Start warming up in a daemon thread; later calls do nothing."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._state = WARMUP_LOADING
+            self._started_at = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            backend = get_backend()
+            handle = backend.get_handle(temperature=0.0)
+            if handle is None:
+                raise RuntimeError(f"the {backend.name} backend could not provide a model")
+            llm = ScheduledLLM(handle, get_scheduler(), "warmup", PRIORITY_LOW)
+            llm.invoke(PRIMING_PROMPT, max_tokens=PRIMING_MAX_TOKENS)
+        except Exception as e:
+            print(f"Model warm-up failed: {e}")
+            self._finish(WARMUP_FAILED, str(e))
+        else:
+            self._finish(WARMUP_WARM)
+
+    def _finish(self, state: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._state = state
+            self._error = error
+            self._seconds = time.perf_counter() - self._started_at
+
+    def wait(self, timeout: Optional[float] = None) -> str:
+        """Block until the warm-up has finished (or timeout passes) and return the state."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.status()["state"]
+
+    def status(self) -> Dict[str, Any]:
+        """Describe readiness.
+
+        Returns:
+            A dict with "state" (idle, loading, warm or failed), "error" (the
+            failure message, or None) and "seconds" (time spent loading so
+            far, or in total once finished; None if never started).
+        """
+        with self._lock:
+            seconds = self._seconds
+            if seconds is None and self._started_at is not None:
+                seconds = time.perf_counter() - self._started_at
+            return {"state": self._state, "error": self._error, "seconds": seconds}
+
+
+_warmup = ModelWarmup()
+
+
+def get_warmup() -> ModelWarmup:
+    """Get the process-wide model warm-up."""
+    return _warmup
+
+
+def start_warmup() -> ModelWarmup:
+    """Start the process-wide model warm-up, unless MODEL_WARMUP=0 turns it off."""
+    if os.environ.get("MODEL_WARMUP", "1") != "0":
+        _warmup.start()
+    return _warmup
@@ -4,14 +4,31 @@ Launcher script for the Social Media Content Creator Chat UI.
 This script checks dependencies and starts the Gradio interface.
 """
 
+import re
 import sys
 import subprocess
+import importlib.metadata
 import importlib.util
 
-def check_package(package_name):
-    """Check if a package is installed."""
-    spec = importlib.util.find_spec(package_name)
-    return spec is not None
+def version_tuple(version):
+    """Turn a version string like "1.2.15" into (1, 2, 15) for comparison."""
+    return tuple(int(part) for part in re.findall(r"\d+", version.split("+")[0])[:3])
+
+def check_package(package_name, requirement=None):
+    """Check if a package is installed, at least at the version a "name>=version" requirement asks for."""
+    try:
+        if importlib.util.find_spec(package_name) is None:
+            return False
+    except ModuleNotFoundError:
+        return False
+    if requirement and ">=" in requirement:
+        distribution, minimum = requirement.split(">=")
+        try:
+            installed = importlib.metadata.version(distribution)
+        except importlib.metadata.PackageNotFoundError:
+            return False
+        return version_tuple(installed) >= version_tuple(minimum)
+    return True
 
 def install_package(package_name):
     """Install a package using pip."""
@@ -28,13 +45,14 @@ def main():
     # Check for required packages
     required_packages = {
         "gradio": "gradio>=4.0.0",
-        "langgraph": "langgraph>=0.0.15",
+        "langgraph": "langgraph>=1.2.0",
+        "langgraph.checkpoint.sqlite": "langgraph-checkpoint-sqlite>=2.0.0",
         "pandas": "pandas>=2.0.0"
     }
     
     missing_packages = []
     for package, requirement in required_packages.items():
-        if not check_package(package):
+        if not check_package(package, requirement):
             missing_packages.append(requirement)
     
     if missing_packages:
@@ -65,7 +83,10 @@ def main():
     
     try:
         # Import and run the chat UI
-        from chat_ui import demo
+        from chat_ui import create_demo
+        from nodes.warmup import start_warmup
+        demo = create_demo()
+        start_warmup()
         demo.launch(
             server_name="0.0.0.0",
             server_port=7860,
@@ -0,0 +1,73 @@
+"""Async node variants: same plans as the sync graph, with model calls kept off the event loop."""
+import asyncio
+import threading
+import time
+
+import main
+from nodes import content_generator, llm_cache, metrics
+from nodes.content_generator import acontent_generator_node
+from nodes.metrics import collect_run_metrics, measure_node
+from nodes.model_utils import configure_backend
+from test_content_branches import plan_state
+
+
+def test_async_graph_matches_the_sync_graph(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "_cache_enabled", False)
+    configure_backend("stub")
+
+    for fan_out in (None, 4):
+        sync = main.build_graph().invoke(plan_state(12, fan_out, output_path=str(tmp_path / "sync.csv")))
+        graph = main.build_graph(asynchronous=True)
+        done = asyncio.run(graph.ainvoke(plan_state(12, fan_out, output_path=str(tmp_path / "async.csv"))))
+
+        assert done["content"] == sync["content"]
+        assert (tmp_path / "async.csv").read_text() == (tmp_path / "sync.csv").read_text()
+
+
+def test_model_calls_run_on_the_executor(monkeypatch):
+    threads = []
+
+    def slow_node(state):
+        threads.append(threading.current_thread().name)
+        metrics.record_llm_call(prompt_tokens=10, completion_tokens=4, seconds=0.2)
+        time.sleep(0.2)
+        return state
+
+    monkeypatch.setattr(content_generator, "content_generator_node", slow_node)
+    monkeypatch.setattr(metrics, "registry", metrics.MetricsRegistry())
+
+    async def generate():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        with measure_node("content_generator"):
+            await acontent_generator_node({"use_model": True})
+        task.cancel()
+        return ticks
+
+    with collect_run_metrics() as run:
+        ticks = asyncio.run(generate())
+
+    # The loop kept running while the node slept on an executor thread
+    assert ticks > 5
+    assert threads[0].startswith("llm")
+    # The executor thread saw the caller's node and run metrics
+    assert run.snapshot()["content_generator"]["llm_calls"] == 1
+
+
+def test_rule_based_content_runs_inline(monkeypatch):
+    threads = []
+
+    def node(state):
+        threads.append(threading.current_thread())
+        return state
+
+    monkeypatch.setattr(content_generator, "content_generator_node", node)
+    asyncio.run(acontent_generator_node({"use_model": False}))
+    assert threads == [threading.main_thread()]
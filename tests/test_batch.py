@@ -0,0 +1,57 @@
+"""Reading --batch request files and setting up batch worker processes."""
+import json
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import main
+from nodes import llm_cache
+
+MAIN_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def batch_args(tmp_path, **overrides):
+    args = dict(output_dir=str(tmp_path / "out"), rule_based=True, use_model=False, format=None,
+                randomness="medium", duration=None, platforms=None, theme=None, batch_size=8, seed=None)
+    args.update(overrides)
+    return SimpleNamespace(**args)
+
+
+def load(tmp_path, requests, **overrides):
+    path = tmp_path / "requests.jsonl"
+    path.write_text("".join(json.dumps(request) + "\n" for request in requests), encoding="utf-8")
+    return main.load_batch_requests(str(path), batch_args(tmp_path, **overrides))
+
+
+def test_duration_zero_is_rejected_not_defaulted(tmp_path):
+    states, rejected = load(tmp_path, [{"id": "zero", "duration": 0}, {"id": "text", "duration": "a week"}])
+    assert states == []
+    assert [entry["id"] for entry in rejected] == ["zero", "text"]
+    assert "at least 1 day" in rejected[0]["error"]
+    assert "whole number" in rejected[1]["error"]
+
+
+def test_missing_duration_falls_back_to_the_command_line(tmp_path):
+    states, rejected = load(tmp_path, [{"id": "a"}, {"id": "b", "duration": 3}], duration=10)
+    assert rejected == []
+    assert [state["duration"] for state in states] == [10, 3]
+
+    states, _ = load(tmp_path, [{"id": "a"}])
+    assert states[0]["duration"] == 30
+
+
+def test_cli_rejects_duration_below_one(tmp_path):
+    result = subprocess.run([sys.executable, MAIN_PATH, "--rule-based", "--duration", "0"],
+                            cwd=tmp_path, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 2
+    assert "--duration must be at least 1 day" in result.stderr
+
+
+def test_worker_drops_the_inherited_cache_connection(monkeypatch):
+    inherited = object()
+    monkeypatch.setattr(llm_cache, "_cache", inherited)
+    monkeypatch.setattr(main, "_worker_graph", None)
+    main._init_batch_worker(True, {"name": "stub"})
+    assert llm_cache._cache is None
+    assert main._worker_graph is not None
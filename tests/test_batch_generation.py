@@ -0,0 +1,236 @@
+"""Batched multi-sequence decoding against a fake llama.cpp.
+
+The fake model answers "topic N:" with " answer N" followed by N exclamation
+marks and EOS, so every sequence finishes at a different step. It keeps the
+tokens of every sequence of every context, so the tests can check which
+prompt each sequence id decoded and that positions follow on.
+"""
+import ctypes
+import json
+import re
+import sys
+import threading
+import types
+from types import SimpleNamespace
+
+import pytest
+
+from nodes import batch_generation
+from nodes.model_utils import PooledLLM, iter_completions
+
+BOS, EOS, N_VOCAB = 256, 257, 258
+PREFIX = "You write captions for a fitness brand. Answer briefly. "
+
+
+class FakeContext:
+    def __init__(self, n_batch):
+        self.n_batch = n_batch
+        self.sequences = {}
+        self.logits = []
+        self.decodes = []
+
+
+class FakeBatch:
+    def __init__(self, n_tokens):
+        self.token = [0] * n_tokens
+        self.pos = [0] * n_tokens
+        self.n_seq_id = [0] * n_tokens
+        self.seq_id = [[0] for _ in range(n_tokens)]
+        self.logits = [False] * n_tokens
+        self.n_tokens = 0
+
+
+def next_token(tokens):
+    """The fake model: reply to the prompt's 'topic N:' one character at a time."""
+    text = bytes(token for token in tokens if token < 256).decode()
+    prompt, _, reply = text.partition(":")
+    number = int(re.search(r"topic (\d+)$", prompt).group(1))
+    answer = f" answer {number}" + "!" * number
+    return ord(answer[len(reply)]) if len(reply) < len(answer) else EOS
+
+
+def llama_decode(ctx, batch):
+    assert batch.n_tokens <= ctx.n_batch
+    entries = []
+    ctx.logits = []
+    for i in range(batch.n_tokens):
+        assert batch.n_seq_id[i] == 1
+        seq = batch.seq_id[i][0]
+        tokens = ctx.sequences.setdefault(seq, [])
+        assert batch.pos[i] == len(tokens), "positions must follow on within a sequence"
+        tokens.append(batch.token[i])
+        entries.append(seq)
+        row = (ctypes.c_float * N_VOCAB)()
+        if batch.logits[i]:
+            row[next_token(tokens)] = 10.0
+        ctx.logits.append(row)
+    ctx.decodes.append(entries)
+    return 0
+
+
+def make_fake_llama_cpp(contexts):
+    def init_from_model(model, params):
+        ctx = FakeContext(params.n_batch)
+        contexts.append(ctx)
+        return ctx
+
+    def memory_seq_cp(memory, source, dest, start, end):
+        memory.sequences[dest] = list(memory.sequences[source])
+
+    def memory_clear(memory, data):
+        memory.sequences.clear()
+
+    return types.SimpleNamespace(
+        llama_context_default_params=lambda: SimpleNamespace(),
+        llama_init_from_model=init_from_model,
+        llama_free=lambda ctx: None,
+        llama_batch_init=lambda n_tokens, embd, n_seq_max: FakeBatch(n_tokens),
+        llama_batch_free=lambda batch: None,
+        llama_decode=llama_decode,
+        llama_get_logits_ith=lambda ctx, i: ctx.logits[i],
+        llama_get_memory=lambda ctx: ctx,
+        llama_memory_seq_cp=memory_seq_cp,
+        llama_memory_clear=memory_clear,
+        llama_state_seq_get_size=lambda ctx, seq: 0,
+        llama_state_seq_get_data=lambda ctx, buffer, size, seq: 0,
+        llama_max_parallel_sequences=lambda: 64,
+    )
+
+
+class FakeLlama:
+    model = object()
+    n_batch = 8
+
+    def tokenize(self, text, add_bos=True):
+        return ([BOS] if add_bos else []) + list(text)
+
+    def detokenize(self, tokens):
+        return bytes(token for token in tokens if token < 256)
+
+    def n_vocab(self):
+        return N_VOCAB
+
+    def token_eos(self):
+        return EOS
+
+    def n_ctx(self):
+        return 512
+
+
+@pytest.fixture
+def contexts(monkeypatch):
+    contexts = []
+    monkeypatch.setitem(sys.modules, "llama_cpp", make_fake_llama_cpp(contexts))
+    batch_generation.clear_prefix_cache()
+    yield contexts
+    batch_generation.clear_prefix_cache()
+
+
+def expected(number):
+    return f" answer {number}" + "!" * number
+
+
+def test_each_prompt_decodes_in_its_own_sequence(contexts):
+    llama = FakeLlama()
+    prompts = [f"{PREFIX}topic {number}:" for number in (3, 1, 4, 0, 2)]
+    texts = batch_generation.generate_batch(llama, prompts, max_tokens=32, temperature=0, n_batch=16)
+
+    assert texts == [expected(number) for number in (3, 1, 4, 0, 2)]
+    (ctx,) = contexts
+    # Sequence i holds prompt i and its answer, after the shared prefix copied from sequence 0
+    for seq, prompt in enumerate(prompts):
+        assert llama.detokenize(ctx.sequences[seq]).decode().startswith(prompt)
+    # Prompt tokens after the prefix were packed across sequences in batches of at most n_batch
+    assert all(len(entries) <= 16 for entries in ctx.decodes)
+    assert any(len(set(entries)) > 1 for entries in ctx.decodes)
+
+
+def test_scratch_context_is_reused_for_the_same_shape(contexts):
+    llama = FakeLlama()
+    prompts = [f"{PREFIX}topic {number}:" for number in range(3)]
+    first = batch_generation.generate_batch(llama, prompts, max_tokens=32, temperature=0, n_batch=16)
+    second = batch_generation.generate_batch(llama, prompts, max_tokens=32, temperature=0, n_batch=16)
+    assert first == second == [expected(number) for number in range(3)]
+    assert len(contexts) == 1
+
+    batch_generation.generate_batch(llama, prompts[:2], max_tokens=32, temperature=0, n_batch=16)
+    assert len(contexts) == 2
+
+
+def test_split_batches_keep_prompt_order(contexts):
+    llm = PooledLLM(SimpleNamespace(client=FakeLlama()), threading.Lock(), temperature=0, n_batch=16)
+    numbers = [5, 0, 7, 2, 6, 1, 3]
+    prompts = [f"{PREFIX}topic {number}:" for number in numbers]
+
+    completions = list(iter_completions(llm, prompts, batch_size=3, max_tokens=32))
+    assert completions == [expected(number) for number in numbers]
+    # Batches of 3, 3 and 1 prompts; every decode call stays within n_batch
+    assert [len(ctx.sequences) for ctx in contexts] == [3, 1]
+    assert all(len(entries) <= 16 for ctx in contexts for entries in ctx.decodes)
+
+
+def test_shared_prefix_length():
+    assert batch_generation.shared_prefix_length([[1, 2, 3, 4], [1, 2, 5], [1, 2, 3]]) == 2
+    assert batch_generation.shared_prefix_length([[7, 8], [9]]) == 0
+    # Identical prompts still leave each sequence its last token to decode
+    assert batch_generation.shared_prefix_length([[1, 2, 3], [1, 2, 3]]) == 2
+
+
+def decoded_per_sequence(ctx):
+    counts = {}
+    for entries in ctx.decodes:
+        for seq in entries:
+            counts[seq] = counts.get(seq, 0) + 1
+    return counts
+
+
+@pytest.fixture
+def saved_states(contexts, monkeypatch):
+    """Let the fake llama.cpp save and restore a sequence's KV state (its tokens, as JSON)."""
+    fake = sys.modules["llama_cpp"]
+
+    def get_data(ctx, buffer, size, seq):
+        state = json.dumps(ctx.sequences[seq]).encode()
+        ctypes.memmove(buffer, state, len(state))
+        return len(state)
+
+    def set_data(ctx, buffer, size, seq):
+        ctx.sequences[seq] = json.loads(bytes(buffer[:size]))
+        return size
+
+    monkeypatch.setattr(fake, "llama_state_seq_get_size", lambda ctx, seq: len(json.dumps(ctx.sequences[seq])))
+    monkeypatch.setattr(fake, "llama_state_seq_get_data", get_data)
+    monkeypatch.setattr(fake, "llama_state_seq_set_data", set_data, raising=False)
+    return contexts
+
+
+def test_shared_prefix_is_evaluated_once_per_batch(contexts):
+    llama = FakeLlama()
+    prompts = [f"{PREFIX}topic {number}:" for number in range(4)]
+    batch_generation.generate_batch(llama, prompts, max_tokens=32, temperature=0, n_batch=16)
+
+    prefix_len = batch_generation.shared_prefix_length([llama.tokenize(prompt.encode()) for prompt in prompts])
+    assert prefix_len > batch_generation.MIN_SHARED_PREFIX
+    (ctx,) = contexts
+    decoded = decoded_per_sequence(ctx)
+    # Every sequence but 0 got the prefix by copy rather than by decoding it
+    for seq in range(1, 4):
+        assert len(ctx.sequences[seq]) - decoded[seq] == prefix_len
+    assert len(ctx.sequences[0]) == decoded[0]
+
+
+def test_saved_prefix_state_is_restored_by_later_batches(saved_states):
+    llama = FakeLlama()
+    prompts = [f"{PREFIX}topic {number}:" for number in range(3)]
+    prefix_len = batch_generation.shared_prefix_length([llama.tokenize(prompt.encode()) for prompt in prompts])
+
+    first = batch_generation.generate_batch(llama, prompts, max_tokens=32, temperature=0, n_batch=16)
+    # Two prompts need a new context, which restores the prefix instead of decoding it again
+    second = batch_generation.generate_batch(llama, prompts[:2], max_tokens=32, temperature=0, n_batch=16)
+    assert second == first[:2]
+    assert decoded_per_sequence(saved_states[0])[0] - decoded_per_sequence(saved_states[1])[0] == prefix_len
+
+    # After the cache is cleared (as when the pool unloads the model) the prefix is decoded again
+    batch_generation.clear_prefix_cache()
+    batch_generation.generate_batch(llama, prompts + [f"{PREFIX}topic 3:"], max_tokens=32, temperature=0, n_batch=16)
+    assert len(saved_states[2].sequences[0]) == decoded_per_sequence(saved_states[2])[0]
@@ -0,0 +1,56 @@
+"""The chat UI's plan rendering, including runs resumed from the command line."""
+import asyncio
+import re
+
+import pytest
+
+pytest.importorskip("gradio")
+
+import chat_ui
+from nodes import llm_cache
+from nodes.model_utils import configure_backend
+from test_checkpoints import run_main
+
+
+def test_day_preview_of_both_kinds_of_plan():
+    row = {"day": 2, "topic": "Meal prep", "caption": "Cook once.", "hashtags": "#mealprep"}
+    assert chat_ui.row_columns(row) == ["day", "topic", "caption", "hashtags"]
+    assert "*Cook once.*" in chat_ui.format_day_preview(row)
+
+    row = {"day": 2, "topic": "Meal prep", "instagram": "Cook once!", "x": "Cook once."}
+    assert chat_ui.row_columns(row) == ["day", "topic", "instagram", "x"]
+    preview = chat_ui.format_day_preview(row)
+    assert "**instagram:** Cook once!" in preview and "**x:** Cook once." in preview
+
+
+def test_resuming_a_platforms_run_in_the_chat(tmp_path, monkeypatch):
+    output = tmp_path / "plan.csv"
+    killed = run_main(tmp_path, 9, "--use-model", "--theme", "Healthy Cooking", "--duration", "12",
+                      "--checkpoint-every", "8", "--platforms", "instagram", "x", "--output", str(output))
+    assert killed.returncode == 9, killed.stderr
+    run_id = re.search(r"--resume (\S+)\)", killed.stdout).group(1)
+
+    monkeypatch.setenv("GRAPH_CHECKPOINT_DB", str(tmp_path / "checkpoints.sqlite3"))
+    monkeypatch.setattr(llm_cache, "_cache_enabled", False)
+    configure_backend("stub")
+
+    async def resume():
+        updates = []
+        async for history, _, file_path, rows, _ in chat_ui.chat_interface(
+                f"resume {run_id}", [], "", 30, "Rule-based", "Medium", "session"):
+            updates.append((history, file_path, chat_ui.live_table_update(rows)))
+        return updates
+
+    updates = asyncio.run(resume())
+    history, file_path, table = updates[-1]
+    assert file_path == str(output)
+    assert "Error" not in history[-1]["content"]
+    assert "**instagram:**" in history[-1]["content"]
+    assert table.headers == ["day", "topic", "instagram", "x"]
+    assert [row[0] for row in table.value["data"]] == list(range(1, 13))
+
+
+def test_interface_is_built_on_demand():
+    # Spawned model workers import the main script again; that must not build the UI
+    assert not hasattr(chat_ui, "demo")
+    assert isinstance(chat_ui.create_demo(), chat_ui.gr.Blocks)
@@ -0,0 +1,69 @@
+"""A checkpointed run killed outright resumes from its last checkpoint."""
+import csv
+import os
+import re
+import subprocess
+import sys
+
+MAIN_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+# Runs main.py with generate_content wrapped: every chunk's first day is logged, and the
+# process dies without any cleanup (as under the OOM killer) when it reaches KILL_AT_DAY
+RUN_MAIN = """
+import os, runpy, sys
+sys.path.insert(0, os.path.dirname(sys.argv[2]))
+import nodes.content_generator as content_generator
+kill_at_day, log_path = int(sys.argv[1]), sys.argv[3]
+generate_content = content_generator.generate_content
+def logged(state, topics, first_day=1, **kwargs):
+    if first_day == kill_at_day:
+        os._exit(9)
+    with open(log_path, "a") as log:
+        log.write(f"{first_day}\\n")
+    return generate_content(state, topics, first_day, **kwargs)
+content_generator.generate_content = logged
+sys.argv = sys.argv[2:3] + sys.argv[4:]
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+
+def run_main(tmp_path, kill_at_day, *args):
+    env = dict(os.environ, GRAPH_CHECKPOINT_DB=str(tmp_path / "checkpoints.sqlite3"))
+    command = [sys.executable, "-c", RUN_MAIN, str(kill_at_day), MAIN_PATH, str(tmp_path / "days.log"),
+               "--backend", "stub", "--no-cache", *args]
+    return subprocess.run(command, cwd=tmp_path, env=env, capture_output=True, text=True, timeout=300)
+
+
+def logged_days(tmp_path):
+    with open(tmp_path / "days.log") as log:
+        return [int(line) for line in log]
+
+
+def test_killed_run_resumes_without_regenerating_days(tmp_path):
+    output = tmp_path / "plan.csv"
+    killed = run_main(tmp_path, 25, "--use-model", "--theme", "Healthy Cooking", "--duration", "40",
+                      "--checkpoint-every", "8", "--output", str(output))
+    assert killed.returncode == 9, killed.stderr
+    assert logged_days(tmp_path) == [1, 9, 17]
+    run_id = re.search(r"--resume (\S+)\)", killed.stdout).group(1)
+
+    os.remove(tmp_path / "days.log")
+    resumed = run_main(tmp_path, 0, "--resume", run_id)
+    assert resumed.returncode == 0, resumed.stderr
+    # Days 1-24 were checkpointed before the kill and are not generated again
+    assert logged_days(tmp_path) == [25, 33]
+
+    with open(output, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [int(row["day"]) for row in rows] == list(range(1, 41))
+
+
+def test_finished_run_leaves_no_checkpoint(tmp_path):
+    finished = run_main(tmp_path, 0, "--use-model", "--theme", "Healthy Cooking", "--duration", "10",
+                        "--output", str(tmp_path / "plan.csv"))
+    assert finished.returncode == 0, finished.stderr
+    run_id = re.search(r"--resume (\S+)\)", finished.stdout).group(1)
+
+    resumed = run_main(tmp_path, 0, "--resume", run_id)
+    assert resumed.returncode != 0
+    assert "No unfinished run" in resumed.stderr
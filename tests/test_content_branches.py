@@ -0,0 +1,127 @@
+"""Fan-out content branches: merging, per-topic retries and the streamed .partial file."""
+import csv
+import os
+import re
+from collections import Counter
+
+import main
+from nodes import content_generator, llm_cache
+from nodes.content_generator import BRANCH_ATTEMPTS, content_branch_node
+from nodes.model_utils import StubLLM, configure_backend
+from test_checkpoints import run_main
+
+
+def plan_state(duration, fan_out=None, **overrides):
+    state = {"brand_theme": "Healthy Cooking", "duration": duration, "output_path": None, "output_format": None,
+             "use_model": True, "randomness": "medium", "batch_size": 4, "seed": None, "checkpoint_every": None,
+             "fan_out": fan_out, "platforms": None, "topics": None, "content": None, "formatted_content": None}
+    state.update(overrides)
+    return state
+
+
+def test_fan_out_matches_sequential_generation(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "_cache_enabled", False)
+    configure_backend("stub")
+    graph = main.build_graph()
+
+    sequential = graph.invoke(plan_state(20, output_path=str(tmp_path / "sequential.csv")))
+    fanned_out = graph.invoke(plan_state(20, fan_out=6, output_path=str(tmp_path / "fanned_out.csv")))
+
+    assert [row["day"] for row in fanned_out["content"]] == list(range(1, 21))
+    assert fanned_out["content"] == sequential["content"]
+    assert (tmp_path / "fanned_out.csv").read_text() == (tmp_path / "sequential.csv").read_text()
+
+
+class FlakyLLM:
+    """Stub completions, except that the topics in failures come back unparseable that many times."""
+
+    def __init__(self, failures, calls):
+        self.failures = failures
+        self.calls = calls
+
+    def complete(self, prompt):
+        topic = re.search(r"for the topic: '([^']*)'", prompt).group(1)
+        self.calls[topic] += 1
+        if self.calls[topic] <= self.failures.get(topic, 0):
+            return "not json"
+        return StubLLM.complete(prompt)
+
+    def invoke(self, prompt, **kwargs):
+        return self.complete(prompt)
+
+    def generate_batch(self, prompts, **kwargs):
+        return [self.complete(prompt) for prompt in prompts]
+
+
+def test_branch_retries_only_the_failed_topics(monkeypatch):
+    calls = Counter()
+    cache_flags = []
+
+    def get_llm(cache=True, **kwargs):
+        cache_flags.append(cache)
+        return FlakyLLM({"b": 1, "d": BRANCH_ATTEMPTS}, calls)
+
+    monkeypatch.setattr(content_generator, "get_llm", get_llm)
+    state = plan_state(10, topics=["a", "b", "c", "d", "e"], first_day=4)
+    rows = content_branch_node(state)["content"]
+
+    assert [(row["day"], row["topic"]) for row in rows] == [(4, "a"), (5, "b"), (6, "c"), (7, "d"), (8, "e")]
+    # Topics that succeeded are not generated again; only the first attempt may use the cache
+    assert calls == {"a": 1, "b": 2, "c": 1, "d": BRANCH_ATTEMPTS, "e": 1}
+    assert cache_flags == [True, False, False]
+    assert rows[1]["caption"] == "Let's talk about b today."
+    # d never parsed, so the last attempt fell back to rule-based content
+    assert rows[3]["caption"] and rows[3]["caption"] != "Let's talk about d today."
+
+
+def test_branch_without_failures_runs_once(monkeypatch):
+    calls = Counter()
+    monkeypatch.setattr(content_generator, "get_llm", lambda **kwargs: FlakyLLM({}, calls))
+    rows = content_branch_node(plan_state(3, topics=["a", "b"], first_day=1))["content"]
+    assert [row["day"] for row in rows] == [1, 2]
+    assert calls == {"a": 1, "b": 1}
+
+
+class OutOfOrderGraph:
+    """Streams rows in the order branches might finish, snapshotting the .partial file after each."""
+
+    def __init__(self, partial_path, days):
+        self.partial_path = partial_path
+        self.days = days
+        self.snapshots = []
+
+    def stream(self, state, config, stream_mode, durability):
+        for day in self.days:
+            yield "custom", {"row": {"day": day, "topic": f"topic {day}", "caption": "c", "hashtags": "#h"},
+                             "total": len(self.days)}
+            with open(self.partial_path, newline="", encoding="utf-8") as f:
+                self.snapshots.append([int(row["day"]) for row in csv.DictReader(f)])
+        yield "values", dict(state, content=[])
+
+
+def test_partial_file_stays_in_day_order(tmp_path):
+    output = str(tmp_path / "plan.csv")
+    graph = OutOfOrderGraph(output + ".partial", [5, 6, 1, 2, 7, 3, 4])
+    main.run_streaming(graph, plan_state(7, output_path=output))
+
+    assert graph.snapshots == [[5], [5, 6], [1, 5, 6], [1, 2, 5, 6], [1, 2, 5, 6, 7], [1, 2, 3, 5, 6, 7],
+                               [1, 2, 3, 4, 5, 6, 7]]
+
+
+def test_stream_replaces_partial_file_with_the_plan(tmp_path):
+    output = tmp_path / "plan.csv"
+    args = ["--use-model", "--stream", "--theme", "Healthy Cooking", "--duration", "24", "--checkpoint-every", "8",
+            "--output", str(output)]
+
+    # Killed mid-run, the partial file holds the days streamed so far and there is no plan yet
+    killed = run_main(tmp_path, 17, *args)
+    assert killed.returncode == 9, killed.stderr
+    with open(str(output) + ".partial", newline="", encoding="utf-8") as f:
+        assert [int(row["day"]) for row in csv.DictReader(f)] == list(range(1, 17))
+    assert not output.exists()
+
+    finished = run_main(tmp_path, 0, *args)
+    assert finished.returncode == 0, finished.stderr
+    assert not os.path.exists(str(output) + ".partial")
+    with open(output, newline="", encoding="utf-8") as f:
+        assert [int(row["day"]) for row in csv.DictReader(f)] == list(range(1, 25))
@@ -0,0 +1,90 @@
+"""Planning topics in windows: near-duplicate merging and carrying a window's shortfall forward."""
+import json
+import re
+
+from nodes import day_planner
+from nodes.day_planner import generate_llm_topics, plan_topics, plan_windows
+from nodes.dedup import NearDuplicateIndex
+
+
+class WindowLLM:
+    """Answers each window's prompt with the topics (or raw completion) scripted for its first day."""
+
+    def __init__(self, windows):
+        self.windows = windows
+        self.prompts = []
+
+    def complete(self, prompt):
+        self.prompts.append(prompt)
+        days = re.search(r"These are days (\d+)-", prompt)
+        reply = self.windows[int(days.group(1)) if days else 1]
+        return reply if isinstance(reply, str) else json.dumps(reply)
+
+    def invoke(self, prompt, **kwargs):
+        return self.complete(prompt)
+
+    def generate_batch(self, prompts, **kwargs):
+        return [self.complete(prompt) for prompt in prompts]
+
+
+def topics(window, count):
+    return [f"Window{window} subject{i} alpha" for i in range(count)]
+
+
+def test_windows_cover_the_plan():
+    assert plan_windows(25) == [(1, 10), (11, 20), (21, 25)]
+    assert plan_windows(10) == [(1, 10)]
+    assert plan_windows(3, chunk_size=2) == [(1, 2), (3, 3)]
+
+
+def test_near_duplicates_ignore_case_plurals_stopwords_and_theme():
+    index = NearDuplicateIndex(ignore=["Healthy Cooking"])
+    assert index.add("Quick breakfast recipes for busy mornings")
+    assert not index.add("quick breakfast recipe for the busy mornings!")
+    assert not index.add("Healthy Cooking: quick breakfast recipes for busy mornings")
+    assert index.add("Batch cooking grains for the week")
+    assert len(index) == 2
+
+
+def test_windows_merge_without_near_duplicates():
+    # Window 2 repeats two of window 1's topics with different wording
+    second = topics(2, 11) + ["The window1 subject0 alpha", "WINDOW1 SUBJECT1 ALPHAS"]
+    llm = WindowLLM({1: topics(1, 13), 11: second[2:], 21: topics(3, 13)})
+    planned = generate_llm_topics(llm, "Alpha", 25, NearDuplicateIndex(ignore=["Alpha"]), batch_size=3)
+
+    assert planned == topics(1, 10) + topics(2, 11)[2:] + topics(3, 6)
+    assert len(llm.prompts) == 3
+
+
+def test_short_window_passes_its_shortfall_on():
+    # Window 1 comes back with only 7 usable topics; window 2 makes up the other 3 from its spares
+    first = topics(1, 7) + ["window1 subject0 alpha"] * 6
+    llm = WindowLLM({1: first, 11: topics(2, 13)})
+    planned = generate_llm_topics(llm, "Alpha", 20, NearDuplicateIndex(), batch_size=2)
+
+    assert planned == topics(1, 7) + topics(2, 13)
+    assert len(planned) == 20
+
+
+def test_unparseable_window_is_made_up_later_or_by_rule_based_topics(monkeypatch):
+    llm = WindowLLM({1: topics(1, 13), 11: topics(2, 13)})
+    llm.windows[11] = '["A topic list cut short by max_tokens'
+    monkeypatch.setattr(day_planner, "get_llm", lambda **kwargs: llm)
+    planned = plan_topics({"brand_theme": "Alpha", "use_model": True}, 20)
+
+    assert planned[:10] == topics(1, 10)
+    assert len(planned) == 20
+    assert len(set(planned)) == 20
+
+
+def test_extension_carries_on_the_calendar():
+    llm = WindowLLM({31: topics(4, 13), 41: topics(5, 13)})
+    index = NearDuplicateIndex()
+    existing = topics(4, 2)
+    for topic in existing:
+        index.add(topic)
+    planned = generate_llm_topics(llm, "Alpha", 15, index, batch_size=2, first_day=31)
+
+    assert "These are days 31-40 of a 45-day calendar" in llm.prompts[0]
+    assert "These are days 41-45 of a 45-day calendar" in llm.prompts[1]
+    assert planned == topics(4, 12)[2:] + topics(5, 5)
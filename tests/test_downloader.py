@@ -0,0 +1,209 @@
+"""nodes.downloader against a local HTTP stand-in for a model mirror."""
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from nodes import downloader
+from nodes.downloader import DownloadError, download_file
+
+PIECE = 1024
+DATA = bytes(range(256)) * 20  # 5 pieces, the last one short
+SHA256 = hashlib.sha256(DATA).hexdigest()
+
+
+class MirrorServer(ThreadingHTTPServer):
+    """Serves DATA with HEAD and ranged GET requests, recording every GET's Range header."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), MirrorHandler)
+        self.data = DATA
+        self.reported_size = len(DATA)
+        self.etag = SHA256
+        self.ranges = True
+        self.delay = 0.0
+        self.gets = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/repo/resolve/main/model.gguf"
+
+
+class MirrorHandler(BaseHTTPRequestHandler):
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(self.server.reported_size))
+        if self.server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        if self.server.etag:
+            self.send_header("X-Linked-Etag", f'"{self.server.etag}"')
+        self.end_headers()
+
+    def do_GET(self):
+        requested = self.headers.get("Range")
+        with self.server.lock:
+            self.server.gets.append(requested)
+        time.sleep(self.server.delay)
+        data = self.server.data
+        if requested and self.server.ranges:
+            start, end = (int(n) for n in requested.split("=")[1].split("-"))
+            body = data[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{start + len(body) - 1}/{len(data)}")
+        else:
+            body = data
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(downloader, "PIECE_SIZE", PIECE)
+    monkeypatch.setattr(downloader, "PIECE_RETRIES", 1)
+    server = MirrorServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_parallel_ranged_pieces(server, tmp_path):
+    dest = str(tmp_path / "model.gguf")
+    assert download_file(server.url, dest, connections=3) == dest
+    assert read(dest) == DATA
+    assert sorted(server.gets) == sorted(f"bytes={start}-{min(start + PIECE, len(DATA)) - 1}"
+                                         for start in range(0, len(DATA), PIECE))
+    assert not os.path.exists(dest + ".part")
+    assert not os.path.exists(dest + ".part.json")
+
+
+def test_resume_fetches_only_missing_pieces(server, tmp_path):
+    dest = str(tmp_path / "model.gguf")
+    # An earlier run wrote pieces 0 and 2 before it was interrupted
+    part = bytearray(len(DATA))
+    for start in (0, 2 * PIECE):
+        part[start:start + PIECE] = DATA[start:start + PIECE]
+    with open(dest + ".part", "wb") as f:
+        f.write(part)
+    with open(dest + ".part.json", "w", encoding="utf-8") as f:
+        json.dump({"url": server.url, "size": len(DATA), "sha256": SHA256, "done": [0, 2 * PIECE]}, f)
+
+    download_file(server.url, dest)
+    assert read(dest) == DATA
+    assert sorted(server.gets) == ["bytes=1024-2047", "bytes=3072-4095", "bytes=4096-5119"]
+
+
+def test_resume_ignores_progress_of_another_file(server, tmp_path):
+    dest = str(tmp_path / "model.gguf")
+    with open(dest + ".part", "wb") as f:
+        f.write(b"\0" * len(DATA))
+    with open(dest + ".part.json", "w", encoding="utf-8") as f:
+        json.dump({"url": server.url, "size": len(DATA), "sha256": "0" * 64, "done": [0]}, f)
+
+    download_file(server.url, dest)
+    assert read(dest) == DATA
+    assert len(server.gets) == 5
+
+
+def test_sha256_mismatch_is_rejected(server, tmp_path):
+    dest = str(tmp_path / "model.gguf")
+    server.etag = "f" * 64
+    with pytest.raises(DownloadError, match="SHA-256"):
+        download_file(server.url, dest)
+    assert not os.path.exists(dest)
+    assert not os.path.exists(dest + ".part")
+    assert not os.path.exists(dest + ".part.json")
+
+
+def test_given_sha256_overrides_the_server(server, tmp_path):
+    dest = str(tmp_path / "model.gguf")
+    with pytest.raises(DownloadError, match="SHA-256"):
+        download_file(server.url, dest, sha256="e" * 64)
+    assert not os.path.exists(dest)
+
+
+def test_size_mismatch_is_rejected(server, tmp_path):
+    dest = str(tmp_path / "model.gguf")
+    server.ranges = False
+    server.etag = None
+    server.reported_size = len(DATA) + 10
+    with pytest.raises(DownloadError, match="expected"):
+        download_file(server.url, dest)
+    assert not os.path.exists(dest)
+
+
+def test_concurrent_callers_download_once(server, tmp_path):
+    dest = str(tmp_path / "model.gguf")
+    server.delay = 0.05
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(download_file(server.url, dest, connections=1))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert results == [dest, dest]
+    assert read(dest) == DATA
+    # One caller fetched every piece; the other waited on the lock and reused the file
+    assert len(server.gets) == 5
+
+
+def test_existing_file_is_reused_only_when_it_matches(server, tmp_path):
+    dest = str(tmp_path / "model.gguf")
+    with open(dest, "wb") as f:
+        f.write(DATA)
+    download_file(server.url, dest)
+    assert server.gets == []
+
+    # A truncated file from an interrupted copy is replaced
+    with open(dest, "wb") as f:
+        f.write(DATA[:100])
+    download_file(server.url, dest)
+    assert read(dest) == DATA
+    assert len(server.gets) == 5
+
+    # Same size, different bytes: caught by the checksum
+    server.gets.clear()
+    with open(dest, "wb") as f:
+        f.write(b"\0" * len(DATA))
+    download_file(server.url, dest)
+    assert read(dest) == DATA
+    assert len(server.gets) == 5
+
+
+def test_download_model_verifies_an_existing_model(server, tmp_path, monkeypatch):
+    from nodes import model_utils
+
+    monkeypatch.setattr(model_utils, "get_models_dir", lambda: str(tmp_path))
+    monkeypatch.delenv("MODEL_SHA256", raising=False)
+    base_url = server.url.split("/repo/")[0]
+    with open(tmp_path / "model.gguf", "wb") as f:
+        f.write(DATA[:-1])
+
+    path = model_utils.download_model("repo", "model.gguf", mirror_url=base_url)
+    assert path == str(tmp_path / "model.gguf")
+    assert read(path) == DATA
@@ -0,0 +1,81 @@
+"""Editing saved plans: selecting, regenerating and extending days."""
+import pytest
+
+from nodes import content_generator, llm_cache
+from nodes.day_planner import generate_rule_based_topics
+from nodes.editing import extend_plan, load_plan, regenerate_days, select_days
+from nodes.formatter import ContentTable
+from nodes.model_utils import configure_backend
+from nodes.sinks import FileSink
+
+THEME = "Healthy Cooking"
+
+
+def saved_plan(days, columns=("caption", "hashtags")):
+    topics = generate_rule_based_topics(THEME, len(days))
+    return ContentTable([
+        {"day": day, "topic": topic, **{column: f"old {column} {day}" for column in columns}}
+        for day, topic in zip(days, topics)
+    ], ["day", "topic", *columns])
+
+
+@pytest.fixture
+def stub_model(monkeypatch):
+    monkeypatch.setattr(llm_cache, "_cache_enabled", False)
+    configure_backend("stub")
+    calls = []
+    get_llm = content_generator.get_llm
+
+    def recording_get_llm(**kwargs):
+        calls.append(kwargs)
+        return get_llm(**kwargs)
+
+    monkeypatch.setattr(content_generator, "get_llm", recording_get_llm)
+    return calls
+
+
+def test_select_days_by_number_and_pattern():
+    table = saved_plan([1, 2, 3, 5, 8])
+    assert select_days(table, [3, 8]) == [2, 4]
+    assert select_days(table, [1], matching=table.topic[3][:12]) == [0, 3]
+    with pytest.raises(ValueError, match="no day 4"):
+        select_days(table, [4])
+    with pytest.raises(ValueError, match="Invalid filter"):
+        select_days(table, matching="(")
+
+
+def test_regenerated_days_keep_their_numbers_and_topics(stub_model):
+    table = saved_plan([1, 2, 3, 5, 8])
+    edited = regenerate_days(table, select_days(table, [3, 8]), {"brand_theme": THEME, "use_model": True})
+
+    assert list(edited.day) == [1, 2, 3, 5, 8]
+    assert edited.topic == table.topic
+    assert [row["caption"].startswith("old") for row in edited] == [True, True, False, True, False]
+    assert edited.row(2)["caption"] == f"Let's talk about {table.topic[2]} today."
+    # The cache would hand back the content being replaced
+    assert [call["cache"] for call in stub_model] == [False]
+
+
+def test_extension_is_numbered_on_from_the_last_day():
+    table = saved_plan([1, 2, 3, 5, 8])
+    extended = extend_plan(table, 4, {"brand_theme": THEME, "use_model": False})
+
+    assert list(extended.day) == [1, 2, 3, 5, 8, 9, 10, 11, 12]
+    assert extended.topic[:5] == table.topic
+    assert not set(extended.topic[5:]) & set(table.topic)
+    assert [row["caption"] for row in extended][:5] == [row["caption"] for row in table]
+
+
+def test_platform_plans_keep_their_columns(tmp_path, stub_model):
+    path = tmp_path / "plan.csv"
+    FileSink(str(path)).write(saved_plan([1, 2, 3], ("instagram", "x")))
+    table = load_plan(str(path))
+    assert table.platforms == ["instagram", "x"]
+
+    extended = extend_plan(table, 2, {"brand_theme": THEME, "use_model": True})
+    assert extended.columns == ["day", "topic", "instagram", "x"]
+    assert list(extended.day) == [1, 2, 3, 4, 5]
+
+    edited = regenerate_days(extended, [0], {"brand_theme": THEME, "use_model": True})
+    assert edited.row(0)["instagram"] != "old instagram 1"
+    assert edited.row(1) == extended.row(1)
@@ -0,0 +1,66 @@
+"""The columnar ContentTable and its CSV/JSONL rendering."""
+import csv
+import io
+import json
+import os
+
+import pytest
+
+from nodes.formatter import COLUMNS, ContentTable, formatter_node, plan_columns
+
+ROWS = [{"day": 1, "topic": "Meal prep", "caption": 'Cook once, eat "all" week.', "hashtags": "#mealprep #batch"},
+        {"day": 2, "topic": "Hydration", "caption": "Drink up — café style.", "hashtags": "#water"},
+        {"day": 3, "topic": "Leftovers", "caption": "Second\nlife.", "hashtags": "#mealprep #batch"}]
+
+
+def test_rows_round_trip():
+    table = ContentTable(ROWS)
+    assert len(table) == 3
+    assert list(table) == ROWS
+    assert table.row(1) == ROWS[1]
+    assert table.day.typecode == "l"
+    assert (table.topic, table.platforms) == ([row["topic"] for row in ROWS], [])
+
+
+def test_repeated_hashtag_lines_are_stored_once():
+    # Build equal but distinct strings, as each generated row would be
+    rows = [dict(row, hashtags="".join(["#meal", "prep"])) for row in ROWS]
+    table = ContentTable(rows)
+    assert table.hashtags[0] is table.hashtags[1] is table.hashtags[2]
+
+
+def test_csv_matches_the_csv_module():
+    expected = io.StringIO()
+    writer = csv.DictWriter(expected, fieldnames=COLUMNS, lineterminator=os.linesep)
+    writer.writeheader()
+    writer.writerows(ROWS)
+    assert ContentTable(ROWS).to_csv() == expected.getvalue()
+
+
+def test_jsonl_has_one_object_per_day():
+    text = ContentTable(ROWS).to_jsonl()
+    assert text.endswith("\n")
+    assert [json.loads(line) for line in text.splitlines()] == ROWS
+    assert "café" in text
+
+
+def test_dataframe_keeps_the_column_order():
+    frame = ContentTable(ROWS).to_dataframe()
+    assert list(frame.columns) == COLUMNS
+    assert frame["day"].tolist() == [1, 2, 3]
+
+
+def test_platform_plans_have_a_column_per_platform():
+    columns = plan_columns(["instagram", "linkedin"])
+    assert columns == ["day", "topic", "instagram", "linkedin"]
+    table = ContentTable([{"day": 1, "topic": "Meal prep", "instagram": "Post", "linkedin": "Article"}], columns)
+    assert table.platforms == ["instagram", "linkedin"]
+    assert table.to_csv().splitlines()[0] == "day,topic,instagram,linkedin"
+    with pytest.raises(KeyError):
+        table.append(ROWS[0])
+
+
+def test_formatter_node_builds_the_table():
+    state = formatter_node({"content": ROWS, "platforms": None})
+    assert isinstance(state["formatted_content"], ContentTable)
+    assert list(state["formatted_content"]) == ROWS
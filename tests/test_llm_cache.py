@@ -0,0 +1,137 @@
+"""The completion cache: hits and misses, lazy model loading, LRU eviction and parse-before-commit."""
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+from nodes import llm_cache
+from nodes.llm_cache import CachedLLM, CompletionCache
+from nodes.model_utils import configure_backend, get_llm, iter_completions
+
+
+class CountingLLM:
+    """Completes every prompt with "<prompt> done", recording the prompts it ran."""
+
+    temperature = 0.7
+
+    def __init__(self, replies=None):
+        self.replies = replies or {}
+        self.prompts = []
+
+    def invoke(self, prompt, **kwargs):
+        return self.generate_batch([prompt], **kwargs)[0]
+
+    def generate_batch(self, prompts, **kwargs):
+        self.prompts.extend(prompts)
+        return [self.replies.get(prompt, f"{prompt} done") for prompt in prompts]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = CompletionCache(str(tmp_path / "cache.sqlite3"))
+    yield cache
+    cache.close()
+
+
+def cached(cache, llm, loads):
+    def load():
+        loads.append(llm)
+        return llm
+    return CachedLLM(load, cache, "model", temperature=0.7)
+
+
+def test_misses_run_the_model_and_hits_do_not(cache):
+    llm, loads = CountingLLM(), []
+    first = cached(cache, llm, loads)
+    assert list(iter_completions(first, ["a", "b"], batch_size=2, parse=str.upper, max_tokens=8)) == ["A DONE", "B DONE"]
+    assert llm.prompts == ["a", "b"]
+
+    second = cached(cache, llm, loads)
+    assert list(iter_completions(second, ["b", "c", "a"], batch_size=3, parse=str.upper, max_tokens=8)) == [
+        "B DONE", "C DONE", "A DONE"]
+    # Only the new prompt reached the model, in a batch of its own
+    assert llm.prompts == ["a", "b", "c"]
+    assert (cache.hits, cache.misses) == (2, 3)
+
+
+def test_full_cache_hit_never_loads_the_model(cache):
+    llm, loads = CountingLLM(), []
+    list(iter_completions(cached(cache, llm, loads), ["a", "b"], batch_size=2, parse=str.upper))
+    assert len(loads) == 1
+
+    loads.clear()
+    assert list(iter_completions(cached(cache, llm, loads), ["a", "b"], batch_size=2, parse=str.upper)) == [
+        "A DONE", "B DONE"]
+    assert loads == []
+
+
+def test_cache_key_covers_parameters(cache):
+    llm, loads = CountingLLM(), []
+    handle = cached(cache, llm, loads)
+    for params in ({}, {"temperature": 0.1}, {"max_tokens": 4}, {"seed": 3}):
+        handle.invoke("a", **params)
+        handle.commit("a", **params)
+    assert llm.prompts == ["a"] * 4
+
+
+def test_unavailable_model_falls_back_per_prompt(cache):
+    handle = CachedLLM(lambda: None, cache, "model", temperature=0.7)
+    assert list(iter_completions(handle, ["a", "b"], batch_size=2, parse=str.upper)) == [None, None]
+    with pytest.raises(RuntimeError):
+        handle.invoke("a")
+
+
+def test_only_completions_that_parse_are_stored(cache):
+    llm, loads = CountingLLM({"bad": "garbled"}), []
+    parse = lambda response: response if response.endswith("done") else None
+    assert list(iter_completions(cached(cache, llm, loads), ["good", "bad"], batch_size=2, parse=parse)) == [
+        "good done", None]
+
+    llm.prompts.clear()
+    list(iter_completions(cached(cache, llm, loads), ["good", "bad"], batch_size=2, parse=parse))
+    # The garbled completion was not replayed from the cache; the model ran again for it
+    assert llm.prompts == ["bad"]
+
+
+def test_cached_completion_that_no_longer_parses_is_dropped(cache):
+    llm, loads = CountingLLM(), []
+    list(iter_completions(cached(cache, llm, loads), ["a"], batch_size=1, parse=str.upper))
+
+    # A stricter parser rejects the cached completion, which is then discarded
+    assert list(iter_completions(cached(cache, llm, loads), ["a"], batch_size=1, parse=lambda response: None)) == [None]
+    llm.prompts.clear()
+    list(iter_completions(cached(cache, llm, loads), ["a"], batch_size=1, parse=str.upper))
+    assert llm.prompts == ["a"]
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    clock = itertools.count(1)
+    monkeypatch.setattr(llm_cache, "time", SimpleNamespace(time=lambda: next(clock)))
+    cache = CompletionCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("1", None, "3")
+
+    # The byte limit evicts as well
+    cache.max_bytes = 2
+    cache.put("d", "44")
+    assert (cache.get("a"), cache.get("c"), cache.get("d")) == (None, None, "44")
+    cache.close()
+
+
+def test_get_llm_defers_loading_to_the_first_miss(tmp_path, monkeypatch):
+    backend = configure_backend("stub")
+    handles = []
+    get_handle = backend.get_handle
+    monkeypatch.setattr(backend, "get_handle", lambda **kwargs: handles.append(kwargs) or get_handle(**kwargs))
+    monkeypatch.setattr(llm_cache, "_cache", CompletionCache(str(tmp_path / "cache.sqlite3")))
+    monkeypatch.setattr(llm_cache, "_cache_enabled", True)
+
+    llm = get_llm(temperature=0.3)
+    assert handles == []
+    llm.invoke("prompt")
+    llm.invoke("another prompt")
+    assert handles == [{"temperature": 0.3}]
+    llm_cache._cache.close()
@@ -0,0 +1,76 @@
+"""Per-node metrics and their Prometheus exposition."""
+import asyncio
+
+from nodes import metrics
+from nodes.metrics import (NODE_FIELDS, MetricsRegistry, collect_run_metrics, instrument_node, record_llm_call,
+                           tokens_per_second)
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    registry.add("day_planner", runs=1, wall_seconds=0.25)
+    registry.add("content_generator", runs=1, llm_calls=2, completion_tokens=100, decode_seconds=2.0)
+    registry.record_model_load(1.5)
+    text = registry.render_prometheus()
+    lines = text.splitlines()
+
+    assert text.endswith("\n")
+    for field in NODE_FIELDS:
+        name, kind, _ = metrics._METRIC_HELP[field]
+        assert f"# TYPE {name} {kind}" in lines
+        assert lines[lines.index(f"# TYPE {name} {kind}") - 1].startswith(f"# HELP {name} ")
+
+    # Nodes are listed in name order under each metric
+    runs = lines.index("# TYPE node_runs_total counter")
+    assert lines[runs + 1:runs + 3] == ['node_runs_total{node="content_generator"} 1',
+                                        'node_runs_total{node="day_planner"} 1']
+    assert 'node_wall_seconds_total{node="day_planner"} 0.25' in lines
+    assert 'llm_calls_total{node="content_generator"} 2' in lines
+    assert 'llm_tokens_per_second{node="content_generator"} 50' in lines
+    assert 'llm_tokens_per_second{node="day_planner"} 0' in lines
+    assert lines[-4:] == ["model_loads_total 1",
+                          "# HELP model_load_seconds_total Time spent loading models",
+                          "# TYPE model_load_seconds_total counter",
+                          "model_load_seconds_total 1.5"]
+
+
+def test_empty_registry_still_declares_every_metric():
+    lines = MetricsRegistry().render_prometheus().splitlines()
+    assert sum(line.startswith("# TYPE ") for line in lines) == len(NODE_FIELDS) + 3
+    assert lines[-1] == "model_load_seconds_total 0"
+    assert "model_loads_total 0" in lines
+
+
+def test_tokens_per_second_falls_back_to_llm_time():
+    stats = dict.fromkeys(NODE_FIELDS, 0)
+    assert tokens_per_second(stats) == 0.0
+    stats.update(completion_tokens=30, llm_seconds=3.0)
+    assert tokens_per_second(stats) == 10.0
+    stats.update(decode_seconds=1.0)
+    assert tokens_per_second(stats) == 30.0
+
+
+def test_llm_calls_are_attributed_to_the_running_node(monkeypatch):
+    monkeypatch.setattr(metrics, "registry", MetricsRegistry())
+
+    @instrument_node("planner")
+    def planner(state):
+        record_llm_call(prompt_tokens=10, completion_tokens=5, seconds=0.5)
+        return state
+
+    @instrument_node("writer")
+    async def writer(state):
+        record_llm_call(prompt_tokens=20, completion_tokens=8, seconds=1.0)
+        return state
+
+    with collect_run_metrics() as run:
+        planner({})
+        asyncio.run(writer({}))
+    record_llm_call(prompt_tokens=1, completion_tokens=1, seconds=0.1)
+
+    nodes = run.snapshot()
+    assert set(nodes) == {"planner", "writer"}
+    assert (nodes["planner"]["runs"], nodes["planner"]["prompt_tokens"]) == (1, 10)
+    assert (nodes["writer"]["llm_calls"], nodes["writer"]["completion_tokens"]) == (1, 8)
+    # Calls outside any node still reach the process-wide registry
+    assert set(metrics.registry.snapshot()) == {"planner", "writer", "other"}
@@ -0,0 +1,82 @@
+"""The process-wide model pool: one loaded instance per model and settings."""
+import threading
+import time
+
+import pytest
+from langchain_community import llms
+
+from nodes.model_utils import ModelPool
+
+
+class FakeLlamaCpp:
+    """Stands in for LlamaCpp, counting loads; a model path containing "broken" fails to load."""
+
+    loads = []
+
+    def __init__(self, model_path, temperature, **settings):
+        if "broken" in model_path:
+            raise ValueError("not a GGUF file")
+        time.sleep(0.05)  # Long enough for concurrent callers to pile up behind the load
+        self.model_path = model_path
+        self.client = None
+        self.loads.append(model_path)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(llms, "LlamaCpp", FakeLlamaCpp)
+    monkeypatch.setattr(FakeLlamaCpp, "loads", [])
+    return ModelPool()
+
+
+def test_callers_share_one_instance(pool):
+    handles = []
+    threads = [threading.Thread(target=lambda: handles.append(pool.get("model.gguf", temperature=0.2, n_ctx=2048)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(FakeLlamaCpp.loads) == 1
+    assert len({id(handle.llm) for handle in handles}) == 1
+    # Generations on the shared model are serialised on one lock
+    assert len({id(handle.lock) for handle in handles}) == 1
+    assert len(pool) == 1
+
+
+def test_handles_keep_their_own_temperature(pool):
+    cold = pool.get("model.gguf", temperature=0.1)
+    warm = pool.get("model.gguf", temperature=0.9)
+    assert cold.llm is warm.llm
+    assert (cold.temperature, warm.temperature) == (0.1, 0.9)
+
+
+def test_settings_and_paths_are_pooled_separately(pool):
+    small = pool.get("model.gguf", n_ctx=2048)
+    large = pool.get("model.gguf", n_ctx=4096)
+    other = pool.get("other.gguf", n_ctx=2048)
+    assert len({id(small.llm), id(large.llm), id(other.llm)}) == 3
+    assert pool.get("./model.gguf", n_ctx=2048).llm is small.llm
+    assert pool.get("model.gguf", n_batch=64).n_batch == 64
+
+
+def test_evict_unloads_by_path(pool):
+    pool.get("model.gguf", n_ctx=2048)
+    pool.get("model.gguf", n_ctx=4096)
+    pool.get("other.gguf")
+
+    assert pool.evict("model.gguf") == 2
+    assert len(pool) == 1
+    pool.get("model.gguf", n_ctx=2048)
+    assert FakeLlamaCpp.loads.count("model.gguf") == 3
+
+    assert pool.evict() == 2
+    assert len(pool) == 0
+
+
+def test_failed_loads_are_not_cached(pool):
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            pool.get("broken.gguf")
+    assert len(pool) == 0
@@ -0,0 +1,105 @@
+"""OpenAICompatibleBackend against a local HTTP stand-in for /v1/completions."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from nodes.content_generator import CONTENT_GRAMMAR, CONTENT_MAX_TOKENS, CONTENT_STOP
+from nodes.model_utils import OpenAICompatibleBackend, iter_completions
+
+
+class CompletionServer(ThreadingHTTPServer):
+    """Records every request body and answers with the queued (status, body) replies, or a default one."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), CompletionHandler)
+        self.requests = []
+        self.replies = []
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class CompletionHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append({"path": self.path, "body": body})
+        if self.server.replies:
+            status, reply = self.server.replies.pop(0)
+        else:
+            prompts = body["prompt"] if isinstance(body["prompt"], list) else [body["prompt"]]
+            # Choices out of order, as servers may return them
+            choices = [{"index": index, "text": f"completion {index}"} for index in range(len(prompts))]
+            status, reply = 200, {"choices": choices[::-1], "usage": {"prompt_tokens": 10, "completion_tokens": 5}}
+        data = json.dumps(reply).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = CompletionServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def backend(server):
+    backend = OpenAICompatibleBackend(base_url=server.base_url, model="test-model", timeout=5)
+    yield backend
+    backend.close()
+
+
+def test_batch_sends_grammar_stop_and_max_tokens(server, backend):
+    llm = backend.get_handle(temperature=0.3)
+    completions = llm.generate_batch(["first", "second"], max_tokens=CONTENT_MAX_TOKENS, stop=CONTENT_STOP,
+                                     grammar=CONTENT_GRAMMAR)
+
+    assert completions == ["completion 0", "completion 1"]
+    request = server.requests[0]
+    assert request["path"] == "/v1/completions"
+    assert request["body"]["prompt"] == ["first", "second"]
+    assert request["body"]["model"] == "test-model"
+    assert request["body"]["grammar"] == CONTENT_GRAMMAR
+    assert request["body"]["stop"] == CONTENT_STOP
+    assert request["body"]["max_tokens"] == CONTENT_MAX_TOKENS
+    assert request["body"]["temperature"] == 0.3
+
+
+def test_single_prompt_is_sent_as_a_string(server, backend):
+    assert backend.get_handle().invoke("only", max_tokens=8) == "completion 0"
+    assert server.requests[0]["body"]["prompt"] == "only"
+    assert server.requests[0]["body"]["max_tokens"] == 8
+
+
+def test_server_error_raises(server, backend):
+    server.replies.append((500, {"error": {"message": "model not loaded"}}))
+    with pytest.raises(requests.HTTPError):
+        backend.get_handle().invoke("prompt")
+
+
+def test_missing_choices_raise(server, backend):
+    server.replies.append((200, {"choices": [{"index": 0, "text": "only one"}]}))
+    with pytest.raises(RuntimeError, match="Expected 2 completions"):
+        backend.get_handle().generate_batch(["a", "b"])
+
+
+def test_failed_batch_is_retried_one_prompt_at_a_time(server, backend):
+    # The batch fails, then the first single prompt fails too and only it comes back as None
+    server.replies.extend([(503, {"error": "busy"}), (500, {"error": "boom"})])
+    completions = list(iter_completions(backend.get_handle(), ["a", "b"], batch_size=2, max_tokens=8))
+
+    assert completions == [None, "completion 0"]
+    assert [request["body"]["prompt"] for request in server.requests] == [["a", "b"], "a", "b"]
@@ -0,0 +1,60 @@
+"""The vectorized rule-based engine against the scalar one it replaces."""
+import random
+
+import pytest
+
+from nodes.content_generator import generate_rule_based_bulk, generate_rule_based_content
+
+SAMPLES = 4000
+
+
+def scalar_outputs(theme, topic, randomness, seed=7):
+    random.seed(seed)
+    return [generate_rule_based_content(theme, topic, randomness) for _ in range(SAMPLES)]
+
+
+def bulk_outputs(theme, topic, randomness, seed=7):
+    bulk = generate_rule_based_bulk(theme, [topic] * SAMPLES, randomness, seed=seed)
+    return [{"caption": caption, "hashtags": hashtags} for caption, hashtags in zip(bulk["caption"], bulk["hashtags"])]
+
+
+# "Growth" already has its theme hashtag (#Growth) in one of its hashtag sets
+@pytest.mark.parametrize("theme", ["Fitness for Busy Professionals", "Growth", "Pottery"])
+@pytest.mark.parametrize("randomness", ["low", "medium"])
+def test_bulk_and_scalar_produce_the_same_outputs(theme, randomness):
+    scalar = {(row["caption"], row["hashtags"]) for row in scalar_outputs(theme, "meal prep", randomness)}
+    bulk = {(row["caption"], row["hashtags"]) for row in bulk_outputs(theme, "meal prep", randomness)}
+    assert bulk == scalar
+
+
+def test_high_randomness_covers_the_same_captions_and_hashtags():
+    theme = "Wellness at Work"
+    scalar = scalar_outputs(theme, "breathing breaks", "high")
+    bulk = bulk_outputs(theme, "breathing breaks", "high")
+
+    assert {row["caption"] for row in bulk} == {row["caption"] for row in scalar}
+    tag_sets = lambda rows: {frozenset(row["hashtags"].split()) for row in rows}
+    assert tag_sets(bulk) == tag_sets(scalar)
+    # Hashtags are shuffled, so many orderings of the same tags turn up
+    assert len({row["hashtags"] for row in bulk}) > 5 * len(tag_sets(bulk))
+
+
+def test_fixed_seed_is_reproducible():
+    topics = [f"topic {i}" for i in range(50)]
+    first = generate_rule_based_bulk("Healthy Cooking", topics, "high", seed=3)
+    assert generate_rule_based_bulk("Healthy Cooking", topics, "high", seed=3) == first
+    assert generate_rule_based_bulk("Healthy Cooking", topics, "high", seed=4) != first
+    assert [caption.count("topic") for caption in first["caption"]] == [1] * 50
+
+
+def test_rows_with_different_themes_match_single_theme_runs():
+    themes = ["Fitness Daily", "Tech Talk", "Fitness Daily", "Business Basics", "Tech Talk"]
+    topics = [f"topic {i}" for i in range(len(themes))]
+    mixed = generate_rule_based_bulk(themes, topics, "medium", seed=11)
+    for row, theme in enumerate(themes):
+        alone = generate_rule_based_bulk(theme, topics, "medium", seed=11)
+        assert (mixed["caption"][row], mixed["hashtags"][row]) == (alone["caption"][row], alone["hashtags"][row])
+
+    with pytest.raises(ValueError):
+        generate_rule_based_bulk(themes[:2], topics, "medium")
+    assert generate_rule_based_bulk("Tech", [], "medium") == {"caption": [], "hashtags": []}
@@ -0,0 +1,64 @@
+"""The host profile written by autotune.py changes how get_llm loads and runs the model."""
+import threading
+
+import pytest
+
+from nodes import model_utils
+from nodes.model_utils import PooledLLM, configure_backend, get_llm
+from nodes.runtime_profile import load_profile, save_profile
+
+TUNED = {"n_threads": 3, "n_batch": 128, "n_ctx": 1024, "use_mmap": True, "use_mlock": False}
+
+
+@pytest.fixture
+def model_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLM_PROFILE", str(tmp_path / "runtime_profile.json"))
+    path = tmp_path / "model.gguf"
+    path.write_bytes(b"GGUF")
+    return str(path)
+
+
+@pytest.fixture
+def pool_calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(model_utils._model_pool, "get",
+                        lambda model_path, temperature=0.7, **settings: calls.append(settings) or object())
+    yield calls
+    configure_backend("stub")
+
+
+def test_profile_settings_reach_the_model_pool(model_file, pool_calls):
+    configure_backend("llama-cpp", filename=model_file)
+    get_llm(cache=False)
+    assert pool_calls[-1] == {}
+
+    save_profile(model_file, TUNED)
+    get_llm(cache=False)
+    assert pool_calls[-1] == TUNED
+
+
+def test_explicit_settings_override_the_profile(model_file, pool_calls):
+    save_profile(model_file, TUNED)
+    configure_backend("llama-cpp", filename=model_file)
+    get_llm(cache=False, n_batch=32)
+    assert pool_calls[-1] == dict(TUNED, n_batch=32)
+
+
+def test_profile_from_another_host_is_ignored(model_file, monkeypatch):
+    save_profile(model_file, TUNED)
+    assert load_profile(model_file) == TUNED
+    monkeypatch.setattr("os.cpu_count", lambda: 4096)
+    assert load_profile(model_file) == {}
+
+
+def test_pooled_model_batches_with_its_tuned_n_batch(monkeypatch):
+    calls = []
+    monkeypatch.setattr(model_utils, "generate_batch", lambda llama, prompts, **kwargs: calls.append(kwargs) or [])
+
+    class Client:
+        client = object()
+
+    PooledLLM(Client(), threading.Lock(), 0.7, n_batch=128).generate_batch(["a", "b"])
+    PooledLLM(Client(), threading.Lock(), 0.7).generate_batch(["a", "b"])
+    assert calls[0]["n_batch"] == 128
+    assert calls[1]["n_batch"] is None
@@ -0,0 +1,102 @@
+"""Order in which the inference scheduler admits waiting generations."""
+import threading
+import time
+
+from nodes.scheduler import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, InferenceScheduler
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def admission_order(scheduler, requests, check_waiting=None):
+    """Queue (label, session, priority) requests behind a running generation, one at a time; return the order they ran in."""
+    order = []
+    release = threading.Event()
+
+    def hold():
+        with scheduler.slot("running"):
+            release.wait()
+
+    def generate(label, session_id, priority):
+        with scheduler.slot(session_id, priority):
+            order.append(label)
+
+    threads = [threading.Thread(target=hold)]
+    threads[0].start()
+    wait_until(lambda: scheduler.status("running") is not None)
+    for count, (label, session_id, priority) in enumerate(requests, start=1):
+        thread = threading.Thread(target=generate, args=(label, session_id, priority))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: len(scheduler) == count)
+    if check_waiting:
+        check_waiting()
+
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return order
+
+
+def test_sessions_take_turns():
+    scheduler = InferenceScheduler()
+    # A long plan queues several calls before a short plan asks for one
+    order = admission_order(scheduler, [
+        ("long 1", "long", PRIORITY_NORMAL),
+        ("long 2", "long", PRIORITY_NORMAL),
+        ("long 3", "long", PRIORITY_NORMAL),
+        ("short 1", "short", PRIORITY_NORMAL),
+    ])
+    assert order == ["long 1", "short 1", "long 2", "long 3"]
+
+
+def test_priority_comes_before_fairness():
+    scheduler = InferenceScheduler()
+    order = admission_order(scheduler, [
+        ("batch", "batch", PRIORITY_LOW),
+        ("normal 1", "a", PRIORITY_NORMAL),
+        ("normal 2", "b", PRIORITY_NORMAL),
+        ("interactive", "c", PRIORITY_HIGH),
+    ])
+    assert order == ["interactive", "normal 1", "normal 2", "batch"]
+
+
+def test_same_session_is_first_in_first_out():
+    scheduler = InferenceScheduler()
+    order = admission_order(scheduler, [(f"call {i}", "session", PRIORITY_NORMAL) for i in range(5)])
+    assert order == [f"call {i}" for i in range(5)]
+
+
+def test_status_reports_queue_position():
+    scheduler = InferenceScheduler()
+    assert scheduler.status("nobody") is None
+
+    def check_waiting():
+        assert scheduler.status("running") == {"running": True, "position": 0, "wait_seconds": 0.0}
+        assert scheduler.status("a")["position"] == 1
+        assert scheduler.status("b")["position"] == 2
+        assert scheduler.status("b")["running"] is False
+
+    admission_order(scheduler, [("a", "a", PRIORITY_NORMAL), ("b", "b", PRIORITY_NORMAL)], check_waiting)
+    assert scheduler.status("a") is None
+    assert len(scheduler) == 0
+
+
+def test_several_slots_run_generations_together():
+    scheduler = InferenceScheduler(max_in_flight=2)
+    inside = threading.Barrier(2, timeout=5)
+
+    def generate(session_id):
+        with scheduler.slot(session_id):
+            inside.wait()  # Both must be admitted at once to get past this
+
+    threads = [threading.Thread(target=generate, args=(session,)) for session in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert not inside.broken
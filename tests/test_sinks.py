@@ -0,0 +1,90 @@
+"""Output sinks: atomic file writes and reserved output paths."""
+import json
+import os
+import stat
+import time
+
+import pytest
+
+from nodes import sinks
+from nodes.formatter import ContentTable
+from nodes.sinks import FileSink, MemorySink, make_sink, remove_stale_outputs, unique_output_path
+
+ROWS = [{"day": 1, "topic": "Meal prep", "caption": "Cook once.", "hashtags": "#mealprep #batch"},
+        {"day": 2, "topic": "Hydration", "caption": "Drink up.", "hashtags": "#water"}]
+
+
+def test_file_sink_replaces_the_file_in_one_step(tmp_path, monkeypatch):
+    path = tmp_path / "plans" / "plan.csv"
+    assert FileSink(str(path)).write(ContentTable(ROWS)) == str(path)
+    assert path.read_text(encoding="utf-8").splitlines()[0] == "day,topic,caption,hashtags"
+
+    # Readers only ever see the old or the new file: a failed write leaves the old one and no temp files
+    def fail(source, dest):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(sinks.os, "replace", fail)
+    before = path.read_bytes()
+    with pytest.raises(OSError):
+        FileSink(str(path)).write(ContentTable(ROWS[:1]))
+    assert path.read_bytes() == before
+    assert os.listdir(path.parent) == ["plan.csv"]
+
+
+def test_file_sink_keeps_permissions(tmp_path):
+    path = tmp_path / "plan.jsonl"
+    FileSink(str(path)).write(ContentTable(ROWS))
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    assert path.read_text(encoding="utf-8").count("\n") == 2
+
+    os.chmod(path, 0o600)
+    FileSink(str(path)).write(ContentTable(ROWS))
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+def test_format_follows_the_extension():
+    assert FileSink("plan.jsonl").fmt == "jsonl"
+    assert FileSink("plan.txt").fmt == "csv"
+    assert FileSink("plan.csv", "jsonl").fmt == "jsonl"
+    with pytest.raises(ValueError):
+        MemorySink("xml")
+
+
+def test_memory_sink_touches_no_disk():
+    sink = make_sink(None, "jsonl")
+    assert isinstance(sink, MemorySink)
+    assert sink.write(ContentTable(ROWS)) is None
+    assert [json.loads(line)["day"] for line in sink.data.decode("utf-8").splitlines()] == [1, 2]
+
+
+def test_unique_output_paths_keep_the_name_and_never_collide(tmp_path):
+    paths = {unique_output_path("plan.csv", str(tmp_path)) for _ in range(20)}
+    assert len(paths) == 20
+    assert all(os.path.basename(path) == "plan.csv" for path in paths)
+    assert all(os.path.dirname(os.path.dirname(path)) == str(tmp_path) for path in paths)
+
+
+def test_stale_reserved_paths_are_removed(tmp_path):
+    old = unique_output_path("plan.csv", str(tmp_path))
+    new = unique_output_path("plan.csv", str(tmp_path))
+    other = tmp_path / "notes"
+    other.mkdir()
+    past = time.time() - sinks.OUTPUT_MAX_AGE_SECONDS - 60
+    for directory in (os.path.dirname(old), str(other)):
+        os.utime(directory, (past, past))
+
+    assert remove_stale_outputs(str(tmp_path)) == 1
+    assert not os.path.exists(os.path.dirname(old))
+    assert os.path.isdir(os.path.dirname(new))
+    assert other.is_dir()
+
+
+def test_default_root_is_shared_and_cleaned(tmp_path, monkeypatch):
+    monkeypatch.setattr(sinks, "_output_root", str(tmp_path))
+    stale = unique_output_path("plan.csv")
+    past = time.time() - sinks.OUTPUT_MAX_AGE_SECONDS - 60
+    os.utime(os.path.dirname(stale), (past, past))
+
+    fresh = unique_output_path("plan.csv")
+    assert fresh.startswith(str(tmp_path))
+    assert not os.path.exists(os.path.dirname(stale))
@@ -0,0 +1,41 @@
+"""The rule-based CLI must not import the model, graph or dataframe stacks."""
+import json
+import os
+import subprocess
+import sys
+
+from benchmark import RULE_BASED_FORBIDDEN_IMPORTS
+
+MAIN_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+# Runs main.py as the CLI would, then reports which forbidden packages ended up in sys.modules
+RUN_MAIN = """
+import json, os, runpy, sys
+forbidden = json.loads(sys.argv[1])
+sys.argv = sys.argv[2:]
+sys.path.insert(0, os.path.dirname(sys.argv[0]))
+runpy.run_path(sys.argv[0], run_name="__main__")
+print(json.dumps(sorted(name for name in forbidden if name in sys.modules)))
+"""
+
+
+def run_rule_based(tmp_path, *args):
+    command = [sys.executable, "-c", RUN_MAIN, json.dumps(RULE_BASED_FORBIDDEN_IMPORTS), MAIN_PATH, "--rule-based",
+               "--theme", "Fitness for Busy Professionals", "--duration", "30", "--seed", "0",
+               "--output", str(tmp_path / "plan.csv"), *args]
+    result = subprocess.run(command, cwd=tmp_path, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_rule_based_cli_skips_heavy_imports(tmp_path):
+    assert run_rule_based(tmp_path) == []
+    assert (tmp_path / "plan.csv").read_text(encoding="utf-8").startswith("day,topic,caption,hashtags")
+
+
+def test_rule_based_jsonl_output_skips_heavy_imports(tmp_path):
+    assert run_rule_based(tmp_path, "--format", "jsonl") == []
+
+
+def test_forbidden_list_covers_the_heavy_stacks():
+    assert {"llama_cpp", "langchain_community", "langgraph", "pandas"} <= set(RULE_BASED_FORBIDDEN_IMPORTS)